@@ -0,0 +1,126 @@
+# bench_api.py
+# 매칭 API 부하 테스트 (open-loop: 응답을 기다리지 않고 목표 RPS 간격으로 요청을 보냄)
+# - 지연시간은 "보내기로 예정된 시각"부터 잼 → 서버가 밀리면 대기 시간까지 p99 에 드러남
+# - 결과: 엔드포인트별 요청 수, 오류 수, 실제 처리량, p50 / p90 / p99 / 최대 지연(ms)
+# 사용법:
+#   python bench_api.py --rps 200 --duration 20                   (합성 병원 데이터로 서버를 같은 프로세스에 띄움)
+#   python bench_api.py --url http://127.0.0.1:8770 --rps 500      (이미 떠 있는 match_api.py 대상)
+#   --mix nearest=8,within=1,route=1,feedback=0  요청 비율
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+CLIENT_THREADS = 64
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def make_calls(base_url, n, seed=0):
+    # 서울 근처 임의 위치에서의 요청 (엔드포인트 이름, 메서드, 경로, 본문)
+    rng = np.random.default_rng(seed)
+    lats = 37.5665 + rng.normal(0, 0.1, n)
+    lons = 126.9780 + rng.normal(0, 0.12, n)
+    return {
+        'nearest': lambda i: ('GET', f'{base_url}/nearest?lat={lats[i]:.6f}&lon={lons[i]:.6f}&n=5', None),
+        'within': lambda i: ('GET', f'{base_url}/within?lat={lats[i]:.6f}&lon={lons[i]:.6f}&radius_km=5&limit=50', None),
+        'route': lambda i: ('GET', f'{base_url}/route?from_lat={lats[i]:.6f}&from_lon={lons[i]:.6f}'
+                                   f'&to_lat=37.5665&to_lon=126.9780', None),
+        'feedback': lambda i: ('POST', f'{base_url}/feedback', {'hospital_id': 'H000000', 'rating': 5, 'comment': 'bench'}),
+    }
+
+
+def run(base_url, rps, duration, mix, threads=CLIENT_THREADS):
+    n = int(rps * duration)
+    calls = make_calls(base_url, n)
+    names = list(mix)
+    weights = np.array([mix[k] for k in names], dtype=float)
+    kinds = np.random.default_rng(1).choice(len(names), n, p=weights / weights.sum())
+
+    local = threading.local()
+
+    def session():
+        s = getattr(local, 'session', None)
+        if s is None:
+            s = local.session = requests.Session()
+            s.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return s
+
+    latency = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+
+    def fire(i, scheduled):
+        method, url, body = calls[names[kinds[i]]](i)
+        try:
+            r = session().request(method, url, json=body, timeout=10)
+            ok[i] = r.status_code == 200
+        except requests.RequestException:
+            pass
+        latency[i] = time.perf_counter() - scheduled
+
+    pool = ThreadPoolExecutor(max_workers=threads)
+    start = time.perf_counter()
+    for i in range(n):
+        scheduled = start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool.submit(fire, i, scheduled)
+    pool.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+    return names, kinds, latency * 1000, ok, elapsed
+
+
+def report(names, kinds, latency_ms, ok, elapsed, rps):
+    print(f"목표 {rps:,.0f} req/s, 실제 {len(kinds) / elapsed:,.0f} req/s ({len(kinds):,}건 / {elapsed:.1f}s)")
+    print(f"{'endpoint':<10} {'count':>7} {'errors':>7} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9} {'max(ms)':>9}")
+    groups = [(name, kinds == k) for k, name in enumerate(names)] + [('all', np.ones(len(kinds), dtype=bool))]
+    for name, sel in groups:
+        if not sel.any():
+            continue
+        lat = latency_ms[sel]
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        print(f"{name:<10} {sel.sum():>7,} {(~ok[sel]).sum():>7,} {p50:>9.1f} {p90:>9.1f} {p99:>9.1f} {lat.max():>9.1f}")
+
+
+def start_local(n_hospitals, workers, port):
+    # 합성 병원 데이터 + 임시 DB 로 같은 프로세스에 서버 시작
+    import os
+    import tempfile
+
+    from bench_nearest import make_hospitals
+    import match_api
+
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, 'hospitals.csv')
+    make_hospitals(n_hospitals).to_csv(csv_path, index=False)
+    service = match_api.build_service(csv_path, os.path.join(tmp, 'bench.db'), workers=workers)
+    server = match_api.serve(service, port)
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='매칭 API 부하 테스트 (p50/p99 지연)')
+    parser.add_argument('--url', default=None, help='대상 서버 (생략 시 합성 데이터로 서버를 직접 띄움)')
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument('--duration', type=float, default=10, help='초')
+    parser.add_argument('--mix', default='nearest=8,within=1,route=1')
+    parser.add_argument('--hospitals', type=int, default=10000, help='--url 이 없을 때 합성 병원 수')
+    parser.add_argument('--workers', type=int, default=4, help='--url 이 없을 때 서버 동시 계산 수')
+    parser.add_argument('--threads', type=int, default=CLIENT_THREADS, help='클라이언트 동시 연결 수')
+    args = parser.parse_args()
+    url = args.url or start_local(args.hospitals, args.workers, 0)
+    requests.get(url + '/health', timeout=5).raise_for_status()
+    result = run(url, args.rps, args.duration, parse_mix(args.mix), args.threads)
+    report(*result, args.rps)
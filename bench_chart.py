@@ -0,0 +1,62 @@
+# bench_chart.py
+# 주가 차트 전송량/처리시간 비교: 종목마다 전체 해상도 trace (기존) vs price_chart.trace_data (정규화 + 점 줄이기)
+# 전송량은 trace 의 x/y 를 JSON 으로 바꾼 크기 (plotly 가 브라우저로 보내는 데이터의 대부분)
+# 사용법: python bench_chart.py [종목 수 ...] [--years 10]
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import price_chart
+
+
+def make_prices(n_tickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2000-01-03', periods=int(252 * years))
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (len(days), n_tickers)), axis=0))
+    values[: rng.integers(0, len(days) // 2), 0] = np.nan  # 중간에 상장한 종목 하나
+    return pd.DataFrame(values, index=days, columns=[f'T{i:04d}' for i in range(n_tickers)])
+
+
+def payload_full(adj_close):
+    # 기존: 종목마다 DataFrame 열 그대로 (날짜 문자열 + 전체 값)
+    dates = adj_close.index.strftime('%Y-%m-%d').tolist()
+    traces = [{'x': dates, 'y': adj_close[t].ffill().tolist()} for t in adj_close.columns]
+    return len(json.dumps(traces))
+
+
+def payload_downsampled(adj_close, method):
+    # price_chart.price_figure 와 같은 데이터 (plotly 없이 크기만 측정)
+    values = price_chart.normalize(adj_close.to_numpy(dtype=float))
+    dates = adj_close.index.to_numpy()
+    cols = price_chart.pick_columns(values)
+    traces = price_chart.trace_data(dates, values[:, cols], method)
+    if len(cols) < values.shape[1]:
+        n_band = len(price_chart.BAND_PERCENTILES)
+        traces += price_chart.trace_data(dates, price_chart.percentile_band(values).T, method,
+                                         budget=n_band * price_chart.CHART_WIDTH_PX)
+    return len(json.dumps([{'x': x.tolist(), 'y': y.tolist()} for x, y in traces]))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='주가 차트 전송량 비교')
+    parser.add_argument('sizes', nargs='*', type=int, default=[10, 100, 500, 2000])
+    parser.add_argument('--years', type=float, default=10)
+    args = parser.parse_args()
+    print(f"{'종목':>6} {'full(KB)':>10} {'full(ms)':>9} {'minmax(KB)':>11} {'ms':>6} {'lttb(KB)':>9} {'ms':>6}")
+    for n in args.sizes:
+        adj_close = make_prices(n, args.years)
+        full, t_full = timed(payload_full, adj_close)
+        mm, t_mm = timed(payload_downsampled, adj_close, 'minmax')
+        lt, t_lt = timed(payload_downsampled, adj_close, 'lttb')
+        print(f"{n:>6} {full / 1024:>10,.0f} {t_full * 1000:>9,.0f} {mm / 1024:>11,.0f} {t_mm * 1000:>6,.0f} "
+              f"{lt / 1024:>9,.0f} {t_lt * 1000:>6,.0f}")
@@ -0,0 +1,69 @@
+# bench_dispatch.py
+# 이송 배정 벤치마크: 요청마다 따로 find_nearest(기억 없음) vs dispatch.Dispatcher(예약 + regret 탐욕)
+# - 처리량(요청/초)과 배정 품질(침대 초과 배정 수, 한 병원 최대 쏠림, 평균 거리)을 배치 크기별로 비교
+# 사용법: python bench_dispatch.py [병원 수] [요청 수]   (기본: 2000 500)
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_nearest import make_hospitals
+from dispatch import Dispatcher, ReservationBook
+from hospital_search import find_nearest
+from spatial_index import HospitalIndex
+
+
+def make_requests(n, seed=1):
+    # 서울 도심 주변에 몰린 동시 요청 (쏠림이 생기기 쉬운 상황)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'request_id': np.arange(n),
+        'lat': 37.5665 + rng.normal(0, 0.05, n),
+        'lon': 126.9780 + rng.normal(0, 0.06, n),
+    })
+
+
+def quality(hospitals, hospital_ids, distance_km):
+    counts = pd.Series(hospital_ids).value_counts()
+    beds = hospitals.set_index('id')['delivery_beds']
+    over = (counts - beds.reindex(counts.index).fillna(0)).clip(lower=0).sum()
+    return int(over), int(counts.max()), float(np.nanmean(distance_km))
+
+
+def main(n_hospitals, n_requests):
+    hospitals = make_hospitals(n_hospitals)
+    # 수도권에 병원 일부를 모아 현실적인 후보 밀도
+    rng = np.random.default_rng(2)
+    metro = rng.random(n_hospitals) < 0.3
+    hospitals.loc[metro, 'lat'] = 37.5665 + rng.normal(0, 0.15, metro.sum())
+    hospitals.loc[metro, 'lon'] = 126.9780 + rng.normal(0, 0.18, metro.sum())
+    index = HospitalIndex(hospitals['lat'].to_numpy(), hospitals['lon'].to_numpy())
+    requests = make_requests(n_requests)
+
+    t0 = time.perf_counter()
+    naive = [find_nearest(lat, lon, hospitals, 1, index=index)
+             for lat, lon in zip(requests['lat'].to_numpy(), requests['lon'].to_numpy())]
+    t_naive = time.perf_counter() - t0
+    naive_ids = [d['id'].iloc[0] for d in naive]
+    naive_dist = [d['distance_km'].iloc[0] for d in naive]
+    print(f"병원 {n_hospitals:,}개, 동시 요청 {n_requests:,}건 (수도권 병원 {metro.sum():,}개, 침대 합 {hospitals.loc[metro, 'delivery_beds'].sum():,})")
+    print(f"{'방식':<22} {'요청/초':>10} {'침대초과':>8} {'최대쏠림':>8} {'평균km':>8}")
+    over, peak, mean_km = quality(hospitals, naive_ids, naive_dist)
+    print(f"{'find_nearest 개별':<22} {n_requests / t_naive:>10,.0f} {over:>8} {peak:>8} {mean_km:>8.2f}")
+
+    for batch in (1, 10, 100, 500):
+        dispatcher = Dispatcher(hospitals, index, ReservationBook())
+        t0 = time.perf_counter()
+        parts = [dispatcher.assign(requests.iloc[s:s + batch]) for s in range(0, n_requests, batch)]
+        t = time.perf_counter() - t0
+        result = pd.concat(parts, ignore_index=True)
+        assert len(dispatcher.book) == result['hospital_id'].notna().sum()
+        over, peak, mean_km = quality(hospitals, result['hospital_id'], result['distance_km'])
+        print(f"{f'Dispatcher 배치 {batch}':<22} {n_requests / t:>10,.0f} {over:>8} {peak:>8} {mean_km:>8.2f}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [2000, 500][len(args):]))
@@ -0,0 +1,48 @@
+# bench_folium.py
+# folium 지도 벤치마크: 기존 iterrows + MarkerCluster vs folium_map.hospital_map
+# 병원 수에 따른 HTML 크기(st_folium 으로 보내는 양)와 생성+렌더 시간
+# 사용법: python bench_folium.py [병원 수 ...]   (기본: 100 1000 10000 50000)
+
+import sys
+import time
+
+import folium
+from folium.plugins import MarkerCluster
+
+import folium_map
+from bench_nearest import make_hospitals
+from hospital_search import find_nearest
+
+
+def hospital_map_iterrows(user_lat, user_lon, nearest):
+    # 기존 code.py 구현 (행마다 Marker + 팝업 HTML)
+    m = folium.Map(location=[user_lat, user_lon], zoom_start=12)
+    folium.Marker([user_lat, user_lon], tooltip='You', icon=folium.Icon(color='blue')).add_to(m)
+    mc = MarkerCluster().add_to(m)
+    for _, r in nearest.iterrows():
+        popup_html = f"<b>{r['name']}</b><br/>distance: {r['distance_km']:.2f} km<br/>waiting: {r['waiting']}<br/>delivery_beds: {int(r['delivery_beds'])}<br/>accepting: {r['accepting']}"
+        folium.Marker([r['lat'], r['lon']], popup=popup_html).add_to(mc)
+    return m
+
+
+def render(build):
+    t0 = time.perf_counter()
+    html = build().get_root().render()
+    return len(html), time.perf_counter() - t0
+
+
+def main(sizes):
+    user_lat, user_lon = 37.5665, 126.9780
+    print(f"{'n':>8} {'old(KB)':>10} {'old(ms)':>10} {'new(KB)':>10} {'new(ms)':>10} {'cached(ms)':>11}")
+    for n in sizes:
+        nearest = find_nearest(user_lat, user_lon, make_hospitals(n), top_n=n)
+        old_bytes, t_old = render(lambda: hospital_map_iterrows(user_lat, user_lon, nearest)) if n <= 10000 else (None, None)
+        folium_map._cache.clear()
+        new_bytes, t_new = render(lambda: folium_map.hospital_map(user_lat, user_lon, nearest))
+        _, t_hit = render(lambda: folium_map.hospital_map(user_lat, user_lon, nearest))
+        old = f"{old_bytes/1024:>10.0f} {t_old*1000:>10.0f}" if old_bytes else f"{'-':>10} {'-':>10}"
+        print(f"{n:>8} {old} {new_bytes/1024:>10.0f} {t_new*1000:>10.0f} {t_hit*1000:>11.0f}")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 10000, 50000])
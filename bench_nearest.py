@@ -0,0 +1,122 @@
+# bench_nearest.py
+# find_nearest_hospitals 벤치마크: 기존 df.apply 경로 vs NumPy 벡터화 엔진 vs 공간 인덱스
+# - 사용자 위치 QUERIES 곳(병원과 같은 범위의 무작위 좌표)의 호출당 평균 시간
+# - numpy / index: find_nearest 전체 (결과 DataFrame 생성 약 1ms 포함, 두 경로 공통)
+#   index 는 병원이 INDEX_MIN_ROWS 개 미만이면 전체 배열 경로를 그대로 씀 ('경로' 열)
+# - 검색만: 후보 선택 + 점수 + 상위 N 만 (DataFrame 생성 제외), 인덱스는 개수와 상관없이 강제로 사용
+#   인덱스 검색은 격자 조회 약 2회(밀도로 추정한 반경의 k개 → top_n 번째 점수 반경)라 고정 비용이 있어
+#   1천~5천 개에서는 전체 하버사인보다 느리고, 1만 개 부근부터 빨라짐 (5만 개에서 몇 배)
+# - radius10km: within_radius 반경 검색 (인덱스가 항상 유리)
+# 사용법: python bench_nearest.py [병원 수 ...]   (기본: 1000 10000 50000)
+
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from hospital_search import INDEX_MIN_ROWS, _index_candidates, _score_rows, find_nearest, haversine_np, top_n_indices
+from spatial_index import HospitalIndex
+
+QUERIES = 200
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371.0
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    return 2*R*math.asin(math.sqrt(a))
+
+
+def find_nearest_apply(user_lat, user_lon, hospitals_df, top_n=5):
+    # 기존 code.py 구현 (행 단위 apply 2회 + 전체 정렬)
+    df = hospitals_df.copy()
+    df['distance_km'] = df.apply(lambda r: haversine(user_lat, user_lon, r['lat'], r['lon']), axis=1)
+    def score_row(r):
+        score = r['distance_km']
+        if not r['accepting']:
+            score += 1000
+        if r['delivery_beds'] == 0:
+            score += 20
+        score += r['waiting'] * 2
+        return score
+    df['score'] = df.apply(score_row, axis=1)
+    df = df.sort_values('score')
+    return df.reset_index(drop=True).head(top_n)
+
+
+def make_hospitals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f"H{i:06d}" for i in range(n)],
+        'name': [f"병원{i}" for i in range(n)],
+        'lat': rng.uniform(33.0, 38.6, n),
+        'lon': rng.uniform(124.6, 131.0, n),
+        'accepting': rng.random(n) < 0.8,
+        'waiting': rng.integers(0, 15, n),
+        'delivery_beds': rng.integers(0, 4, n),
+    })
+
+
+def timeit(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def per_query(fn, points):
+    # 위치마다 한 번씩 호출한 평균 (첫 호출은 준비용으로 제외)
+    fn(*points[0])
+    t0 = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    return (time.perf_counter() - t0) / len(points)
+
+
+def main(sizes):
+    user_lat, user_lon, top_n = 37.5665, 126.9780, 10
+    rng = np.random.default_rng(1)
+    points = np.column_stack([rng.uniform(33.0, 38.6, QUERIES), rng.uniform(124.6, 131.0, QUERIES)])
+    print(f"사용자 위치 {QUERIES}곳 평균, top_n={top_n}, 인덱스 사용 기준 {INDEX_MIN_ROWS:,}개")
+    print(f"{'n':>8} {'apply(ms)':>10} {'numpy(ms)':>10} {'index(ms)':>10} {'경로':>6} "
+          f"{'검색만 numpy':>12} {'검색만 index':>12} {'radius10km(ms)':>15}")
+    for n in sizes:
+        df = make_hospitals(n)
+        lats, lons = df['lat'].to_numpy(), df['lon'].to_numpy()
+        index = HospitalIndex(lats, lons)
+        old = find_nearest_apply(user_lat, user_lon, df, top_n)
+        new = find_nearest(user_lat, user_lon, df, top_n)
+        assert list(old['id']) == list(new['id']), "결과 순위가 다릅니다"
+        assert np.allclose(old['score'], new['score'])
+        for lat, lon in points[:20]:
+            assert np.allclose(find_nearest(lat, lon, df, top_n, index=index)['score'],
+                               find_nearest(lat, lon, df, top_n)['score'])
+
+        def search_numpy(lat, lon):
+            distance = haversine_np(lat, lon, lats, lons)
+            return top_n_indices(_score_rows(df, np.arange(n), distance), top_n)
+
+        def search_index(lat, lon):
+            rows, distance, score = _index_candidates(lat, lon, df, top_n, index)
+            return search_numpy(lat, lon) if rows is None else top_n_indices(score, top_n)
+
+        t_old = timeit(lambda: find_nearest_apply(user_lat, user_lon, df, top_n), 1 if n > 10000 else 3)
+        t_new = per_query(lambda lat, lon: find_nearest(lat, lon, df, top_n), points)
+        t_idx = per_query(lambda lat, lon: find_nearest(lat, lon, df, top_n, index=index), points)
+        s_new = per_query(search_numpy, points)
+        s_idx = per_query(search_index, points)
+        t_rad = per_query(lambda lat, lon: index.within_radius(lat, lon, 10), points)
+        path = 'index' if n >= INDEX_MIN_ROWS else 'numpy'
+        print(f"{n:>8} {t_old*1000:>10.1f} {t_new*1000:>10.2f} {t_idx*1000:>10.2f} {path:>6} "
+              f"{s_new*1000:>12.3f} {s_idx*1000:>12.3f} {t_rad*1000:>15.3f}")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
@@ -9,146 +9,153 @@
 
 import streamlit as st
 import pandas as pd
-import sqlite3
-import math
-import requests
-import folium
-from folium.plugins import MarkerCluster
+import uuid
 from streamlit_folium import st_folium
-from datetime import datetime
+
+from dispatch import apply_holds, get_dispatcher
+from folium_map import hospital_map, route_map
+from forecast import get_forecaster
+from hospital_data import init_once, load_hospitals as load_dataset
+from hospital_db import enqueue_feedback, feedback_writer, init_feedback_schema, init_status_schema, overlay_status, read_feedback_summary
+from hospital_search import find_nearest
+from match_api import get_match_client
+from routing import get_client, rank_by_eta, route_summary
+from spatial_index import cached_index
+from status_feed import apply_delta, get_feed
 
 # --------------- 설정 (사용자 편의에 맞게 수정) -----------------
 ORS_API_KEY = "YOUR_OPENROUTESERVICE_API_KEY"  # 경로(라우팅) API 키 (예: OpenRouteService)
+ORS_BASE_URL = "https://api.openrouteservice.org"  # 로컬 테스트 시 ors_stub.py 주소 (예: http://127.0.0.1:8080)
 ADMIN_PASSWORD = "admin123"  # 데모용 관리자 비밀번호 (실사용 시 안전하게 보관)
 DB_PATH = "hospital_feedback.db"
 HOSPITAL_CSV = "hospitals_sample.csv"  # 샘플 병원 데이터 파일 (없으면 앱이 생성)
+STATUS_FEED_PORT = 8765  # 병원 상태 수신 HTTP 포트 (POST /status, status_feed.py 참고)
+STATUS_DROP_DIR = "status_drop"  # 상태 파일(*.json/*.jsonl) 드롭 폴더
+STATUS_REFRESH_S = 2  # 실시간 상태 패널 갱신 주기(초)
+MATCH_API_URL = ""  # 매칭 API 주소 (예: http://127.0.0.1:8770, match_api.py). 설정하면 검색/경로/피드백/배정을 API 로 요청
 
 # --------------- 유틸리티 함수 -----------------
 
-def haversine(lat1, lon1, lat2, lon2):
-    # km 단위
-    R = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2*R*math.asin(math.sqrt(a))
-
-
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hospital_id TEXT,
-            rating INTEGER,
-            comment TEXT,
-            timestamp TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    # feedback / hospital_status 테이블 (+ hospital_id 인덱스)
+    init_feedback_schema(DB_PATH)
+    init_status_schema(DB_PATH)
 
 
 # --------------- 병원 데이터 로드/초기화 -----------------
 
-def create_sample_hospitals(path=HOSPITAL_CSV):
-    sample = pd.DataFrame([
-        {"id":"H001","name":"서울중앙여성병원","lat":37.5665,"lon":126.9780,
-         "accepting":True,"waiting":2,"delivery_beds":1},
-        {"id":"H002","name":"강남모성병원","lat":37.4979,"lon":127.0276,
-         "accepting":True,"waiting":8,"delivery_beds":0},
-        {"id":"H003","name":"동대문응급센터","lat":37.5796,"lon":127.0094,
-         "accepting":False,"waiting":0,"delivery_beds":0},
-        {"id":"H004","name":"성북모자병원","lat":37.5891,"lon":127.0164,
-         "accepting":True,"waiting":1,"delivery_beds":2}
-    ])
-    sample.to_csv(path, index=False)
-    return sample
-
-
 def load_hospitals(path=HOSPITAL_CSV):
-    try:
-        df = pd.read_csv(path)
-    except FileNotFoundError:
-        df = create_sample_hospitals(path)
-    return df
+    # 프로세스 공용 캐시 (hospital_data.load_hospitals, match_api 와 같은 로더): 파일이 없으면 샘플 생성
+    return load_dataset(path)
+
+
+def status_feed():
+    # 프로세스 공용 상태 수신기 (처음 호출 때 DB 상태로 채우고 HTTP/파일 드롭 수신 시작)
+    return get_feed(DB_PATH, port=STATUS_FEED_PORT, drop_dir=STATUS_DROP_DIR)
+
+
+def live_hospitals(feed, path=HOSPITAL_CSV):
+    # 세션별 병원 DataFrame: 처음엔 정적 목록 + 상태 스냅샷, 이후엔 마지막으로 본 버전 이후 바뀐 병원 행만 덮어씀
+    # (좌표는 그대로라 공간 인덱스는 다시 만들지 않음)
+    ss = st.session_state
+    base = load_hospitals(path)
+    key = base.attrs.get('dataset_key')
+    delta = None
+    if ss.get('live_key') == key and 'live_df' in ss:
+        version, delta = feed.changes_since(ss.live_version)
+    if delta is None:
+        version, status = feed.snapshot()
+        ss.live_df = overlay_status(base, status).copy()  # 공용 캐시 객체를 직접 고치지 않도록 사본
+        ss.live_key = key
+        ss.live_changed = []
+    else:
+        pos = apply_delta(ss.live_df, delta)
+        if len(pos):
+            ss.live_changed = ss.live_df['id'].iloc[pos].tolist()
+    ss.live_version = version
+    return ss.live_df
 
 
 # --------------- 병원 검색 및 추천 로직 -----------------
 
-def find_nearest_hospitals(user_lat, user_lon, hospitals_df, top_n=5):
-    df = hospitals_df.copy()
-    df['distance_km'] = df.apply(lambda r: haversine(user_lat, user_lon, r['lat'], r['lon']), axis=1)
-    # 가중치 정하기: 수용 여부>분만 가능 여부>대기
-    def score_row(r):
-        score = r['distance_km']
-        if not r['accepting']:
-            score += 1000
-        # 분만 침대(0이면 페널티)
-        if r['delivery_beds'] == 0:
-            score += 20
-        # 대기 인원이 많으면 가중치
-        score += r['waiting'] * 2
-        return score
-    df['score'] = df.apply(score_row, axis=1)
-    df = df.sort_values('score')
-    return df.reset_index(drop=True)
+def find_nearest_hospitals(user_lat, user_lon, hospitals_df, top_n=5, forecast=None):
+    # 가중치 정하기: 수용 여부>분만 가능 여부>대기 (hospital_search.score_arrays 참고)
+    # 거리/점수는 컬럼 단위 NumPy 연산, 상위 N개는 argpartition 으로 선택
+    # 공간 인덱스(데이터셋당 1회 생성)로 가까운 후보만 점수 계산
+    # forecast 가 있으면 대기/침대는 도착 시 예상값 사용 (forecast.py, 주기 배치로 미리 계산)
+    # 다른 사용자에게 방금 배정된(예약 중인) 침대는 빼고 대기 인원에 더해서 순위 계산 (dispatch.py)
+    # MATCH_API_URL 이 있으면 같은 계산을 API 서버가 함 (예측/예약은 서버 쪽 상태 사용)
+    if MATCH_API_URL:
+        return get_match_client(MATCH_API_URL).nearest(user_lat, user_lon, top_n)
+    dispatcher = hospital_dispatcher(hospitals_df)
+    held = dispatcher.book.held()
+    return find_nearest(user_lat, user_lon, apply_holds(hospitals_df, held), top_n, index=dispatcher.index,
+                        forecast=forecast)
+
+
+def hospital_dispatcher(hospitals_df):
+    # 데이터셋별 프로세스 공용 배정기 (공간 인덱스/예약장부 공유)
+    index = cached_index(hospitals_df['lat'].to_numpy(), hospitals_df['lon'].to_numpy(),
+                         key=hospitals_df.attrs.get('dataset_key'))
+    return get_dispatcher(hospitals_df, index)
+
+
+def request_transfer(user_lat, user_lon, hospitals_df, request_id):
+    # 이송 요청 1건 배정 + 병상 임시 예약 (동시에 들어온 요청끼리 같은 병원으로 몰리지 않도록)
+    requests_df = pd.DataFrame({'request_id': [request_id], 'lat': [user_lat], 'lon': [user_lon]})
+    if MATCH_API_URL:
+        return get_match_client(MATCH_API_URL).dispatch(requests_df).iloc[0]
+    return hospital_dispatcher(hospitals_df).assign(requests_df).iloc[0]
+
+
+def release_transfer(hospitals_df, reservation_id):
+    # 도착/취소 시 예약 해제 (만료를 기다리지 않고 침대를 돌려줌). 이미 만료됐으면 False
+    if MATCH_API_URL:
+        return get_match_client(MATCH_API_URL).release(reservation_id)
+    return hospital_dispatcher(hospitals_df).book.release(int(reservation_id))
 
 
 # --------------- 라우팅 (외부 API 호출) -----------------
 
 def get_route_ors(start_lat, start_lon, end_lat, end_lon, api_key=ORS_API_KEY):
     # OpenRouteService 예제 사용
+    # 세션 재사용 + 좌표 반올림 캐시 + 서킷 브레이커 (routing.RouteClient 참고)
+    # API 가 실패/지연되면 직선거리 기반 경로를 error 와 함께 반환
+    if MATCH_API_URL:
+        return get_match_client(MATCH_API_URL).route(start_lat, start_lon, end_lat, end_lon)
     if not api_key or api_key == "YOUR_OPENROUTESERVICE_API_KEY":
         return None, "API_KEY_NOT_SET"
-    url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
-    headers = {"Authorization": api_key, "Content-Type": "application/json"}
-    body = {"coordinates": [[start_lon, start_lat], [end_lon, end_lat]]}
-    try:
-        res = requests.post(url, json=body, headers=headers, timeout=5)
-        res.raise_for_status()
-        return res.json(), None
-    except Exception as e:
-        return None, str(e)
+    return get_client(api_key, ORS_BASE_URL).route(start_lat, start_lon, end_lat, end_lon)
 
 
 # --------------- 병원 상태 업데이트 (관리자용, 데모) -----------------
 
-def update_hospital_status(hospitals_df, hid, accepting=None, waiting=None, delivery_beds=None, path=HOSPITAL_CSV):
-    df = hospitals_df.copy()
-    idx = df.index[df['id'] == hid]
-    if len(idx) == 0:
+def update_hospital_status(feed, hospitals_df, hid, accepting=None, waiting=None, delivery_beds=None):
+    # 상태 수신기에 반영 → hospital_status 테이블 UPSERT + 열린 세션에 변경분 전달 (CSV 는 그대로)
+    # MATCH_API_URL 이 있으면 API 서버의 상태 수신기로 보냄 (검색/배정은 서버 쪽 상태를 쓰므로)
+    if not (hospitals_df['id'] == hid).any():
         return False
-    i = idx[0]
-    if accepting is not None:
-        df.at[i, 'accepting'] = accepting
-    if waiting is not None:
-        df.at[i, 'waiting'] = waiting
-    if delivery_beds is not None:
-        df.at[i, 'delivery_beds'] = delivery_beds
-    df.to_csv(path, index=False)
+    item = {'hospital_id': hid, 'accepting': accepting, 'waiting': waiting, 'delivery_beds': delivery_beds}
+    if MATCH_API_URL:
+        get_match_client(MATCH_API_URL).update_status([item])
+    else:
+        feed.apply([item])
     return True
 
 
 # --------------- 피드백 저장 -----------------
 
 def save_feedback(hospital_id, rating, comment):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('INSERT INTO feedback (hospital_id, rating, comment, timestamp) VALUES (?, ?, ?, ?)',
-              (hospital_id, rating, comment, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
+    # 쓰기 큐에 넣으면 백그라운드 스레드가 묶어서 INSERT
+    # 같은 화면 아래쪽 요약에 바로 보이도록 기록될 때까지 기다림 (최대 묶음 간격 0.2초, 동시 제출은 한 묶음으로)
+    if MATCH_API_URL:
+        return get_match_client(MATCH_API_URL).feedback(hospital_id, rating, comment)
+    enqueue_feedback(DB_PATH, hospital_id, rating, comment)
+    feedback_writer(DB_PATH).flush()
 
 
 def get_feedback_summary():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query('SELECT hospital_id, AVG(rating) as avg_rating, COUNT(*) as cnt FROM feedback GROUP BY hospital_id', conn)
-    conn.close()
-    return df
+    return read_feedback_summary(DB_PATH)
 
 
 # --------------- 간단 다국어 지원 -----------------
@@ -198,18 +205,33 @@ i18n = {
 
 # --------------- Streamlit UI -----------------
 
+@st.fragment(run_every=STATUS_REFRESH_S)
+def live_status_panel(feed):
+    # 이 부분만 주기적으로 다시 실행: 새 변경이 없으면 버전 비교만, 있으면 바뀐 병원 행만 세션 DataFrame 에 반영
+    hospitals_df = live_hospitals(feed)
+    st.caption(f"실시간 병원 상태 (버전 {st.session_state.live_version})")
+    changed = hospitals_df[hospitals_df['id'].isin(st.session_state.live_changed)]
+    if len(changed):
+        st.dataframe(changed[['id', 'name', 'accepting', 'waiting', 'delivery_beds']], hide_index=True)
+
+
 def main():
     st.set_page_config(layout='wide', page_title='임산부 응급 매칭')
 
-    # 초기화
-    init_db()
-    hospitals_df = load_hospitals()
+    # 초기화 (스키마 생성은 프로세스당 1회, 병원 데이터는 공용 캐시)
+    init_once(DB_PATH, init_db)
+    feed = status_feed()
+    hospitals_df = live_hospitals(feed)
+    forecaster = get_forecaster(DB_PATH)
+    forecast = forecaster.table  # 이력이 쌓이기 전에는 None (현재값으로 순위)
 
     # 언어 선택
     lang = st.sidebar.selectbox('Language / 언어', options=['ko', 'en', 'zh'], index=0)
     T = i18n[lang]
 
     st.title(T['title'])
+    if forecaster.error:
+        st.warning(f"혼잡 예측 갱신 실패 - 이전 예측(또는 현재값)으로 순위를 계산합니다: {forecaster.error}")
 
     col1, col2 = st.columns([1, 1])
 
@@ -219,19 +241,30 @@ def main():
         user_lat = st.number_input('Latitude', format="%.6f", value=37.5665)
         user_lon = st.number_input('Longitude', format="%.6f", value=126.9780)
         top_n = st.slider('몇 개 병원을 볼까요?', 1, 10, 5)
+        live_status_panel(feed)
+        # 검색 결과는 세션에 보관: 아래 버튼(경로/이송 요청)을 누르면 재실행되며 find 버튼은 False 가 되기 때문
+        ss = st.session_state
+        ss.setdefault('session_id', uuid.uuid4().hex)  # 세션마다 다른 이송 요청 id (st.session_state 객체는 공용)
         if st.button(T['find']):
-            nearest = find_nearest_hospitals(user_lat, user_lon, hospitals_df, top_n)
+            nearest = find_nearest_hospitals(user_lat, user_lon, hospitals_df, top_n, forecast)
+            show_cols = ['id','name','distance_km','waiting','delivery_beds','accepting','score']
+            if ORS_API_KEY and ORS_API_KEY != "YOUR_OPENROUTESERVICE_API_KEY":
+                # 상위 N개를 실제 주행 ETA 로 재정렬 (경로 요청은 동시에, 전체 3초 마감)
+                nearest = rank_by_eta(get_client(ORS_API_KEY, ORS_BASE_URL), user_lat, user_lon, nearest,
+                                      forecast=forecast)
+                show_cols += ['eta_min', 'eta_source']
+            if 'expected_waiting_at_arrival' in nearest.columns:
+                show_cols += ['expected_waiting_at_arrival', 'expected_beds_at_arrival']
+            ss.search = {'lat': user_lat, 'lon': user_lon, 'nearest': nearest, 'show_cols': show_cols}
+
+        search = ss.get('search')
+        if search is not None:
+            nearest, from_lat, from_lon = search['nearest'], search['lat'], search['lon']
             st.subheader(T['nearest'])
-            st.dataframe(nearest[['id','name','distance_km','waiting','delivery_beds','accepting','score']])
+            st.dataframe(nearest[search['show_cols']])
 
             # 지도 표시
-            m = folium.Map(location=[user_lat, user_lon], zoom_start=12)
-            folium.Marker([user_lat, user_lon], tooltip='You', icon=folium.Icon(color='blue')).add_to(m)
-            mc = MarkerCluster().add_to(m)
-            for _, r in nearest.iterrows():
-                popup_html = f"<b>{r['name']}</b><br/>distance: {r['distance_km']:.2f} km<br/>waiting: {r['waiting']}<br/>delivery_beds: {int(r['delivery_beds'])}<br/>accepting: {r['accepting']}"
-                folium.Marker([r['lat'], r['lon']], popup=popup_html).add_to(mc)
-
+            m = hospital_map(from_lat, from_lon, nearest)
             st_data = st_folium(m, width=700, height=450)
 
             # 병원 선택 및 라우팅
@@ -242,17 +275,39 @@ def main():
             st.write(f"선택: {sel_row['name']} (distance {sel_row['distance_km']:.2f} km)")
 
             if st.button(T['route']):
-                route_json, error = get_route_ors(user_lat, user_lon, sel_row['lat'], sel_row['lon'])
+                route_json, error = get_route_ors(from_lat, from_lon, sel_row['lat'], sel_row['lon'])
                 if route_json is None:
                     st.error(f"라우팅 실패: {error}. ORS API 키를 환경변수 또는 코드에 설정하세요.")
                 else:
+                    if error:
+                        st.warning(f"라우팅 API 응답 지연/실패({error}) - 직선거리 기준 추정 경로를 표시합니다.")
+                    distance_m, duration_s = route_summary(route_json)
+                    if duration_s is not None:
+                        st.write(f"예상 소요시간: {duration_s/60:.0f}분 ({distance_m/1000:.1f} km)")
                     # 지도에 경로 그리기
-                    m2 = folium.Map(location=[(user_lat+sel_row['lat'])/2, (user_lon+sel_row['lon'])/2], zoom_start=12)
-                    folium.GeoJson(route_json, name='route').add_to(m2)
-                    folium.Marker([user_lat, user_lon], tooltip='You', icon=folium.Icon(color='blue')).add_to(m2)
-                    folium.Marker([sel_row['lat'], sel_row['lon']], tooltip=sel_row['name'], icon=folium.Icon(color='red')).add_to(m2)
+                    m2 = route_map(from_lat, from_lon, sel_row, route_json)
                     st_folium(m2, width=700, height=450)
 
+            if st.button('이송 요청 (병상 임시 예약)'):
+                if ss.get('transfer'):
+                    # 같은 세션의 이전 예약은 돌려주고 다시 배정 (한 환자가 침대 두 개를 잡지 않도록)
+                    release_transfer(hospitals_df, ss.pop('transfer')['reservation_id'])
+                assigned = request_transfer(from_lat, from_lon, hospitals_df, ss.session_id)
+                if assigned['hospital_id'] is None:
+                    st.error('배정 가능한 병원이 없습니다. 119 에 연락하세요.')
+                else:
+                    ss.transfer = dict(assigned)
+
+            transfer = ss.get('transfer')
+            if transfer:
+                name = hospitals_df.loc[hospitals_df['id'] == transfer['hospital_id'], 'name'].iloc[0]
+                st.success(f"배정: {name} ({transfer['distance_km']:.1f} km) - 병상이 20분간 예약됩니다.")
+                if transfer['over_capacity']:
+                    st.warning('주변에 남은 분만 침대가 없어 가장 가까운 수용 병원으로 배정했습니다. 도착 전 전화로 확인하세요.')
+                if st.button('도착/취소 (예약 해제)'):
+                    release_transfer(hospitals_df, ss.pop('transfer')['reservation_id'])
+                    st.rerun()
+
             # 119 호출 또는 병원 전화 (모바일에서 tel: 작동)
             st.markdown(f"[{T['call_119']}](tel:119)")
             st.markdown(f"[{T['call_hospital']}](tel:010-0000-0000) - 병원 번호는 실제 데이터와 연동 필요")
@@ -285,9 +340,9 @@ def main():
             new_waiting = st.number_input('대기 인원', min_value=0, value=int(hosp_row['waiting']))
             new_beds = st.number_input('분만 가능 침대 수', min_value=0, value=int(hosp_row['delivery_beds']))
             if st.button('업데이트'):
-                ok = update_hospital_status(hospitals_df, sel_hosp, accepting=new_accepting, waiting=new_waiting, delivery_beds=new_beds)
+                ok = update_hospital_status(feed, hospitals_df, sel_hosp, accepting=new_accepting, waiting=new_waiting, delivery_beds=new_beds)
                 if ok:
-                    st.success('업데이트 성공. 새로고침 후 반영됩니다.')
+                    st.success('업데이트 성공. 열려 있는 모든 화면에 바로 반영됩니다.')
                 else:
                     st.error('업데이트 실패')
         else:
@@ -298,12 +353,14 @@ def main():
     st.subheader('데이터 다운로드 / 정책 제안')
     if st.button('지역별 병원 취약성 분석 생성'):
         # 예: 병원당 평균 평점과 수용여부를 합쳐 간단 취약지표 생성
-        hosp = load_hospitals()
+        hosp = live_hospitals(feed)
         fb = get_feedback_summary()
         merged = hosp.merge(fb, left_on='id', right_on='hospital_id', how='left')
         merged['avg_rating'] = merged['avg_rating'].fillna(0)
         # 취약성 지표: 수용여부(0/1), 분만침대, 대기인원, 평균평점
-        merged['vulnerability'] = merged.apply(lambda r: (0 if r['accepting'] else 1)*50 + max(0,5-r['avg_rating'])*5 + (0 if r['delivery_beds']>0 else 20) + r['waiting']*2, axis=1)
+        # (컬럼 단위 계산, 지역 격자 단위 분석은 python coverage_grid.py 참고)
+        merged['vulnerability'] = ((~merged['accepting'].astype(bool)) * 50 + (5 - merged['avg_rating']).clip(lower=0) * 5
+                                   + (merged['delivery_beds'] <= 0) * 20 + merged['waiting'] * 2)
         st.dataframe(merged[['id','name','accepting','delivery_beds','waiting','avg_rating','vulnerability']])
         csv = merged.to_csv(index=False).encode('utf-8')
         st.download_button('CSV 다운로드', data=csv, file_name='hospital_vulnerability.csv', mime='text/csv')
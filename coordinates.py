@@ -0,0 +1,93 @@
+# coordinates.py
+# 업로드 좌표 정규화 (NumPy 벡터화)
+# - 위도/경도 컬럼이 뒤바뀐 경우, 또는 평면 좌표(TM, EPSG:5186 중부원점 GRS80)인 경우를 값 범위로 판별
+# - 판별은 표본으로 한 번, 변환은 전체 배열에 한 번에 적용
+
+import numpy as np
+
+# 한반도(제주·독도 포함) 대략적 범위
+KOREA_LAT = (32.5, 39.5)
+KOREA_LON = (123.5, 132.5)
+
+# EPSG:5186 Korea 2000 / Central Belt 2010 (GRS80, 원점 38N 127E, k0=1, FE=200000, FN=600000)
+GRS80_A = 6378137.0
+GRS80_F = 1 / 298.257222101
+TM_LAT0 = 38.0
+TM_LON0 = 127.0
+TM_K0 = 1.0
+TM_FE = 200000.0
+TM_FN = 600000.0
+
+SYSTEMS = ("wgs84", "wgs84_swapped", "tm5186", "tm5186_swapped")
+SAMPLE_SIZE = 5000
+
+
+def _meridian_arc(phi, a, e2):
+    return a * ((1 - e2 / 4 - 3 * e2**2 / 64 - 5 * e2**3 / 256) * phi
+                - (3 * e2 / 8 + 3 * e2**2 / 32 + 45 * e2**3 / 1024) * np.sin(2 * phi)
+                + (15 * e2**2 / 256 + 45 * e2**3 / 1024) * np.sin(4 * phi)
+                - (35 * e2**3 / 3072) * np.sin(6 * phi))
+
+
+def tm_to_wgs84(x, y, lat0=TM_LAT0, lon0=TM_LON0, k0=TM_K0, fe=TM_FE, fn=TM_FN, a=GRS80_A, f=GRS80_F):
+    """횡메르카토르(TM) 평면좌표 (x=동향, y=북향, m) → (위도, 경도) 배열. Snyder 역변환 공식"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    e2 = 2 * f - f * f
+    ep2 = e2 / (1 - e2)
+    m = _meridian_arc(np.radians(lat0), a, e2) + (y - fn) / k0
+    mu = m / (a * (1 - e2 / 4 - 3 * e2**2 / 64 - 5 * e2**3 / 256))
+    e1 = (1 - np.sqrt(1 - e2)) / (1 + np.sqrt(1 - e2))
+    phi1 = (mu + (3 * e1 / 2 - 27 * e1**3 / 32) * np.sin(2 * mu)
+            + (21 * e1**2 / 16 - 55 * e1**4 / 32) * np.sin(4 * mu)
+            + (151 * e1**3 / 96) * np.sin(6 * mu)
+            + (1097 * e1**4 / 512) * np.sin(8 * mu))
+    sin1, cos1, tan1 = np.sin(phi1), np.cos(phi1), np.tan(phi1)
+    c1 = ep2 * cos1**2
+    t1 = tan1**2
+    n1 = a / np.sqrt(1 - e2 * sin1**2)
+    r1 = a * (1 - e2) / (1 - e2 * sin1**2) ** 1.5
+    d = (x - fe) / (n1 * k0)
+    lat = phi1 - (n1 * tan1 / r1) * (d**2 / 2
+                                     - (5 + 3 * t1 + 10 * c1 - 4 * c1**2 - 9 * ep2) * d**4 / 24
+                                     + (61 + 90 * t1 + 298 * c1 + 45 * t1**2 - 252 * ep2 - 3 * c1**2) * d**6 / 720)
+    lon = (d - (1 + 2 * t1 + c1) * d**3 / 6
+           + (5 - 2 * c1 + 28 * t1 - 3 * c1**2 + 8 * ep2 + 24 * t1**2) * d**5 / 120) / cos1
+    return np.degrees(lat), lon0 + np.degrees(lon)
+
+
+def apply_system(lat, lon, system):
+    """system 에 맞게 (lat 컬럼 값, lon 컬럼 값) → WGS84 (위도, 경도)"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if system == "wgs84_swapped":
+        return lon, lat
+    if system == "tm5186":
+        return tm_to_wgs84(lon, lat)   # lat 컬럼 = Y(북향), lon 컬럼 = X(동향)
+    if system == "tm5186_swapped":
+        return tm_to_wgs84(lat, lon)
+    return lat, lon
+
+
+def _in_korea_ratio(lat, lon):
+    if len(lat) == 0:
+        return 0.0
+    ok = (lat >= KOREA_LAT[0]) & (lat <= KOREA_LAT[1]) & (lon >= KOREA_LON[0]) & (lon <= KOREA_LON[1])
+    return float(ok.mean())
+
+
+def detect_system(lat, lon, sample_size=SAMPLE_SIZE):
+    """표본 좌표를 각 좌표계로 해석해 보고 한반도 범위에 가장 많이 들어오는 좌표계 이름"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid][:sample_size], lon[valid][:sample_size]
+    if len(lat) == 0:
+        return "wgs84"
+    # 도 단위처럼 보이면 평면좌표 후보는 건너뜀
+    projected = np.nanmedian(np.abs(np.concatenate([lat, lon]))) > 1000
+    candidates = SYSTEMS[2:] if projected else SYSTEMS[:2]
+    ratios = [_in_korea_ratio(*apply_system(lat, lon, s)) for s in candidates]
+    best = int(np.argmax(ratios))
+    # 어느 쪽도 그럴듯하지 않으면 원래 값 유지 (해외 데이터 등)
+    return candidates[best] if ratios[best] > 0.5 else "wgs84"
@@ -0,0 +1,314 @@
+# coverage_grid.py
+# 지역 격자 접근성(커버리지) 분석 — 오프라인 배치
+# - 지도 범위에 cell_km 간격 격자를 깔고, 모든 칸에서 가장 가까운 "수용 중" 병원까지 거리/ETA 를 한 번에 계산
+# - 최근접 판정: 위경도 → 단위구 3차원 벡터, 내적이 가장 큰 병원 = 대원거리가 가장 가까운 병원 (하버사인과 같은 구면 모델)
+#   칸 묶음 × 병원 행렬곱(BLAS) + argmax 이므로 칸마다 파이썬 루프가 없음
+# - 행 구간을 프로세스 풀로 나눠 모든 코어 사용 (각 프로세스가 자기 구간의 칸 좌표를 직접 생성 → 큰 배열 전송 없음)
+# - 시나리오(예: H003 수용 중단): 기준 결과에서 최근접 병원이 닫힌 칸만 다시 계산
+# - 인구 격자(lat, lon, population CSV)를 주면 칸별 인구로 가중한 요약 (없으면 칸 수 기준)
+# 사용법: python coverage_grid.py hospitals_sample.csv [--cell-km 0.5] [--bbox 36.9,38.3,126.3,127.9]
+#                                 [--close H003] [--close H001,H002] [--population pop.csv] [--out coverage] [--workers N]
+#   → coverage.csv (칸별 거리/ETA, 시나리오별 ETA), coverage.npz (래스터), 요약 표 출력
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hospital_search import EARTH_RADIUS_KM, as_bool_array, haversine_np
+from routing import FALLBACK_SPEED_KMH, ROAD_FACTOR
+from spatial_index import KM_PER_DEG_LAT
+
+MATRIX_ELEMENTS = 4_000_000   # 칸 묶음 × 병원 행렬 크기 상한 (float64 약 32MB)
+BBOX_MARGIN_DEG = 0.2
+ETA_THRESHOLDS_MIN = (30, 60)
+
+
+class Grid:
+    """위경도 등간격 격자 (행 = 위도 방향 남→북, 열 = 경도 방향 서→동). 칸 값은 칸 중심 좌표 기준"""
+
+    def __init__(self, lat_min, lat_max, lon_min, lon_max, cell_km=0.5):
+        self.cell_km = cell_km
+        self.dlat = cell_km / KM_PER_DEG_LAT
+        self.dlon = cell_km / (KM_PER_DEG_LAT * math.cos(math.radians((lat_min + lat_max) / 2)))
+        self.lat_min = lat_min
+        self.lon_min = lon_min
+        self.n_rows = max(int(math.ceil((lat_max - lat_min) / self.dlat)), 1)
+        self.n_cols = max(int(math.ceil((lon_max - lon_min) / self.dlon)), 1)
+
+    @classmethod
+    def around(cls, lats, lons, cell_km=0.5, margin=BBOX_MARGIN_DEG):
+        lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+        return cls(np.nanmin(lats) - margin, np.nanmax(lats) + margin,
+                   np.nanmin(lons) - margin, np.nanmax(lons) + margin, cell_km)
+
+    @property
+    def shape(self):
+        return self.n_rows, self.n_cols
+
+    @property
+    def size(self):
+        return self.n_rows * self.n_cols
+
+    def row_lats(self):
+        return self.lat_min + (np.arange(self.n_rows) + 0.5) * self.dlat
+
+    def col_lons(self):
+        return self.lon_min + (np.arange(self.n_cols) + 0.5) * self.dlon
+
+    def centers(self, row0=0, row1=None):
+        """행 구간 [row0, row1) 칸 중심 (위도 배열, 경도 배열) — 행 우선 평탄화"""
+        row1 = self.n_rows if row1 is None else row1
+        lat = np.repeat(self.row_lats()[row0:row1], self.n_cols)
+        lon = np.tile(self.col_lons(), row1 - row0)
+        return lat, lon
+
+    def cell_of(self, lats, lons):
+        """좌표 → 평탄화 칸 번호 (격자 밖은 -1)"""
+        r = np.floor((np.asarray(lats, dtype=float) - self.lat_min) / self.dlat)
+        c = np.floor((np.asarray(lons, dtype=float) - self.lon_min) / self.dlon)
+        inside = (r >= 0) & (r < self.n_rows) & (c >= 0) & (c < self.n_cols)
+        return np.where(inside, r * self.n_cols + c, -1).astype(np.int64)
+
+
+def unit_vectors(lats, lons):
+    """위경도 → 단위구 (N, 3) 벡터. 두 벡터 내적이 클수록 대원거리가 짧음"""
+    phi = np.radians(np.asarray(lats, dtype=float))
+    lam = np.radians(np.asarray(lons, dtype=float))
+    cos_phi = np.cos(phi)
+    return np.column_stack([cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)])
+
+
+def nearest_by_dot(points, targets, chunk=None):
+    """points(N,3) 각각의 최근접 targets(M,3) 위치와 거리(km). 행렬곱을 chunk 행씩 나눠 메모리 제한"""
+    n = len(points)
+    idx = np.full(n, -1, dtype=np.int32)
+    dist = np.full(n, np.inf, dtype=np.float32)
+    if len(targets) == 0 or n == 0:
+        return idx, dist
+    chunk = chunk or max(MATRIX_ELEMENTS // len(targets), 1)
+    tt = np.ascontiguousarray(targets.T)
+    for s in range(0, n, chunk):
+        dots = points[s:s + chunk] @ tt
+        best = dots.argmax(axis=1)
+        cos = np.clip(dots[np.arange(len(best)), best], -1.0, 1.0)
+        idx[s:s + chunk] = best
+        # 가까운 거리에서 arccos 정밀도가 떨어지므로 현(chord) 길이로 계산: d = 2R·asin(|a-b|/2)
+        chord = np.sqrt(np.maximum(2.0 - 2.0 * cos, 0.0))
+        dist[s:s + chunk] = 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+    return idx, dist
+
+
+def eta_from_distance(distance_km):
+    # routing.rank_by_eta 의 직선거리 추정식과 동일
+    return np.asarray(distance_km, dtype=np.float32) * np.float32(ROAD_FACTOR / FALLBACK_SPEED_KMH * 60)
+
+
+# --------------- 프로세스 풀 -----------------
+
+_worker_state = {}
+
+
+def _init_worker(grid, targets):
+    _worker_state['grid'] = grid
+    _worker_state['targets'] = targets
+
+
+def _rows_task(bounds):
+    row0, row1 = bounds
+    grid = _worker_state['grid']
+    lat, lon = grid.centers(row0, row1)
+    return row0, nearest_by_dot(unit_vectors(lat, lon), _worker_state['targets'])
+
+
+def _row_blocks(n_rows, workers):
+    # 작업 수를 코어 수보다 넉넉히 (끝나는 시간 편차 흡수)
+    n_blocks = min(n_rows, max(workers * 4, 1))
+    edges = np.linspace(0, n_rows, n_blocks + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def nearest_grid(grid, lats, lons, workers=None):
+    """모든 칸의 최근접 지점 (위치 배열, 거리 배열) — 각각 grid.size 길이, 행 우선"""
+    targets = unit_vectors(lats, lons)
+    workers = workers or os.cpu_count() or 1
+    idx = np.empty(grid.size, dtype=np.int32)
+    dist = np.empty(grid.size, dtype=np.float32)
+    blocks = _row_blocks(grid.n_rows, workers)
+
+    def store(results):
+        for row0, (i, d) in results:
+            s = row0 * grid.n_cols
+            idx[s:s + len(i)] = i
+            dist[s:s + len(d)] = d
+
+    if workers == 1:
+        _init_worker(grid, targets)
+        store(map(_rows_task, blocks))
+    else:
+        # 작업자에서 예외가 나도 풀/프로세스를 정리
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(grid, targets)) as pool:
+            store(pool.map(_rows_task, blocks))
+    return idx, dist
+
+
+# --------------- 분석 -----------------
+
+def accepting_mask(hospitals_df, require_beds=False):
+    ok = as_bool_array(hospitals_df['accepting']) if 'accepting' in hospitals_df.columns \
+        else np.ones(len(hospitals_df), dtype=bool)
+    if require_beds and 'delivery_beds' in hospitals_df.columns:
+        ok &= pd.to_numeric(hospitals_df['delivery_beds'], errors='coerce').fillna(0).to_numpy() > 0
+    return ok & np.isfinite(hospitals_df['lat'].to_numpy(dtype=float)) & np.isfinite(hospitals_df['lon'].to_numpy(dtype=float))
+
+
+def run_coverage(hospitals_df, grid, scenarios=None, require_beds=False, workers=None):
+    """기준 + 시나리오별 칸 결과 dict
+
+    scenarios: {이름: 수용 중단할 병원 id 목록}
+    반환: {이름: {'hospital': 최근접 병원 위치(iloc, 없으면 -1), 'distance_km': ..., 'eta_min': ...}}
+    """
+    lat = hospitals_df['lat'].to_numpy(dtype=float)
+    lon = hospitals_df['lon'].to_numpy(dtype=float)
+    ids = hospitals_df['id'].astype(str).to_numpy() if 'id' in hospitals_df.columns \
+        else np.arange(len(hospitals_df)).astype(str)
+    open_mask = accepting_mask(hospitals_df, require_beds)
+    open_pos = np.flatnonzero(open_mask)
+    near, dist = nearest_grid(grid, lat[open_pos], lon[open_pos], workers)
+    hospital = np.where(near >= 0, open_pos[near.clip(0)] if len(open_pos) else -1, -1).astype(np.int32)
+    results = {'baseline': {'hospital': hospital, 'distance_km': dist, 'eta_min': eta_from_distance(dist)}}
+
+    for name, closed_ids in (scenarios or {}).items():
+        closed = np.isin(ids, [str(c) for c in closed_ids]) & open_mask
+        remaining = np.flatnonzero(open_mask & ~closed)
+        s_hospital = hospital.copy()
+        s_dist = dist.copy()
+        # 최근접 병원이 닫힌 칸만 남은 병원 중에서 다시 찾기
+        affected = np.flatnonzero(np.isin(hospital, np.flatnonzero(closed)))
+        if len(affected):
+            lat_c, lon_c = grid.centers()
+            n, d = nearest_by_dot(unit_vectors(lat_c[affected], lon_c[affected]),
+                                  unit_vectors(lat[remaining], lon[remaining]))
+            s_hospital[affected] = np.where(n >= 0, remaining[n.clip(0)] if len(remaining) else -1, -1)
+            s_dist[affected] = d
+        results[name] = {'hospital': s_hospital, 'distance_km': s_dist, 'eta_min': eta_from_distance(s_dist)}
+    return results
+
+
+def population_grid(grid, population_df):
+    """(lat, lon, population) 점/칸 자료 → 격자 칸별 인구 합 (grid.size 길이)"""
+    cells = grid.cell_of(population_df['lat'], population_df['lon'])
+    inside = cells >= 0
+    weights = pd.to_numeric(population_df['population'], errors='coerce').fillna(0).to_numpy()[inside]
+    return np.bincount(cells[inside], weights=weights, minlength=grid.size)
+
+
+def summarize(results, weights=None, thresholds=ETA_THRESHOLDS_MIN):
+    """시나리오별 요약: 평균/90% ETA, 임계 시간 안에 닿는 비율, 기준 대비 나빠진 칸(인구)"""
+    base = results['baseline']['eta_min']
+    w = np.ones(len(base)) if weights is None else np.asarray(weights, dtype=float)
+    total = w.sum()
+    rows = []
+    for name, r in results.items():
+        eta = r['eta_min'].astype(float)
+        finite = np.isfinite(eta)
+        ww = np.where(finite, w, 0)
+        order = np.argsort(np.where(finite, eta, np.inf), kind='stable')
+        cum = np.cumsum(ww[order])
+        p90 = eta[order][min(np.searchsorted(cum, 0.9 * cum[-1]), len(order) - 1)] if cum[-1] > 0 else np.nan
+        row = {'scenario': name,
+               'mean_eta_min': float((eta[finite] * w[finite]).sum() / max(ww.sum(), 1e-12)),
+               'p90_eta_min': float(p90)}
+        for t in thresholds:
+            row[f'within_{t}min'] = float(w[finite & (eta <= t)].sum() / total) if total else np.nan
+        worse = eta > base + 1e-3
+        row['worse_cells'] = int(worse.sum())
+        row['worse_weight'] = float(w[worse].sum())
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def coverage_frame(grid, results, hospitals_df, weights=None):
+    """칸별 결과 DataFrame (lat, lon, [population], 기준 최근접 병원/거리/ETA, 시나리오별 ETA)"""
+    lat, lon = grid.centers()
+    out = pd.DataFrame({'lat': lat.round(5), 'lon': lon.round(5)})
+    if weights is not None:
+        out['population'] = weights
+    ids = hospitals_df['id'].astype(str).to_numpy() if 'id' in hospitals_df.columns else None
+    base = results['baseline']
+    if ids is not None:
+        out['nearest_id'] = np.where(base['hospital'] >= 0, ids[base['hospital'].clip(0)], '')
+    out['distance_km'] = base['distance_km'].round(3)
+    out['eta_min'] = base['eta_min'].round(1)
+    for name, r in results.items():
+        if name != 'baseline':
+            out[f'eta_min[{name}]'] = r['eta_min'].round(1)
+    return out
+
+
+def save_raster(path, grid, results, weights=None):
+    """시나리오별 (행, 열) ETA/거리 래스터를 npz 로 저장 (행 0 = 남쪽)"""
+    arrays = {'lat_min': grid.lat_min, 'lon_min': grid.lon_min, 'dlat': grid.dlat, 'dlon': grid.dlon}
+    for name, r in results.items():
+        arrays[f'{name}/eta_min'] = r['eta_min'].reshape(grid.shape)
+        arrays[f'{name}/distance_km'] = r['distance_km'].reshape(grid.shape)
+        arrays[f'{name}/hospital'] = r['hospital'].reshape(grid.shape)
+    if weights is not None:
+        arrays['population'] = np.asarray(weights).reshape(grid.shape)
+    np.savez_compressed(path, **arrays)
+
+
+def check_sample(grid, results, hospitals_df, require_beds=False, n=2000, seed=0):
+    """무작위 칸 n 개를 하버사인 전수 비교로 검증. 최대 거리 오차(km) 반환"""
+    rng = np.random.default_rng(seed)
+    cells = rng.integers(0, grid.size, min(n, grid.size))
+    lat_c, lon_c = grid.centers()
+    open_pos = np.flatnonzero(accepting_mask(hospitals_df, require_beds))
+    lat = hospitals_df['lat'].to_numpy(dtype=float)[open_pos]
+    lon = hospitals_df['lon'].to_numpy(dtype=float)[open_pos]
+    exact = np.array([haversine_np(lat_c[c], lon_c[c], lat, lon).min() for c in cells])
+    return float(np.abs(exact - results['baseline']['distance_km'][cells]).max())
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from csv_ingest import ingest_csv
+
+    parser = argparse.ArgumentParser(description='격자 접근성(최근접 수용 병원 거리/ETA) 분석')
+    parser.add_argument('hospitals', help='병원 CSV 또는 정규화 Parquet')
+    parser.add_argument('--cell-km', type=float, default=0.5)
+    parser.add_argument('--bbox', help='lat_min,lat_max,lon_min,lon_max (기본: 병원 범위 + 여유)')
+    parser.add_argument('--close', action='append', default=[], help='시나리오: 수용 중단 병원 id (쉼표로 여러 개)')
+    parser.add_argument('--require-beds', action='store_true', help='분만침대가 0 인 병원도 제외')
+    parser.add_argument('--population', help='인구 CSV (lat, lon, population 컬럼)')
+    parser.add_argument('--out', default='coverage', help='출력 파일 이름 앞부분 (.csv/.npz)')
+    parser.add_argument('--no-csv', action='store_true', help='칸별 CSV 생략 (래스터/요약만)')
+    parser.add_argument('--workers', type=int, default=None, help='프로세스 수 (기본: CPU 코어 수)')
+    args = parser.parse_args()
+
+    if args.hospitals.lower().endswith('.parquet'):
+        hospitals = pd.read_parquet(args.hospitals)
+    else:
+        with open(args.hospitals, 'rb') as f:
+            hospitals, _ = ingest_csv(f)
+    if args.bbox:
+        lat_min, lat_max, lon_min, lon_max = (float(v) for v in args.bbox.split(','))
+        grid = Grid(lat_min, lat_max, lon_min, lon_max, args.cell_km)
+    else:
+        grid = Grid.around(hospitals['lat'], hospitals['lon'], args.cell_km)
+    scenarios = {f"close {c}": c.split(',') for c in args.close}
+    print(f'격자 {grid.n_rows:,} x {grid.n_cols:,} = {grid.size:,}칸, 병원 {len(hospitals):,}개, 시나리오 {len(scenarios)}개')
+
+    t0 = time.perf_counter()
+    results = run_coverage(hospitals, grid, scenarios, args.require_beds, args.workers)
+    print(f'계산 {time.perf_counter() - t0:.1f}s (검증 최대 오차 {check_sample(grid, results, hospitals, args.require_beds) * 1000:.1f} m)')
+    weights = population_grid(grid, pd.read_csv(args.population)) if args.population else None
+    print(summarize(results, weights).to_string(index=False))
+    save_raster(args.out + '.npz', grid, results, weights)
+    if not args.no_csv:
+        coverage_frame(grid, results, hospitals, weights).to_csv(args.out + '.csv', index=False)
+    print(f'저장: {args.out}.npz' + ('' if args.no_csv else f', {args.out}.csv'))
@@ -0,0 +1,242 @@
+# csv_ingest.py
+# 병원 CSV 업로드 수집 파이프라인 (sehwa.py 용)
+# 1) 앞부분 바이트 샘플로 인코딩을 한 번만 판별
+# 2) 헤더만 읽어 guess_columns 로 필요한 컬럼(lat/lon/name/tel/addr)만 골라냄
+# 3) chunksize 단위로 파싱하면서 조각마다 좌표 변환 + 결측 제거
+#    (첫 조각에서 위경도 뒤바뀜/TM 평면좌표 여부를 판별해 모든 조각에 같은 변환 적용, 컬럼별 소요시간 기록)
+# 4) 정리된 조각만 모아 최종 DataFrame 생성 → 파일 전체를 한 번만 파싱, 최대 메모리는 조각 크기로 제한
+# ingest_cached: 업로드 바이트의 SHA-256 을 키로 정규화 결과를 프로세스 공용 LRU 에 보관
+#   (같은 파일이면 재실행/다른 사용자 업로드 모두 파싱 없이 재사용, 전체 메모리 상한으로 제한)
+#   캐시 전에 전화/길찾기 링크 컬럼도 미리 계산
+
+import codecs
+import hashlib
+import io
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from coordinates import apply_system, detect_system
+from presentation import add_link_columns
+
+ENCODINGS = ("utf-8", "utf-8-sig", "cp949", "euc-kr", "latin1")
+SAMPLE_BYTES = 256 * 1024
+CHUNK_ROWS = 50_000
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 캐시된 DataFrame 메모리 합계 상한
+HASH_BLOCK = 1024 * 1024
+
+COLUMN_CANDIDATES = {
+    "lat":  ["lat", "위도", "병원위도", "Latitude", "latitude", "Y", "y"],
+    "lon":  ["lon", "경도", "병원경도", "Longitude", "longitude", "X", "x"],
+    "name": ["name", "병원명", "기관명", "기관명(국문)", "요양기관명"],
+    "tel":  ["tel", "전화", "전화번호", "대표전화", "응급전화", "응급실전화"],
+    "addr": ["addr", "주소", "도로명주소", "지번주소"],
+    # code.py 병원 목록/정규화 레지스트리의 식별자·상태 컬럼 (있을 때만 유지)
+    "id": ["id", "hpid", "기관ID"],
+    "accepting": ["accepting"],
+    "waiting": ["waiting"],
+    "delivery_beds": ["delivery_beds"],
+}
+TEXT_KEYS = ("id", "name", "tel", "addr")
+# 정확히 일치하는 이름이 없을 때 정규화된 컬럼명(소문자, 공백/기호 제거)에 포함되는지로 찾는 패턴
+COLUMN_PATTERNS = {
+    "lat":  ["위도", "latitude", "lat", "y좌표", "좌표y"],
+    "lon":  ["경도", "longitude", "lon", "lng", "x좌표", "좌표x"],
+    "name": ["병원명", "기관명", "의료기관명", "명칭"],
+    "tel":  ["전화", "tel", "phone"],
+    "addr": ["주소", "address", "addr"],
+}
+MISSING_COORDS_MSG = "위도/경도 컬럼을 찾지 못했습니다. CSV에 'lat/lon' 또는 '위도/경도' 혹은 '병원위도/병원경도' 컬럼이 필요해요."
+
+
+def coerce_float(series):
+    """문자열 좌표를 안전하게 float로 변환
+
+    대부분의 값은 pd.to_numeric 한 번(C 파서)으로 끝내고, 실패한 값(천단위 쉼표, 앞뒤 공백 등)만
+    골라서 문자열 정리 후 다시 변환한다. 전체 컬럼을 object 문자열로 여러 번 복사하지 않음.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    values = pd.to_numeric(series, errors="coerce")
+    bad = values.isna() & series.notna()
+    if bad.any():
+        cleaned = series[bad].astype(str).str.replace(",", "", regex=False).str.strip()
+        values[bad] = pd.to_numeric(cleaned, errors="coerce")
+    return values.astype(float)
+
+
+def _normalize_name(name):
+    return re.sub(r"[\s_\-()\[\]/.]", "", str(name)).lower()
+
+
+def guess_columns(df):
+    """CSV마다 다른 컬럼명을 자동 매핑 (병원위도/병원경도 추가됨). DataFrame 또는 컬럼 목록
+
+    1) 후보 이름과 정확히 일치 2) 대소문자/공백/기호 무시하고 일치 3) 패턴 포함 (예: '응급실 위도(WGS84)')
+    """
+    columns = list(getattr(df, "columns", df))
+    normalized = {c: _normalize_name(c) for c in columns}
+    used = set()
+
+    def pick(key):
+        cands = COLUMN_CANDIDATES[key]
+        for c in cands:
+            if c in columns and c not in used:
+                return c
+        norm_cands = {_normalize_name(c) for c in cands}
+        for c in columns:
+            if c not in used and normalized[c] in norm_cands:
+                return c
+        for pattern in COLUMN_PATTERNS.get(key, []):
+            for c in columns:
+                if c not in used and pattern in normalized[c]:
+                    return c
+        return None
+
+    colmap = {}
+    for key in COLUMN_CANDIDATES:
+        colmap[key] = pick(key)
+        if colmap[key]:
+            used.add(colmap[key])
+    return colmap
+
+
+def detect_encoding(sample):
+    """바이트 샘플을 디코딩해 보고 첫 번째로 성공하는 인코딩 (샘플 끝에서 잘린 멀티바이트 문자는 허용)"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def _as_binary(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def _normalize_chunk(chunk, colmap, system=None, timings=None):
+    """조각 하나 정리 → (DataFrame, 좌표계). system 이 None 이면 이 조각으로 판별"""
+    timings = timings if timings is not None else {}
+    chunk = chunk.rename(columns={src: dst for dst, src in colmap.items() if src})
+    for col in ("lat", "lon"):
+        t0 = time.perf_counter()
+        chunk[col] = coerce_float(chunk[col])
+        timings[col] = timings.get(col, 0.0) + time.perf_counter() - t0
+    t0 = time.perf_counter()
+    if system is None:
+        system = detect_system(chunk["lat"].to_numpy(), chunk["lon"].to_numpy())
+    if system != "wgs84":
+        lat, lon = apply_system(chunk["lat"].to_numpy(), chunk["lon"].to_numpy(), system)
+        chunk["lat"], chunk["lon"] = lat, lon
+    timings["coords"] = timings.get("coords", 0.0) + time.perf_counter() - t0
+    return chunk.dropna(subset=["lat", "lon"]), system
+
+
+def ingest_csv(source, chunksize=CHUNK_ROWS):
+    """업로드 파일(파일 객체/바이트)을 정규화된 병원 DataFrame 으로 변환 → (DataFrame, 정보 dict)
+
+    정보: encoding, colmap, coord_system, timings(컬럼별 초), rows_read, rows_kept. 위도/경도 컬럼이 없으면 ValueError.
+    """
+    f = _as_binary(source)
+    f.seek(0)  # Streamlit 재실행 사이에 같은 업로드 객체의 읽기 위치가 남아 있을 수 있음
+    sample = f.read(SAMPLE_BYTES)
+    tried = []
+    encodings = [detect_encoding(sample), *ENCODINGS]
+    for enc in dict.fromkeys(e for e in encodings if e):
+        f.seek(0)
+        try:
+            header = pd.read_csv(f, encoding=enc, nrows=0).columns
+            colmap = guess_columns(header)
+            if not colmap["lat"] or not colmap["lon"]:
+                raise ValueError(MISSING_COORDS_MSG)
+            usecols = [c for c in colmap.values() if c]
+            text_cols = {c: str for k, c in colmap.items() if c and k in TEXT_KEYS}
+            f.seek(0)
+            parts, rows_read, system, timings = [], 0, None, {}
+            t0 = time.perf_counter()
+            for chunk in pd.read_csv(f, encoding=enc, usecols=usecols, dtype=text_cols, chunksize=chunksize):
+                rows_read += len(chunk)
+                part, system = _normalize_chunk(chunk, colmap, system, timings)
+                parts.append(part)
+            timings["total"] = time.perf_counter() - t0
+        except UnicodeDecodeError:
+            # 샘플 뒤쪽에서 디코딩 실패한 드문 경우에만 다음 인코딩으로 재시도
+            tried.append(enc)
+            continue
+        if parts:
+            df = pd.concat(parts, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=[k for k, c in colmap.items() if c])
+        info = {"encoding": enc, "colmap": colmap, "coord_system": system or "wgs84", "timings": timings,
+                "rows_read": rows_read, "rows_kept": len(df)}
+        return df, info
+    raise ValueError(f"CSV 인코딩을 읽지 못했습니다. ({'/'.join(tried)} 시도 실패)")
+
+
+def ingest_parquet(source):
+    """정규화 레지스트리(Parquet) 업로드: 필요한 컬럼만 읽음 (pyarrow 필요)"""
+    import pyarrow.parquet as pq
+
+    f = _as_binary(source)
+    f.seek(0)
+    colmap = guess_columns(pq.ParquetFile(f).schema_arrow.names)
+    if not colmap["lat"] or not colmap["lon"]:
+        raise ValueError(MISSING_COORDS_MSG)
+    f.seek(0)
+    table = pd.read_parquet(f, columns=[c for c in colmap.values() if c])
+    rows_read = len(table)
+    timings = {}
+    df, system = _normalize_chunk(table, colmap, timings=timings)
+    df = df.reset_index(drop=True)
+    return df, {"encoding": "parquet", "colmap": colmap, "coord_system": system, "timings": timings,
+                "rows_read": rows_read, "rows_kept": len(df)}
+
+
+_cache = OrderedDict()  # sha256 -> (DataFrame, 정보 dict, 메모리 bytes)
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def content_hash(source):
+    """파일 객체/바이트의 SHA-256 (1MB 블록 단위로 읽어 사본을 만들지 않음)"""
+    f = _as_binary(source)
+    f.seek(0)
+    h = hashlib.sha256()
+    for block in iter(lambda: f.read(HASH_BLOCK), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def ingest_cached(source, chunksize=CHUNK_ROWS):
+    """ingest_csv 결과를 내용 해시로 캐시. 반환 DataFrame 은 공유 객체이므로 수정 전 .copy() 필요"""
+    global _cache_bytes
+    digest = content_hash(source)
+    with _cache_lock:
+        hit = _cache.get(digest)
+        if hit is not None:
+            _cache.move_to_end(digest)
+            return hit[0], dict(hit[1], cached=True)
+    if str(getattr(source, "name", "")).lower().endswith(".parquet"):
+        df, info = ingest_parquet(source)
+    else:
+        df, info = ingest_csv(source, chunksize)
+    add_link_columns(df)  # 병원에만 의존하는 표시용 링크는 여기서 한 번만 계산
+    df.attrs["dataset_key"] = ("upload", digest)
+    size = int(df.memory_usage(deep=True).sum())
+    with _cache_lock:
+        if digest not in _cache and size <= CACHE_MAX_BYTES:
+            _cache[digest] = (df, info, size)
+            _cache_bytes += size
+            while _cache_bytes > CACHE_MAX_BYTES:
+                _, (_, _, old_size) = _cache.popitem(last=False)
+                _cache_bytes -= old_size
+    return df, dict(info, cached=False)
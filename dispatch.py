@@ -0,0 +1,231 @@
+# dispatch.py
+# 동시 다발 이송 요청 배정 (병원 쏠림 방지)
+# - 배정할 때마다 병원 분만침대를 잠깐 예약(ReservationBook, 기본 20분 후 자동 만료)하고,
+#   이후 요청/검색은 "남은 침대 = delivery_beds - 예약 수", "대기 = waiting + 예약 수" 로 점수 계산
+#   → 같은 순간의 여러 구급차가 한 병원으로 몰리지 않음
+# - 배치 배정: 요청마다 공간 인덱스로 가까운 후보 K개를 뽑아 (요청 × 후보) 점수 행렬을 만들고,
+#   1·2순위 점수 차(regret)가 가장 큰 요청부터 하나씩 배정 (배정된 병원 열만 다시 계산하는 탐욕 + 예약)
+# - 남은 침대가 없는 병원은 OVER_CAPACITY_PENALTY 를 더하고, 후보 K개가 모두 찼으면 그 요청만 범위를 넓혀 다시 찾음
+#   (어디에도 침대가 없을 때만 over_capacity=True 로 배정)
+# 처리량 측정: python bench_dispatch.py
+
+import heapq
+import itertools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from hospital_search import as_bool_array, score_arrays
+
+RESERVATION_TTL_S = 20 * 60
+CANDIDATES = 16
+OVER_CAPACITY_PENALTY = 500
+
+
+class ReservationBook:
+    """병원별 임시 침대 예약 (만료 시각이 지나면 자동 해제, 스레드 안전)"""
+
+    def __init__(self, ttl=RESERVATION_TTL_S, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._held = {}      # hospital_id -> 예약 수
+        self._active = {}    # reservation_id -> (hospital_id, 만료 시각)
+        self._expiry = []    # (만료 시각, reservation_id) 힙
+        self._ids = itertools.count(1)
+
+    def _purge(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, rid = heapq.heappop(self._expiry)
+            self._drop(rid)
+
+    def _drop(self, rid):
+        entry = self._active.pop(rid, None)
+        if entry is None:
+            return False
+        hid = entry[0]
+        self._held[hid] -= 1
+        if self._held[hid] <= 0:
+            del self._held[hid]
+        return True
+
+    def reserve(self, hospital_id, ttl=None):
+        """예약 하나 추가. (reservation_id, 만료 시각) 반환"""
+        with self._lock:
+            return self._reserve(hospital_id, ttl)
+
+    def _reserve(self, hospital_id, ttl=None):
+        now = self.clock()
+        self._purge(now)
+        rid = next(self._ids)
+        expires = now + (ttl or self.ttl)
+        self._active[rid] = (hospital_id, expires)
+        self._held[hospital_id] = self._held.get(hospital_id, 0) + 1
+        heapq.heappush(self._expiry, (expires, rid))
+        return rid, expires
+
+    def release(self, reservation_id):
+        """도착/취소 시 예약 해제 (이미 만료됐으면 False)"""
+        with self._lock:
+            return self._drop(reservation_id)
+
+    def held(self):
+        """현재 유효한 {hospital_id: 예약 수}"""
+        with self._lock:
+            self._purge(self.clock())
+            return dict(self._held)
+
+    def __len__(self):
+        with self._lock:
+            self._purge(self.clock())
+            return len(self._active)
+
+
+def apply_holds(hospitals_df, held, key='id'):
+    """예약 수만큼 waiting 을 늘리고 delivery_beds 를 줄인 사본 (예약이 없으면 원본 그대로)"""
+    if not held:
+        return hospitals_df
+    n = hospitals_df[key].astype(str).map(held).fillna(0).to_numpy(dtype=int)
+    df = hospitals_df.copy()
+    df['waiting'] = df['waiting'].to_numpy() + n
+    df['delivery_beds'] = np.maximum(df['delivery_beds'].to_numpy() - n, 0)
+    df.attrs = dict(hospitals_df.attrs)
+    return df
+
+
+class Dispatcher:
+    """병원 목록 + 공간 인덱스 + 예약장부로 이송 요청 배정"""
+
+    def __init__(self, hospitals_df, index, book=None, candidates=CANDIDATES):
+        self.index = index
+        self.book = book if book is not None else ReservationBook()  # 빈 장부도 len()==0 이라 or 를 쓰면 바뀜
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self.update(hospitals_df)
+
+    def update(self, hospitals_df):
+        """병원 상태가 바뀌면 호출 (좌표/순서는 index 와 같아야 함)"""
+        ids = hospitals_df['id'].astype(str).to_numpy()
+        with self._lock:
+            if getattr(self, 'ids', None) is None or not np.array_equal(ids, self.ids):
+                self.ids = ids
+                self.positions = {hid: i for i, hid in enumerate(ids)}
+            self.hospitals = hospitals_df
+            self.status_rev = hospitals_df.attrs.get('status_rev', 0)
+            self.accepting = as_bool_array(hospitals_df['accepting'])
+            self.beds = pd.to_numeric(hospitals_df['delivery_beds'], errors='coerce').fillna(0).to_numpy(dtype=int)
+            self.waiting = pd.to_numeric(hospitals_df['waiting'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    def _candidates(self, lats, lons):
+        # 요청별 가까운 후보 K개 (부족하면 -1 로 채움) → (R, K) 위치, 거리
+        k = min(self.candidates, self.index.n_valid)
+        rows = np.full((len(lats), k), -1, dtype=np.int64)
+        dist = np.full((len(lats), k), np.inf)
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            if not (np.isfinite(lat) and np.isfinite(lon)):
+                continue  # 좌표가 없는 요청: 후보 없음
+            r, d = self.index.nearest(lat, lon, k)
+            rows[i, :len(r)] = r
+            dist[i, :len(d)] = d
+        return rows, dist
+
+    def _scores(self, rows, dist, held):
+        safe = rows.clip(0)
+        h = held[safe]
+        beds_left = self.beds[safe] - h
+        score = score_arrays(dist.ravel(), self.accepting[safe].ravel(), np.maximum(beds_left, 0).ravel(),
+                             (self.waiting[safe] + h).ravel()).reshape(rows.shape)
+        score += np.where(beds_left <= 0, OVER_CAPACITY_PENALTY, 0)
+        return np.where(rows >= 0, score, np.inf)
+
+    def _usable(self, pos, held):
+        return self.accepting[pos] and held[pos] < self.beds[pos]
+
+    def _widen(self, lat, lon, held, k):
+        # 후보 K개가 모두 찼거나 수용 불가면 범위를 넓혀 남은 침대가 있는 병원을 찾음 (없으면 가장 나은 곳)
+        while True:
+            k = min(k * 4, self.index.n_valid)
+            r, d = self.index.nearest(lat, lon, k)
+            sc = self._scores(r[None, :], d[None, :], held)[0]
+            b = int(np.argmin(sc))
+            if self._usable(r[b], held) or k >= self.index.n_valid:
+                return int(r[b]), d[b], sc[b]
+
+    def assign(self, requests):
+        """requests: request_id, lat, lon 컬럼 DataFrame → 배정 결과 DataFrame
+
+        결과 컬럼: request_id, hospital_id, distance_km, score, reservation_id, over_capacity
+        """
+        req_ids = requests['request_id'].to_numpy()
+        lats = requests['lat'].to_numpy(dtype=float)
+        lons = requests['lon'].to_numpy(dtype=float)
+        rows, dist = self._candidates(lats, lons)
+        n = len(req_ids)
+        out_pos = np.full(n, -1, dtype=np.int64)
+        out_dist = np.full(n, np.nan)
+        out_score = np.full(n, np.nan)
+        out_rid = np.zeros(n, dtype=np.int64)
+        out_over = np.zeros(n, dtype=bool)
+        with self._lock, self.book._lock:
+            self.book._purge(self.book.clock())
+            held = np.zeros(len(self.ids), dtype=int)
+            for hid, cnt in self.book._held.items():
+                pos = self.positions.get(hid)
+                if pos is not None:
+                    held[pos] = cnt
+            score = self._scores(rows, dist, held)
+            pending = np.ones(n, dtype=bool)
+            second = min(1, score.shape[1] - 1)
+            for _ in range(n):
+                # regret = 2순위 - 1순위 점수: 대안이 나쁜 요청부터 배정 (후보가 하나뿐이면 inf)
+                part = np.partition(score, second, axis=1)
+                with np.errstate(invalid='ignore'):
+                    regret = part[:, second] - part[:, 0]
+                regret = np.where(pending, np.nan_to_num(regret, nan=0.0, posinf=np.finfo(float).max), -1.0)
+                i = int(np.argmax(regret))
+                j = int(np.argmin(score[i]))
+                pending[i] = False
+                if not np.isfinite(score[i, j]):
+                    continue  # 후보 없음 (좌표가 없는 요청 등)
+                pos, d, sc = int(rows[i, j]), dist[i, j], score[i, j]
+                if not self._usable(pos, held) and rows.shape[1] < self.index.n_valid:
+                    pos, d, sc = self._widen(lats[i], lons[i], held, rows.shape[1])
+                out_over[i] = not self._usable(pos, held)
+                out_pos[i], out_dist[i], out_score[i] = pos, d, sc
+                out_rid[i] = self.book._reserve(self.ids[pos])[0]
+                held[pos] += 1
+                score[i] = np.inf
+                # 방금 배정한 병원을 후보로 가진 대기 요청만 점수 갱신
+                r_idx = np.flatnonzero(((rows == pos) & pending[:, None]).any(axis=1))
+                if len(r_idx):
+                    score[r_idx] = self._scores(rows[r_idx], dist[r_idx], held)
+        return pd.DataFrame({
+            'request_id': req_ids,
+            'hospital_id': np.where(out_pos >= 0, self.ids[out_pos.clip(0)], None),
+            'distance_km': out_dist,
+            'score': out_score,
+            'reservation_id': np.where(out_pos >= 0, out_rid, 0),
+            'over_capacity': out_over,
+        })
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(hospitals_df, index, key=None):
+    """데이터셋(key)별로 프로세스에 하나. 같은 데이터셋이면 상태만 update (예약장부는 유지)
+
+    같은 DataFrame 객체라도 status_feed.apply_delta 로 제자리 수정됐으면(attrs['status_rev']) 다시 update
+    """
+    key = key if key is not None else hospitals_df.attrs.get('dataset_key')
+    with _dispatchers_lock:
+        d = _dispatchers.get(key)
+        if d is None:
+            d = _dispatchers[key] = Dispatcher(hospitals_df, index)
+            return d
+    if d.hospitals is not hospitals_df or d.status_rev != hospitals_df.attrs.get('status_rev', 0):
+        d.update(hospitals_df)
+    return d
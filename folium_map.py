@@ -0,0 +1,107 @@
+# folium_map.py
+# code.py 의 folium 지도 생성 (st_folium 으로 보내는 HTML 크기를 병원 수와 무관하게 제한)
+# - 마커는 iterrows 로 하나씩 만들지 않고 배열([위도, 경도, 팝업]) 하나로 FastMarkerCluster 에 넘김
+#   → 파이썬 객체/HTML 조각이 마커 수만큼 생기지 않고, 브라우저에서 JS 콜백으로 생성
+# - max_markers 를 넘는 병원은 서버에서 격자로 묶어 "N개" 원 하나씩만 그림
+# - 같은 입력(위치·병원·상태)이면 만들어 둔 지도 객체를 LRU 캐시에서 재사용 (재실행/클릭마다 재생성 안 함)
+
+import hashlib
+import html
+import json
+import threading
+from collections import OrderedDict
+
+import folium
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from spatial_index import grid_clusters
+
+MAX_MARKERS = 500
+COORD_DECIMALS = 5  # 약 1m
+MAP_CACHE_SIZE = 64
+
+_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+}
+"""
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(key, build):
+    with _cache_lock:
+        m = _cache.get(key)
+        if m is not None:
+            _cache.move_to_end(key)
+            return m
+    m = build()
+    with _cache_lock:
+        _cache[key] = m
+        while len(_cache) > MAP_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return m
+
+
+def popup_html(df):
+    """병원 팝업 HTML 을 컬럼 단위 문자열 연산으로 생성 (이름은 HTML 이스케이프)"""
+    name = df['name'].astype(str).map(html.escape)
+    return ("<b>" + name + "</b><br/>distance: " + df['distance_km'].map('{:.2f}'.format)
+            + " km<br/>waiting: " + df['waiting'].astype(str)
+            + "<br/>delivery_beds: " + df['delivery_beds'].astype(int).astype(str)
+            + "<br/>accepting: " + df['accepting'].astype(str))
+
+
+def frame_digest(df):
+    """지도에 보이는 값(위치·이름·상태·거리)만으로 만든 내용 해시 (행 순서 포함)"""
+    cols = [c for c in ['id', 'name', 'lat', 'lon', 'distance_km', 'accepting', 'waiting', 'delivery_beds']
+            if c in df.columns]
+    hashes = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def hospital_map(user_lat, user_lon, hospitals_df, zoom=12, max_markers=MAX_MARKERS):
+    """사용자 위치 + 병원 마커 지도 (hospitals_df 는 distance_km 포함, 가까운/추천 순 정렬 가정)"""
+    def build():
+        m = folium.Map(location=[user_lat, user_lon], zoom_start=zoom)
+        folium.Marker([user_lat, user_lon], tooltip='You', icon=folium.Icon(color='blue')).add_to(m)
+        top = hospitals_df.iloc[:max_markers]
+        data = list(zip(top['lat'].round(COORD_DECIMALS).tolist(), top['lon'].round(COORD_DECIMALS).tolist(),
+                        popup_html(top).tolist()))
+        FastMarkerCluster(data, callback=_MARKER_CALLBACK).add_to(m)
+        rest = hospitals_df.iloc[max_markers:]
+        if len(rest):
+            clusters = grid_clusters(rest['lat'].to_numpy(), rest['lon'].to_numpy(), max(zoom - 2, 0))
+            clusters = clusters.round({'lat': COORD_DECIMALS, 'lon': COORD_DECIMALS})
+            features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                         'properties': {'label': f'{count}개 병원', 'radius': min(6 + round(count ** 0.5), 30)}}
+                        for lat, lon, count in zip(clusters['lat'].tolist(), clusters['lon'].tolist(),
+                                                   clusters['count'].tolist())]
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': features},
+                name='기타 병원(묶음)',
+                marker=folium.CircleMarker(weight=1, fill=True, fill_opacity=0.4),
+                style_function=lambda f: {'radius': f['properties']['radius']},
+                tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False),
+            ).add_to(m)
+        return m
+    key = ('hospitals', round(user_lat, 5), round(user_lon, 5), zoom, max_markers, frame_digest(hospitals_df))
+    return _cached(key, build)
+
+
+def route_map(user_lat, user_lon, hospital, route_json, zoom=12):
+    """사용자 → 선택 병원 경로 지도 (hospital: lat/lon/name 을 가진 행)"""
+    def build():
+        m = folium.Map(location=[(user_lat + hospital['lat']) / 2, (user_lon + hospital['lon']) / 2], zoom_start=zoom)
+        folium.GeoJson(route_json, name='route').add_to(m)
+        folium.Marker([user_lat, user_lon], tooltip='You', icon=folium.Icon(color='blue')).add_to(m)
+        folium.Marker([hospital['lat'], hospital['lon']], tooltip=hospital['name'], icon=folium.Icon(color='red')).add_to(m)
+        return m
+    route_digest = hashlib.sha1(json.dumps(route_json, sort_keys=True).encode()).hexdigest()
+    key = ('route', round(user_lat, 5), round(user_lon, 5),
+           round(float(hospital['lat']), 5), round(float(hospital['lon']), 5), str(hospital['name']), route_digest)
+    return _cached(key, build)
@@ -0,0 +1,271 @@
+# forecast.py
+# 병원 혼잡 예측 (대기인원/분만침대) — 현재값이 아니라 구급차 도착 시점 값으로 순위 계산
+# - 입력: hospital_status 가 바뀔 때마다 트리거로 쌓이는 status_history (hospital_db.init_status_schema)
+# - 배치(주기 실행): 최근 HISTORY_DAYS 일 이력을 BIN_MIN 분 격자로 펼쳐(다음 변경 전까지 직전 값 유지) 병원별로
+#     · 하루 주기 시간대별 평균 (계절 기준선)
+#     · 지수가중평균(EWMA, 이력이 없는 시간대의 대체값)
+#   을 구하고, 계산 시각부터 FORECAST_SPAN_MIN 분까지 HORIZON_STEP_MIN 분 간격 기준선을 status_forecast 테이블에 저장
+# - 조회: 도착 시 예상값 = 기준선(도착 시각) + (현재값 - 기준선(지금)) × exp(-ETA / REVERSION_MIN)
+#   지금 붐비는 병원도 시간이 지나면 평소 수준으로 돌아간다고 보고, 병원당 배열 조회 2번 + 지수 1번 (O(1))
+# 배치 실행: python forecast.py [DB 경로] [--every 300]   (앱은 get_forecaster 로 프로세스 안에서 주기 실행)
+
+import logging
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from hospital_db import get_conn, init_status_schema
+from routing import FALLBACK_SPEED_KMH, ROAD_FACTOR
+
+HISTORY_DAYS = 14
+BIN_MIN = 30
+EWMA_HALF_LIFE_MIN = 180
+HORIZON_STEP_MIN = 5
+FORECAST_SPAN_MIN = 240      # 배치 주기 + 최대 ETA 를 덮도록
+REVERSION_MIN = 60           # 현재 편차가 기준선으로 돌아가는 시간 상수
+FORECAST_INTERVAL_S = 300
+FORECAST_COLUMNS = ['waiting', 'delivery_beds']
+
+log = logging.getLogger(__name__)
+
+
+def load_history(db_path, since):
+    """since(UTC datetime) 이후 이력 + 그 직전 병원별 마지막 상태 (격자 첫 칸을 채우기 위함)"""
+    conn = get_conn(db_path)
+    cols = 'hospital_id, ts, ' + ', '.join(FORECAST_COLUMNS)
+    since = since.isoformat()
+    df = pd.read_sql_query(f'''
+        SELECT {cols} FROM status_history WHERE ts >= ?
+        UNION ALL
+        SELECT {cols} FROM (
+            SELECT {cols}, ROW_NUMBER() OVER (PARTITION BY hospital_id ORDER BY ts DESC) AS rn
+            FROM status_history WHERE ts < ?
+        ) WHERE rn = 1
+    ''', conn, params=(since, since))
+    # isoformat() 은 마이크로초가 0 이면 '.ffffff' 를 빼므로 형식을 하나로 고정하지 않음
+    df['ts'] = pd.to_datetime(df['ts'], format='ISO8601')
+    return df.sort_values('ts', kind='stable').reset_index(drop=True)
+
+
+def status_grid(history, column, ids, start, n_bins, bin_min=BIN_MIN):
+    """이력 → (병원 수, n_bins) 격자. 각 칸은 그 칸에서 마지막으로 보고된 값, 보고가 없으면 직전 값 유지 (처음 전은 NaN)"""
+    grid = np.full((len(ids), n_bins), np.nan)
+    h = history[history[column].notna()]
+    if h.empty:
+        return grid
+    bins = ((h['ts'] - start) // pd.Timedelta(minutes=bin_min)).to_numpy().clip(0, n_bins - 1)
+    # 시각 순 정렬이므로 같은 칸에 여러 값이면 마지막 값만 사용
+    last = pd.DataFrame({'hospital_id': h['hospital_id'].to_numpy(), 'bin': bins, 'value': h[column].to_numpy(dtype=float)})
+    last = last.drop_duplicates(['hospital_id', 'bin'], keep='last')
+    grid[pd.Index(ids).get_indexer(last['hospital_id']), last['bin'].to_numpy()] = last['value'].to_numpy()
+    # 직전 값으로 채우기 (가로 방향 forward fill, 첫 보고 전 칸은 NaN 유지)
+    pos = np.where(np.isnan(grid), 0, np.arange(n_bins))
+    np.maximum.accumulate(pos, axis=1, out=pos)
+    return grid[np.arange(len(ids))[:, None], pos]
+
+
+def ewma_level(grid, bin_min=BIN_MIN, half_life_min=EWMA_HALF_LIFE_MIN):
+    """격자 마지막 칸 기준 지수가중평균 (NaN 칸 제외)"""
+    age = (grid.shape[1] - 1 - np.arange(grid.shape[1])) * bin_min
+    w = np.broadcast_to(0.5 ** (age / half_life_min), grid.shape)
+    valid = ~np.isnan(grid)
+    num = np.where(valid, grid * w, 0).sum(axis=1)
+    den = np.where(valid, w, 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return num / den
+
+
+def fit_baselines(history, now, days=HISTORY_DAYS, bin_min=BIN_MIN, span_min=FORECAST_SPAN_MIN,
+                  step_min=HORIZON_STEP_MIN):
+    """병원별 기준선 곡선 → (병원 id 배열, {컬럼: (병원 수, 구간 수) 배열})
+
+    구간 k 는 now + k*step_min 분 시점. 이력이 전혀 없는 병원은 결과에서 빠짐
+    """
+    slots_per_day = 24 * 60 // bin_min
+    now = pd.Timestamp(now)
+    day = now.floor('D')
+    start = day - pd.Timedelta(days=days - 1)
+    n_bins = days * slots_per_day
+    now_bin = int((now - start) // pd.Timedelta(minutes=bin_min))
+    minute_of_day = (now - day) // pd.Timedelta(minutes=1)
+    horizons = np.arange(0, span_min + step_min, step_min)
+    target_slot = (minute_of_day + horizons) // bin_min % slots_per_day
+    ids = history['hospital_id'].drop_duplicates().to_numpy()
+    curves = {}
+    keep = np.zeros(len(ids), dtype=bool)
+    for col in FORECAST_COLUMNS:
+        grid = status_grid(history, col, ids, start, n_bins, bin_min)
+        grid[:, now_bin + 1:] = np.nan  # 아직 오지 않은 칸
+        level = ewma_level(grid[:, :now_bin + 1], bin_min)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 이력이 없는 시간대 (Mean of empty slice)
+            profile = np.nanmean(grid.reshape(len(ids), days, slots_per_day), axis=1)
+        baseline = profile[:, target_slot]
+        curves[col] = np.where(np.isnan(baseline), level[:, None], baseline)
+        keep |= ~np.isnan(level)
+    return ids[keep], {col: c[keep] for col, c in curves.items()}
+
+
+# --------------- 저장/조회 -----------------
+
+def init_forecast_schema(db_path):
+    init_status_schema(db_path)
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS status_forecast (
+                hospital_id TEXT,
+                horizon_min INTEGER,
+                waiting REAL,
+                delivery_beds REAL,
+                computed_at TEXT,
+                PRIMARY KEY (hospital_id, horizon_min)
+            )
+        ''')
+
+
+def write_forecast(db_path, ids, curves, computed_at, step_min=HORIZON_STEP_MIN):
+    # 이전 예측을 한 트랜잭션 안에서 통째로 교체 (읽는 쪽은 WAL 로 이전/새 예측 중 하나만 봄)
+    n_h = curves['waiting'].shape[1]
+    horizons = np.arange(n_h) * step_min
+    rows = zip(np.repeat(ids, n_h).tolist(), np.tile(horizons, len(ids)).tolist(),
+               curves['waiting'].ravel().tolist(), curves['delivery_beds'].ravel().tolist(),
+               [computed_at.isoformat(timespec='microseconds')] * (len(ids) * n_h))
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('DELETE FROM status_forecast')
+        conn.executemany('INSERT INTO status_forecast VALUES (?, ?, ?, ?, ?)', rows)
+
+
+def read_forecast(db_path):
+    """status_forecast → ForecastTable (없으면 None)"""
+    df = pd.read_sql_query('SELECT * FROM status_forecast ORDER BY hospital_id, horizon_min', get_conn(db_path))
+    if df.empty:
+        return None
+    ids = df['hospital_id'].drop_duplicates().to_numpy()
+    n_h = len(df) // len(ids)
+    step = int(df['horizon_min'].iloc[1] - df['horizon_min'].iloc[0]) if n_h > 1 else HORIZON_STEP_MIN
+    curves = {col: df[col].to_numpy(dtype=float).reshape(len(ids), n_h) for col in FORECAST_COLUMNS}
+    return ForecastTable(ids, curves, pd.Timestamp(df['computed_at'].iloc[0]).to_pydatetime(), step)
+
+
+class ForecastTable:
+    """배치로 계산한 병원별 기준선 곡선 (메모리). expected() 는 병원당 O(1)"""
+
+    def __init__(self, ids, curves, computed_at, step_min=HORIZON_STEP_MIN):
+        self.index = pd.Index(ids)
+        self.curves = curves
+        self.computed_at = computed_at
+        self.step_min = step_min
+
+    def __len__(self):
+        return len(self.index)
+
+    @staticmethod
+    def eta_from_distance(distance_km):
+        # 경로 API 없이 직선거리로 추정한 도착까지 분 (routing.rank_by_eta 의 추정식과 동일)
+        return np.asarray(distance_km, dtype=float) * ROAD_FACTOR / FALLBACK_SPEED_KMH * 60
+
+    def _at(self, col, rows, minutes):
+        curve = self.curves[col]
+        k = np.clip(np.rint(minutes / self.step_min).astype(int), 0, curve.shape[1] - 1)
+        return curve[rows.clip(0), k]
+
+    def expected(self, ids, waiting, delivery_beds, eta_min, now=None):
+        """(도착 시 예상 대기인원, 도착 시 예상 분만침대) 배열. 예측이 없는 병원은 현재값 그대로"""
+        now = now or datetime.utcnow()
+        rows = self.index.get_indexer(np.asarray(ids, dtype=object))
+        known = rows >= 0
+        elapsed = max((now - self.computed_at).total_seconds() / 60, 0)
+        eta_min = np.asarray(eta_min, dtype=float)
+        decay = np.exp(-eta_min / REVERSION_MIN)
+        out = []
+        for col, live in (('waiting', waiting), ('delivery_beds', delivery_beds)):
+            live = np.asarray(live, dtype=float)
+            base_now = self._at(col, rows, np.full(len(rows), elapsed))
+            base_arrival = self._at(col, rows, elapsed + eta_min)
+            est = np.maximum(base_arrival + (live - base_now) * decay, 0)
+            out.append(np.where(known & np.isfinite(est), est, live))
+        expected_waiting, expected_beds = out
+        return expected_waiting, np.rint(expected_beds)
+
+
+# --------------- 배치 -----------------
+
+def run_batch(db_path, now=None, days=HISTORY_DAYS):
+    """이력 정리 + 기준선 계산 + 저장. 새 ForecastTable 반환 (이력이 없으면 None)"""
+    now = now or datetime.utcnow()
+    init_forecast_schema(db_path)
+    since = pd.Timestamp(now).floor('D') - pd.Timedelta(days=days - 1)
+    conn = get_conn(db_path)
+    # 보관 기간 이전 이력은 병원별 마지막 한 행만 남기고 삭제
+    with conn:
+        conn.execute('''
+            DELETE FROM status_history WHERE ts < ? AND rowid NOT IN (
+                SELECT MAX(rowid) FROM status_history WHERE ts < ? GROUP BY hospital_id)
+        ''', (since.isoformat(), since.isoformat()))
+    history = load_history(db_path, since.to_pydatetime())
+    if history.empty:
+        return None
+    ids, curves = fit_baselines(history, now, days)
+    write_forecast(db_path, ids, curves, now)
+    return ForecastTable(ids, curves, now)
+
+
+class Forecaster:
+    """interval 초마다 run_batch 를 돌리고 최신 ForecastTable 을 보관 (데몬 스레드)"""
+
+    def __init__(self, db_path, interval=FORECAST_INTERVAL_S):
+        self.db_path = db_path
+        self.interval = interval
+        init_forecast_schema(db_path)
+        self.table = read_forecast(db_path)
+        self.error = None   # 마지막 배치 실패 내용 (성공하면 None, 화면 경고용)
+        self._thread = threading.Thread(target=self._run, name='Forecaster', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            table = self.table
+            if table is None or datetime.utcnow() - table.computed_at >= timedelta(seconds=self.interval):
+                try:
+                    self.table = run_batch(self.db_path) or table
+                    self.error = None
+                except Exception as e:  # 배치 실패는 다음 주기에 다시 시도 (조회는 이전 예측 사용)
+                    log.exception('%s: forecast batch failed', self.db_path)
+                    self.error = f'{type(e).__name__}: {e}'
+            time.sleep(min(self.interval, 60))
+
+
+_forecasters = {}
+_forecasters_lock = threading.Lock()
+
+
+def get_forecaster(db_path, interval=FORECAST_INTERVAL_S):
+    """DB 별로 프로세스에 하나 (Streamlit 재실행에도 스레드/예측 유지)"""
+    with _forecasters_lock:
+        f = _forecasters.get(db_path)
+        if f is None:
+            f = _forecasters[db_path] = Forecaster(db_path, interval)
+        return f
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='병원 혼잡 예측 배치')
+    parser.add_argument('db_path', nargs='?', default='hospital_feedback.db')
+    parser.add_argument('--every', type=float, default=0, help='반복 주기(초), 0 이면 한 번만')
+    args = parser.parse_args()
+    while True:
+        t0 = time.perf_counter()
+        table = run_batch(args.db_path)
+        n = len(table) if table is not None else 0
+        print(f'{datetime.utcnow().isoformat()} 병원 {n:,}개 예측 ({time.perf_counter() - t0:.2f}s)')
+        if not args.every:
+            break
+        time.sleep(args.every)
@@ -0,0 +1,99 @@
+# hospital_data.py
+# 병원 데이터셋 로더 캐시 (프로세스 공용)
+# - Streamlit 은 위젯을 누를 때마다 스크립트를 다시 실행하므로, 파싱한 병원 DataFrame 을
+#   (파일 경로, mtime, 크기) 키로 모듈 전역에 보관해 모든 세션이 한 벌을 같이 씀
+# - DB 스키마 초기화도 프로세스당 한 번만 실행
+# - load_hospitals: 앱(code.py)과 매칭 API(match_api.py)가 같이 쓰는 병원 목록 로더
+# 주의: 반환된 DataFrame 은 공유 객체이므로 수정하려면 .copy() 후 사용
+
+import os
+import threading
+
+import pandas as pd
+
+from registry_store import fresh_registry, read_registry
+
+_lock = threading.Lock()
+_frames = {}  # 절대경로 -> (파일 키, DataFrame)
+_initialized = set()
+
+
+def file_key(path):
+    """(절대경로, mtime_ns, 크기) — 파일이 바뀌면 키도 바뀜"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def load_cached(path, parse):
+    """path 를 parse(path) 로 읽되, 파일 키가 같으면 캐시된 DataFrame 반환"""
+    abspath = os.path.abspath(path)
+    try:
+        key = file_key(path)
+    except FileNotFoundError:
+        key = None
+    if key is not None:
+        with _lock:
+            hit = _frames.get(abspath)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+    df = parse(path)  # 파일이 없으면 parse 쪽에서 샘플 생성
+    try:
+        key = file_key(path)
+    except FileNotFoundError:
+        return df
+    df.attrs['dataset_key'] = key
+    with _lock:
+        _frames[abspath] = (key, df)
+    return df
+
+
+def invalidate(path=None):
+    """캐시 무효화 (path 가 없으면 전체)"""
+    with _lock:
+        if path is None:
+            _frames.clear()
+        else:
+            _frames.pop(os.path.abspath(path), None)
+
+
+def init_once(name, init_fn):
+    """init_fn 을 프로세스당 한 번만 실행 (예: CREATE TABLE)"""
+    with _lock:
+        if name in _initialized:
+            return
+        init_fn()
+        _initialized.add(name)
+
+
+# --------------- 병원 목록 -----------------
+
+def create_sample_hospitals(path):
+    sample = pd.DataFrame([
+        {"id":"H001","name":"서울중앙여성병원","lat":37.5665,"lon":126.9780,
+         "accepting":True,"waiting":2,"delivery_beds":1},
+        {"id":"H002","name":"강남모성병원","lat":37.4979,"lon":127.0276,
+         "accepting":True,"waiting":8,"delivery_beds":0},
+        {"id":"H003","name":"동대문응급센터","lat":37.5796,"lon":127.0094,
+         "accepting":False,"waiting":0,"delivery_beds":0},
+        {"id":"H004","name":"성북모자병원","lat":37.5891,"lon":127.0164,
+         "accepting":True,"waiting":1,"delivery_beds":2}
+    ])
+    sample.to_csv(path, index=False)
+    return sample
+
+
+def read_hospitals_csv(path):
+    try:
+        df = pd.read_csv(path)
+    except FileNotFoundError:
+        df = create_sample_hospitals(path)
+    return df
+
+
+def load_hospitals(path):
+    """병원 목록 (공유 객체). 파일 경로/mtime/크기가 그대로면 다시 파싱하지 않고, 파일이 없으면 샘플 생성
+    CSV 보다 최신인 정규화 Parquet(python registry_store.py 로 변환)이 있으면 그쪽을 memory-map 으로 읽음"""
+    registry = fresh_registry(path)
+    if registry:
+        return load_cached(registry, read_registry)
+    return load_cached(path, read_hospitals_csv)
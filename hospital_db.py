@@ -0,0 +1,366 @@
+# hospital_db.py
+# SQLite 접근 계층
+# - 스레드별 연결 풀: 호출마다 connect/close 하지 않고 스레드당 DB 파일별 연결 하나를 재사용
+# - WAL + synchronous=NORMAL: 읽는 쪽은 일관된 스냅샷을 보고, 쓰는 쪽을 막지 않음
+# - 병원 실시간 상태(accepting/waiting/delivery_beds)는 hospital_status 테이블에 한 행씩 UPSERT
+#   (정적 병원 목록 CSV 는 읽기 전용으로 유지), 바뀔 때마다 트리거로 status_history 에 이력 기록
+#   행마다 DB 전체에서 증가하는 version 을 붙임 → 다른 프로세스는 MAX(version) 만 보고 바뀐 행을 가져감
+# - 피드백 INSERT 는 큐에 모았다가 백그라운드 스레드가 묶음 단위로 기록
+# - 병원별 평점 합계/건수는 feedback_agg 테이블에 트리거로 누적 (요약 조회는 병원 수만큼만 읽음)
+#   재계산/검증: python hospital_db.py rebuild|check [DB 경로]
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from hospital_search import as_bool_array
+
+STATUS_COLUMNS = ['accepting', 'waiting', 'delivery_beds']
+WRITE_RETRIES = 5   # 잠금(database is locked/busy) 때 한 묶음을 다시 기록할 최대 횟수
+RATING_RANGE = (1, 5)
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def get_conn(db_path):
+    # 현재 스레드 전용 연결 (없으면 생성해서 보관)
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = connect(db_path)
+    return conn
+
+
+def init_feedback_schema(db_path):
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hospital_id TEXT,
+                rating INTEGER,
+                comment TEXT,
+                timestamp TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_feedback_hospital_id ON feedback (hospital_id)')
+        agg_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedback_agg'").fetchone() is not None
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS feedback_agg (
+                hospital_id TEXT PRIMARY KEY,
+                sum_rating INTEGER NOT NULL,
+                cnt INTEGER NOT NULL,
+                last_ts TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_feedback_agg_insert AFTER INSERT ON feedback
+            BEGIN
+                INSERT INTO feedback_agg (hospital_id, sum_rating, cnt, last_ts)
+                VALUES (new.hospital_id, new.rating, 1, new.timestamp)
+                ON CONFLICT(hospital_id) DO UPDATE SET
+                    sum_rating = sum_rating + excluded.sum_rating,
+                    cnt = cnt + 1,
+                    last_ts = MAX(COALESCE(last_ts, ''), COALESCE(excluded.last_ts, ''));
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_feedback_agg_delete AFTER DELETE ON feedback
+            BEGIN
+                UPDATE feedback_agg SET sum_rating = sum_rating - old.rating, cnt = cnt - 1
+                WHERE hospital_id = old.hospital_id;
+                DELETE FROM feedback_agg WHERE hospital_id = old.hospital_id AND cnt <= 0;
+            END
+        ''')
+    if not agg_exists:
+        # 기존 DB 에 집계 테이블을 처음 만든 경우 원본에서 한 번 채움
+        rebuild_feedback_agg(db_path)
+
+
+def init_status_schema(db_path):
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS hospital_status (
+                hospital_id TEXT PRIMARY KEY,
+                accepting INTEGER,
+                waiting INTEGER,
+                delivery_beds INTEGER,
+                updated_at TEXT,
+                version INTEGER
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(hospital_status)')}
+        if 'version' not in columns:
+            # version 컬럼이 없던 기존 DB (기존 행은 NULL = 0 으로 취급)
+            conn.execute('ALTER TABLE hospital_status ADD COLUMN version INTEGER')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_hospital_status_version ON hospital_status (version)')
+        # 상태가 바뀔 때마다 이력 한 행 (혼잡 예측 배치 입력, forecast.py)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS status_history (
+                hospital_id TEXT,
+                ts TEXT,
+                accepting INTEGER,
+                waiting INTEGER,
+                delivery_beds INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_status_history_ts ON status_history (ts)')
+        for event in ('INSERT', 'UPDATE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_status_history_{event.lower()} AFTER {event} ON hospital_status
+                BEGIN
+                    INSERT INTO status_history (hospital_id, ts, accepting, waiting, delivery_beds)
+                    VALUES (new.hospital_id, new.updated_at, new.accepting, new.waiting, new.delivery_beds);
+                END
+            ''')
+
+
+_UPSERT_STATUS_SQL = '''
+    INSERT INTO hospital_status (hospital_id, accepting, waiting, delivery_beds, updated_at, version)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(hospital_id) DO UPDATE SET
+        accepting = COALESCE(excluded.accepting, accepting),
+        waiting = COALESCE(excluded.waiting, waiting),
+        delivery_beds = COALESCE(excluded.delivery_beds, delivery_beds),
+        updated_at = excluded.updated_at,
+        version = excluded.version
+'''
+
+_STATUS_SELECT = 'SELECT hospital_id, accepting, waiting, delivery_beds, updated_at, COALESCE(version, 0) AS version FROM hospital_status'
+
+
+def _status_params(hospital_id, accepting, waiting, delivery_beds, updated_at):
+    return (hospital_id,
+            None if accepting is None else int(bool(accepting)),
+            None if waiting is None else int(waiting),
+            None if delivery_beds is None else int(delivery_beds),
+            updated_at)
+
+
+def upsert_status(db_path, hospital_id, accepting=None, waiting=None, delivery_beds=None):
+    # 단일 행 UPSERT. None 인 항목은 기존 값을 유지
+    upsert_status_many(db_path, [{'hospital_id': hospital_id, 'accepting': accepting,
+                                  'waiting': waiting, 'delivery_beds': delivery_beds}])
+
+
+def upsert_status_many(db_path, rows):
+    # 여러 병원 상태를 한 트랜잭션으로 UPSERT (rows: hospital_id + STATUS_COLUMNS 일부를 가진 dict)
+    # BEGIN IMMEDIATE 로 쓰는 프로세스끼리 순서를 정하고, 행마다 MAX(version) 다음 번호를 붙임 → 마지막 version 반환
+    now = datetime.utcnow().isoformat(timespec='microseconds')
+    params = [_status_params(r['hospital_id'], r.get('accepting'), r.get('waiting'), r.get('delivery_beds'), now)
+              for r in rows]
+    if not params:
+        return None
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        base = conn.execute('SELECT COALESCE(MAX(version), 0) FROM hospital_status').fetchone()[0]
+        conn.executemany(_UPSERT_STATUS_SQL, [p + (base + i,) for i, p in enumerate(params, 1)])
+    return base + len(params)
+
+
+def status_version(db_path):
+    # 상태 테이블의 마지막 version (인덱스 끝값만 읽음)
+    return get_conn(db_path).execute('SELECT COALESCE(MAX(version), 0) FROM hospital_status').fetchone()[0]
+
+
+def read_status(db_path, since=None):
+    # SELECT 한 번 = WAL 스냅샷 하나 (쓰기 도중에도 커밋된 상태만 보임)
+    # since 가 있으면 그 version 이후에 바뀐 행만 (version 순)
+    if since is None:
+        return pd.read_sql_query(_STATUS_SELECT, get_conn(db_path))
+    return pd.read_sql_query(_STATUS_SELECT + ' WHERE version > ? ORDER BY version', get_conn(db_path), params=(since,))
+
+
+def overlay_status(hospitals_df, status_df):
+    # 정적 병원 목록 위에 DB 상태값을 덮어씀 (DB 값이 NULL 이면 CSV 값 유지)
+    if status_df.empty:
+        return hospitals_df
+    df = hospitals_df.copy()
+    status = status_df.set_index('hospital_id')
+    for col in STATUS_COLUMNS:
+        live = df['id'].map(status[col])
+        base = df[col] if col in df.columns else pd.Series(0, index=df.index)
+        if col == 'accepting':
+            df[col] = np.where(live.notna(), live.fillna(0) != 0, as_bool_array(base))
+        else:
+            df[col] = pd.to_numeric(live.fillna(base), errors='coerce').fillna(0).astype(int)
+    df.attrs = dict(hospitals_df.attrs)
+    return df
+
+
+# --------------- 피드백 (묶음 쓰기) -----------------
+
+class BatchWriter:
+    """INSERT 를 큐에 모았다가 batch_size 개 또는 interval 초마다 한 트랜잭션으로 기록
+
+    validate(row) → 기록할 row: 넣을 때 검사 (잘못된 행 하나 때문에 묶음 전체가 실패하지 않도록 ValueError 로 거절)
+    """
+
+    def __init__(self, db_path, sql, batch_size=200, interval=0.2, validate=None):
+        self.db_path = db_path
+        self.sql = sql
+        self.validate = validate
+        self.batch_size = batch_size
+        self.interval = interval
+        self._q = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='BatchWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        if self.validate is not None:
+            row = self.validate(row)
+        self._q.put(row)
+
+    def flush(self):
+        # 지금까지 넣은 행이 모두 기록될 때까지 대기
+        self._q.join()
+
+    def _run(self):
+        conn = None
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                conn = conn or connect(self.db_path)
+                self._write(conn, batch)
+            except Exception:
+                # 잠금이 아닌 오류(테이블 없음 등)는 재시도해도 같으므로 묶음을 버리고 다음 묶음 처리
+                log.exception('%s: %d건 기록 실패, 버림', self.db_path, len(batch))
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+    def _write(self, conn, batch):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                with conn:
+                    conn.executemany(self.sql, batch)
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == WRITE_RETRIES or not is_busy(e):
+                    raise
+                time.sleep(0.1 * attempt)
+
+
+def is_busy(error):
+    # 다른 연결이 쓰는 중이라 잠시 후 다시 하면 되는 오류인지
+    msg = str(error).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def feedback_row(row):
+    # (hospital_id, rating, comment, timestamp) 검사/정리. rating 이 NULL 이면 집계 트리거가 NOT NULL 에 걸림
+    hospital_id, rating, comment, ts = row
+    if hospital_id is None:
+        raise ValueError('hospital_id 없음')
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        raise ValueError(f'rating 은 정수: {rating!r}') from None
+    lo, hi = RATING_RANGE
+    if not lo <= rating <= hi:
+        raise ValueError(f'rating 은 {lo}~{hi}')
+    return str(hospital_id), rating, '' if comment is None else str(comment), ts
+
+
+def feedback_writer(db_path):
+    with _writers_lock:
+        w = _writers.get(db_path)
+        if w is None:
+            w = _writers[db_path] = BatchWriter(
+                db_path, 'INSERT INTO feedback (hospital_id, rating, comment, timestamp) VALUES (?, ?, ?, ?)',
+                validate=feedback_row)
+        return w
+
+
+def enqueue_feedback(db_path, hospital_id, rating, comment):
+    # 잘못된 값(rating 없음/범위 밖 등)은 큐에 넣기 전에 ValueError
+    now = datetime.utcnow().isoformat(timespec='microseconds')
+    feedback_writer(db_path).submit((hospital_id, rating, comment, now))
+
+
+def read_feedback_summary(db_path):
+    # 전체 feedback GROUP BY 대신 누적 집계 테이블을 읽음: O(병원 수)
+    return pd.read_sql_query(
+        'SELECT hospital_id, CAST(sum_rating AS REAL) / cnt as avg_rating, cnt FROM feedback_agg ORDER BY hospital_id',
+        get_conn(db_path))
+
+
+def rebuild_feedback_agg(db_path):
+    # 원본 feedback 테이블에서 집계를 처음부터 다시 계산 (한 트랜잭션)
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('DELETE FROM feedback_agg')
+        conn.execute('''
+            INSERT INTO feedback_agg (hospital_id, sum_rating, cnt, last_ts)
+            SELECT hospital_id, SUM(rating), COUNT(*), MAX(timestamp) FROM feedback GROUP BY hospital_id
+        ''')
+
+
+def check_feedback_agg(db_path):
+    # 집계 테이블과 원본 GROUP BY 결과가 다른 병원 목록 (비어 있으면 일치)
+    conn = get_conn(db_path)
+    raw = pd.read_sql_query('SELECT hospital_id, SUM(rating) AS sum_rating, COUNT(*) AS cnt FROM feedback GROUP BY hospital_id', conn)
+    agg = pd.read_sql_query('SELECT hospital_id, sum_rating, cnt FROM feedback_agg', conn)
+    merged = raw.merge(agg, on='hospital_id', how='outer', suffixes=('_raw', '_agg'))
+    same = ((merged['sum_rating_raw'] == merged['sum_rating_agg']) & (merged['cnt_raw'] == merged['cnt_agg']))
+    return merged[~same].reset_index(drop=True)
+
+
+@atexit.register
+def _flush_writers():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for w in writers:
+        w.flush()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='feedback_agg 집계 테이블 재계산/검증')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('db_path', nargs='?', default='hospital_feedback.db')
+    args = parser.parse_args()
+    init_feedback_schema(args.db_path)
+    if args.command == 'rebuild':
+        rebuild_feedback_agg(args.db_path)
+    diff = check_feedback_agg(args.db_path)
+    if diff.empty:
+        print('feedback_agg 일치')
+    else:
+        print(diff.to_string(index=False))
+        raise SystemExit(1)
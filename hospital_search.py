@@ -0,0 +1,124 @@
+# hospital_search.py
+# 병원 거리/점수 계산 엔진 (NumPy 벡터화)
+# - 하버사인 거리와 수용/분만침대/대기 페널티를 컬럼 단위 배열 연산으로 한 번에 계산
+# - 상위 N개는 전체 정렬 대신 np.argpartition 으로 선택
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0
+
+# 점수 가중치 (code.py 의 기존 score_row 와 동일)
+NOT_ACCEPTING_PENALTY = 1000
+NO_BED_PENALTY = 20
+WAITING_WEIGHT = 2
+
+# 이보다 병원이 적으면 index 가 있어도 전체 배열 계산 (격자 조회 2번의 고정 비용이 전체 하버사인보다 큼, bench_nearest.py)
+INDEX_MIN_ROWS = 10_000
+
+
+def haversine_np(lat1, lon1, lats, lons):
+    """한 지점(lat1, lon1)에서 여러 지점까지의 하버사인 거리(km) 배열"""
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lats - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lats) * np.sin((lons - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def as_bool_array(values):
+    """CSV 에서 읽은 True/False(문자열 포함) 컬럼을 bool 배열로 변환"""
+    s = pd.Series(values)
+    if s.dtype == bool:
+        return s.to_numpy()
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        return s.astype(str).str.strip().str.lower().isin(["true", "1", "yes", "y"]).to_numpy()
+    return s.fillna(0).astype(bool).to_numpy()
+
+
+def score_arrays(distance_km, accepting, delivery_beds, waiting):
+    """거리 + 수용여부/분만침대/대기 페널티 점수 (작을수록 우선)"""
+    score = np.asarray(distance_km, dtype=float).copy()
+    score += np.where(as_bool_array(accepting), 0, NOT_ACCEPTING_PENALTY)
+    score += np.where(np.asarray(delivery_beds, dtype=float) == 0, NO_BED_PENALTY, 0)
+    score += np.asarray(waiting, dtype=float) * WAITING_WEIGHT
+    return score
+
+
+def top_n_indices(values, top_n):
+    """values 가 작은 순서대로 top_n 개의 위치 (동점은 원래 순서 유지)"""
+    n = len(values)
+    if top_n is None or top_n >= n:
+        return np.argsort(values, kind="stable")
+    if top_n <= 0:
+        return np.array([], dtype=int)
+    part = np.argpartition(values, top_n - 1)[:top_n]
+    # argpartition 은 경계 동점을 임의로 고르므로, 경계값과 같은 원소를 원래 순서대로 다시 채움
+    kth = values[part].max()
+    smaller = np.flatnonzero(values < kth)
+    ties = np.flatnonzero(values == kth)[: top_n - len(smaller)]
+    part = np.concatenate([smaller, ties])
+    return part[np.argsort(values[part], kind="stable")]
+
+
+def find_nearest(user_lat, user_lon, hospitals_df, top_n=5, index=None, forecast=None):
+    """점수 기준 상위 top_n 병원 (distance_km, score 컬럼 추가)
+
+    index(spatial_index.HospitalIndex)가 주어지고 병원이 INDEX_MIN_ROWS 개 이상이면 가까운 후보 K개만 점수를 계산한다.
+    점수 >= 거리 이므로, 후보 중 top_n 번째 점수가 아직 보지 않은 병원의 거리보다 작으면 결과가 확정되고,
+    아니면 그 점수를 반경으로 한 번 더 조회하면 확정된다 (반경이 넓어 대부분을 덮으면 전체 배열 계산).
+    forecast(forecast.ForecastTable)가 주어지면 현재 대기/침대 대신 직선거리 ETA 로 본 도착 시 예상값으로 점수를 매기고
+    expected_waiting_at_arrival, expected_beds_at_arrival 컬럼을 추가한다.
+    """
+    rows = None
+    n = len(hospitals_df)
+    if index is not None and top_n is not None and top_n < n and n >= INDEX_MIN_ROWS:
+        rows, distance, score = _index_candidates(user_lat, user_lon, hospitals_df, top_n, index, forecast)
+    if rows is None:
+        rows = np.arange(len(hospitals_df))
+        distance = haversine_np(user_lat, user_lon, hospitals_df['lat'].to_numpy(), hospitals_df['lon'].to_numpy())
+        score = _score_rows(hospitals_df, rows, distance, forecast)
+    # 좌표가 비어 있는 행(NaN)은 맨 뒤로
+    order = top_n_indices(np.where(np.isnan(score), np.inf, score), top_n)
+    df = hospitals_df.iloc[rows[order]].copy()
+    df['distance_km'] = distance[order]
+    df['score'] = score[order]
+    if forecast is not None:
+        waiting, beds = _arrival_status(hospitals_df, rows[order], distance[order], forecast)
+        df['expected_waiting_at_arrival'] = waiting
+        df['expected_beds_at_arrival'] = beds
+    return df.reset_index(drop=True)
+
+
+def _index_candidates(user_lat, user_lon, hospitals_df, top_n, index, forecast=None):
+    """top_n 이 확정되는 후보 (rows, distance, score). 후보가 절반을 넘으면 (None, None, None) → 전체 배열 계산"""
+    k = max(top_n * 4, 32)
+    rows, distance = index.nearest(user_lat, user_lon, k)
+    score = _score_rows(hospitals_df, rows, distance, forecast)
+    if len(rows) < k or k >= index.n_valid:
+        return rows, distance, score  # 좌표가 있는 병원을 모두 봄
+    kth = np.partition(score, top_n - 1)[top_n - 1]
+    if kth <= distance[-1]:
+        return rows, distance, score
+    if not np.isfinite(kth):
+        return None, None, None
+    # 아직 못 본 병원의 점수 >= 거리 > distance[-1]: kth 반경 안을 모두 보면 확정 (k 를 키워 가며 재조회하지 않음)
+    rows, distance = index.within_radius(user_lat, user_lon, kth)
+    if len(rows) > index.n_valid // 2:
+        return None, None, None
+    return rows, distance, _score_rows(hospitals_df, rows, distance, forecast)
+
+
+def _arrival_status(hospitals_df, rows, distance, forecast):
+    return forecast.expected(hospitals_df['id'].to_numpy()[rows], hospitals_df['waiting'].to_numpy()[rows],
+                             hospitals_df['delivery_beds'].to_numpy()[rows], forecast.eta_from_distance(distance))
+
+
+def _score_rows(hospitals_df, rows, distance, forecast=None):
+    if forecast is None:
+        waiting = hospitals_df['waiting'].to_numpy()[rows]
+        beds = hospitals_df['delivery_beds'].to_numpy()[rows]
+    else:
+        waiting, beds = _arrival_status(hospitals_df, rows, distance, forecast)
+    return score_arrays(distance, hospitals_df['accepting'].to_numpy()[rows], beds, waiting)
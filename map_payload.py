@@ -0,0 +1,86 @@
+# map_payload.py
+# pydeck 지도 데이터 크기 줄이기 (병원 수만 개여도 지도 응답 유지)
+# - 툴팁/색상에 필요한 컬럼만 남기고, 좌표/숫자는 반올림해서 JSON 크기 축소
+# - 현재 화면(중심+줌) 안의 병원만 개별 점으로, 가까운 순 max_points 개까지
+# - 나머지(화면 밖 + 상한 초과분)는 서버에서 줌에 맞는 격자로 묶어 클러스터 점 하나씩만 전송
+# 참고: st.pydeck_chart 는 JSON 으로 직렬화하므로 pydeck 바이너리 전송 대신 컬럼 축소/반올림을 사용
+
+import math
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from spatial_index import TILE_PX, grid_clusters
+
+MAX_POINTS = 3000
+COORD_DECIMALS = 5  # 약 1m
+
+
+def viewport_bounds(center_lat, center_lon, zoom, width_px=1200, height_px=600):
+    """웹 메르카토르 기준 화면 범위 (lat_min, lat_max, lon_min, lon_max)"""
+    deg_per_px = 360.0 / (TILE_PX * 2 ** zoom)
+    half_lon = deg_per_px * width_px / 2
+    half_lat = deg_per_px * height_px / 2 * math.cos(math.radians(center_lat))
+    return center_lat - half_lat, center_lat + half_lat, center_lon - half_lon, center_lon + half_lon
+
+
+def project(df, columns):
+    """필요한 컬럼만 남기고 좌표/실수 반올림"""
+    cols = ["lat", "lon"] + [c for c in columns if c in df.columns and c not in ("lat", "lon")]
+    out = df[cols].copy()
+    out["lat"] = out["lat"].round(COORD_DECIMALS)
+    out["lon"] = out["lon"].round(COORD_DECIMALS)
+    for c in out.columns[2:]:
+        if pd.api.types.is_float_dtype(out[c]):
+            out[c] = out[c].round(2)
+    return out
+
+
+def build_layers(df, center_lat, center_lon, zoom, tooltip_columns, color=None,
+                 max_points=MAX_POINTS, width_px=1200, height_px=600, **point_layer_kwargs):
+    """df(가까운 순 정렬 가정) → (pydeck 레이어 목록, 개별 점 DataFrame, 통계 dict)
+
+    color: 고정 [r, g, b] 또는 pydeck 표현식 문자열 (예: "[color_r, color_g, color_b]")
+    """
+    lat_min, lat_max, lon_min, lon_max = viewport_bounds(center_lat, center_lon, zoom, width_px, height_px)
+    lat = df["lat"].to_numpy()
+    lon = df["lon"].to_numpy()
+    in_view = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    view_pos = np.flatnonzero(in_view)
+    detail_pos = view_pos[:max_points]
+    rest = np.ones(len(df), dtype=bool)
+    rest[detail_pos] = False
+
+    color_cols = ["color_r", "color_g", "color_b"] if isinstance(color, str) else []
+    points = project(df.iloc[detail_pos], list(tooltip_columns) + color_cols)
+    if color is not None:
+        point_layer_kwargs["get_fill_color"] = color
+    layers = [pdk.Layer(
+        "ScatterplotLayer",
+        data=points,
+        get_position="[lon, lat]",
+        pickable=True,
+        **point_layer_kwargs,
+    )]
+
+    clusters = grid_clusters(lat[rest], lon[rest], zoom).round({"lat": COORD_DECIMALS, "lon": COORD_DECIMALS})
+    if len(clusters):
+        # 툴팁 템플릿의 다른 필드가 "{addr}" 처럼 그대로 보이지 않도록 빈 값 채움
+        for c in tooltip_columns:
+            if c not in clusters.columns:
+                clusters[c] = ""
+        clusters["name"] = clusters["count"].astype(str) + "개 병원"
+        layers.append(pdk.Layer(
+            "ScatterplotLayer",
+            data=clusters,
+            get_position="[lon, lat]",
+            get_radius="30 * sqrt(count)",
+            radius_units="pixels",
+            radius_min_pixels=6,
+            radius_max_pixels=40,
+            get_fill_color=[90, 90, 200, 140],
+            pickable=True,
+        ))
+    stats = {"points": len(points), "clusters": len(clusters), "total": len(df)}
+    return layers, points, stats
@@ -0,0 +1,347 @@
+# match_api.py
+# 병원 매칭 HTTP/JSON API (Streamlit 없이 단독 실행, 119 상황실 등 외부 시스템용)
+# - 프로세스 하나가 병원 목록 + 공간 인덱스 + 실시간 상태(status_feed) + 예측(forecast) + 예약(dispatch)을 메모리에 들고
+#   모든 요청이 같은 객체를 씀 (요청마다 CSV/DB 재조회나 스크립트 재실행 없음)
+# - 상태가 바뀌면 바뀐 병원 행만 반영한 새 DataFrame 으로 교체(copy-on-write) → 읽는 쪽은 잠금 없이 현재 객체 사용
+# - 서버: 표준 라이브러리 ThreadingHTTPServer (연결당 스레드, HTTP/1.1 keep-alive)
+#   검색/배정 계산은 동시에 workers 개까지만 실행 (나머지는 대기) → 부하가 몰려도 CPU 를 나눠 먹으며 모두 느려지지 않음
+# 엔드포인트 (응답은 모두 JSON)
+#   GET  /nearest?lat=&lon=&n=5                 점수 상위 n개 병원 (예약 중인 침대 반영, 예측이 있으면 도착 시 예상값)
+#   GET  /within?lat=&lon=&radius_km=10&limit=  반경 안 병원 (거리순)
+#   GET  /route?from_lat=&from_lon=&to_lat=&to_lon=  (또는 hospital_id=) 경로 geojson (API 키가 없거나 실패하면 직선 추정)
+#   POST /feedback  {"hospital_id": "H001", "rating": 5, "comment": ""}
+#   POST /dispatch  {"requests": [{"request_id": 1, "lat": .., "lon": ..}, ...]}  동시 요청 배정 + 병상 임시 예약
+#   POST /release   {"reservation_id": 3}  도착/취소 시 예약 해제 (만료 전에 침대를 돌려줌)
+#   POST /status    [{"hospital_id": "H001", "waiting": 3, ...}]  병원 상태 변경 (관리자 화면, status_feed 형식)
+#   GET  /health
+# 실행:   python match_api.py [--port 8770] [--csv hospitals_sample.csv] [--db hospital_feedback.db] [--workers 4]
+# 부하 테스트: python bench_api.py --rps 200 --duration 20
+
+import json
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from dispatch import apply_holds, get_dispatcher
+from forecast import get_forecaster
+from hospital_data import init_once, load_hospitals
+from hospital_db import enqueue_feedback, init_feedback_schema, init_status_schema, overlay_status
+from hospital_search import find_nearest
+from routing import ORS_BASE_URL, get_client, straight_line_route
+from spatial_index import cached_index
+from status_feed import apply_delta, get_feed
+
+API_PORT = 8770
+WORKERS = 4             # 동시에 실행할 검색/배정 계산 수 (대략 CPU 코어 수)
+KEEPALIVE_S = 30.0      # 쉬는 keep-alive 연결을 닫기까지 시간
+MAX_TOP_N = 100
+MAX_BODY_BYTES = 1 << 20
+RESULT_COLUMNS = ['id', 'name', 'lat', 'lon', 'accepting', 'waiting', 'delivery_beds', 'distance_km', 'score',
+                  'expected_waiting_at_arrival', 'expected_beds_at_arrival']
+
+
+class MatchService:
+    """매칭 API 의 공용 상태 (요청 처리 스레드들이 같이 씀)"""
+
+    def __init__(self, hospitals_df, db_path=None, feed=None, route_client=None, workers=WORKERS):
+        self.base = hospitals_df
+        self.db_path = db_path
+        self.feed = feed
+        self.route_client = route_client
+        self.index = cached_index(hospitals_df['lat'].to_numpy(), hospitals_df['lon'].to_numpy(),
+                                  key=hospitals_df.attrs.get('dataset_key'))
+        self.forecaster = get_forecaster(db_path) if db_path else None
+        self.slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._version = -1
+        self.df = hospitals_df
+        self.live()
+
+    def live(self):
+        """현재 상태가 반영된 병원 DataFrame (버전이 그대로면 잠금 없이 바로 반환)"""
+        feed = self.feed
+        if feed is None or feed.version == self._version:
+            return self.df
+        with self._lock:
+            if feed.version == self._version:
+                return self.df
+            delta = None
+            if self._version >= 0:
+                version, delta = feed.changes_since(self._version)
+            if delta is None:
+                version, status = feed.snapshot()
+                df = overlay_status(self.base, status).copy()
+            else:
+                df = self.df.copy()
+                apply_delta(df, delta)
+            df.attrs = dict(self.base.attrs)
+            self.df, self._version = df, version
+            return df
+
+    @property
+    def version(self):
+        return self._version
+
+    def dispatcher(self, df):
+        return get_dispatcher(df, self.index)
+
+    def nearest(self, lat, lon, top_n=5):
+        df = self.live()
+        held = self.dispatcher(df).book.held()
+        forecast = self.forecaster.table if self.forecaster else None
+        return find_nearest(lat, lon, apply_holds(df, held), top_n, index=self.index, forecast=forecast)
+
+    def within(self, lat, lon, radius_km, limit=None):
+        df = self.live()
+        rows, dist = self.index.within_radius(lat, lon, radius_km)
+        if limit:
+            rows, dist = rows[:limit], dist[:limit]
+        out = df.iloc[rows].copy()
+        out['distance_km'] = dist
+        return out.reset_index(drop=True)
+
+    def hospital(self, hospital_id):
+        df = self.live()
+        hit = df[df['id'].astype(str) == str(hospital_id)]
+        return None if hit.empty else hit.iloc[0]
+
+    def route(self, from_lat, from_lon, to_lat, to_lon):
+        """(route_json, error) — 라우팅 클라이언트가 없으면 직선거리 추정 경로"""
+        if self.route_client is None:
+            return straight_line_route(from_lat, from_lon, to_lat, to_lon), 'API_KEY_NOT_SET'
+        return self.route_client.route(from_lat, from_lon, to_lat, to_lon)
+
+    def feedback(self, hospital_id, rating, comment=''):
+        if self.db_path is None:
+            raise ValueError('피드백 저장 DB 가 설정되지 않음')
+        enqueue_feedback(self.db_path, hospital_id, rating, comment)  # 값 검사는 hospital_db.feedback_row
+
+    def dispatch(self, requests_df):
+        return self.dispatcher(self.live()).assign(requests_df)
+
+    def release(self, reservation_id):
+        return self.dispatcher(self.live()).book.release(int(reservation_id))
+
+    def update_status(self, items):
+        # 상태 수신기에 반영 (DB 가 있으면 기록 → 같은 DB 를 보는 다른 프로세스에도 전달)
+        if self.feed is None:
+            raise ValueError('상태 수신기가 설정되지 않음')
+        return self.feed.apply(items)
+
+
+def _records(df, columns=RESULT_COLUMNS):
+    # NaN → null, NumPy 타입 → JSON 기본 타입 (to_json 이 C 로 직렬화)
+    return df[[c for c in columns if c in df.columns]].to_json(orient='records', force_ascii=False)
+
+
+def _float(query, name, default=None):
+    v = query.get(name, [None])[0]
+    if v is None:
+        if default is None:
+            raise ValueError(f'{name} 필요')
+        return default
+    v = float(v)
+    if not np.isfinite(v):
+        raise ValueError(f'{name} 값 오류')
+    return v
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        timeout = KEEPALIVE_S
+        disable_nagle_algorithm = True  # 헤더/본문을 따로 쓰므로 keep-alive 에서 40ms 지연 ACK 대기를 피함
+
+        def log_message(self, *args):
+            pass
+
+        def _send_raw(self, code, body):
+            try:
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def _send(self, code, payload):
+            self._send_raw(code, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY_BYTES:
+                raise ValueError('요청 본문이 너무 큼')
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                if url.path == '/nearest':
+                    top_n = max(1, min(int(query.get('n', ['5'])[0]), MAX_TOP_N))
+                    lat, lon = _float(query, 'lat'), _float(query, 'lon')
+                    with service.slots:
+                        df = service.nearest(lat, lon, top_n)
+                    return self._send_raw(200, f'{{"version":{service.version},"hospitals":{_records(df)}}}'.encode('utf-8'))
+                if url.path == '/within':
+                    limit = int(query['limit'][0]) if 'limit' in query else None
+                    lat, lon, radius = _float(query, 'lat'), _float(query, 'lon'), _float(query, 'radius_km', 10.0)
+                    with service.slots:
+                        df = service.within(lat, lon, radius, limit)
+                    return self._send_raw(200, f'{{"version":{service.version},"hospitals":{_records(df)}}}'.encode('utf-8'))
+                if url.path == '/route':
+                    if 'hospital_id' in query:
+                        row = service.hospital(query['hospital_id'][0])
+                        if row is None:
+                            return self._send(404, {'error': 'unknown hospital_id'})
+                        to_lat, to_lon = float(row['lat']), float(row['lon'])
+                    else:
+                        to_lat, to_lon = _float(query, 'to_lat'), _float(query, 'to_lon')
+                    route_json, error = service.route(_float(query, 'from_lat'), _float(query, 'from_lon'), to_lat, to_lon)
+                    return self._send(200 if route_json is not None else 502, {'route': route_json, 'error': error})
+                if url.path == '/health':
+                    return self._send(200, {'ok': True, 'hospitals': len(service.df), 'version': service.version})
+            except (KeyError, ValueError) as e:
+                return self._send(400, {'error': str(e)})
+            except sqlite3.Error as e:
+                return self._send(503, {'error': str(e)})
+            self._send(404, {'error': 'unknown path'})
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            try:
+                body = self._body()
+                if path == '/feedback':
+                    service.feedback(body['hospital_id'], body['rating'], body.get('comment', ''))
+                    return self._send(200, {'ok': True})
+                if path == '/dispatch':
+                    requests_df = pd.DataFrame(body['requests'], columns=['request_id', 'lat', 'lon'])
+                    with service.slots:
+                        result = service.dispatch(requests_df)
+                    return self._send_raw(200, f'{{"assignments":{result.to_json(orient="records", force_ascii=False)}}}'.encode('utf-8'))
+                if path == '/release':
+                    return self._send(200, {'released': service.release(body['reservation_id'])})
+                if path == '/status':
+                    items = body.get('updates', [body]) if isinstance(body, dict) else body
+                    changed = service.update_status(items)
+                    return self._send(200, {'changed': changed, 'version': service.feed.version})
+            except (KeyError, ValueError, TypeError) as e:
+                return self._send(400, {'error': str(e)})
+            except sqlite3.Error as e:
+                # 상태 DB 잠김/바쁨 등: 연결을 끊지 않고 503 으로 다시 시도하라고 알림
+                return self._send(503, {'error': str(e)})
+            self._send(404, {'error': 'unknown path'})
+
+    return Handler
+
+
+def serve(service, port=API_PORT, host='127.0.0.1'):
+    """데몬 스레드에서 API 서버 시작, server 객체 반환 (server.shutdown() 으로 종료)"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    threading.Thread(target=server.serve_forever, name='MatchAPI', daemon=True).start()
+    return server
+
+
+def build_service(csv_path, db_path=None, ors_api_key=None, ors_base_url=ORS_BASE_URL, status_port=None,
+                  workers=WORKERS):
+    if db_path:
+        init_once(db_path, lambda: (init_feedback_schema(db_path), init_status_schema(db_path)))
+    feed = get_feed(db_path, port=status_port)
+    client = get_client(ors_api_key, ors_base_url) if ors_api_key else None
+    return MatchService(load_hospitals(csv_path), db_path, feed, client, workers)
+
+
+# --------------- 클라이언트 (Streamlit 앱 등) -----------------
+
+class MatchClient:
+    """매칭 API 클라이언트 (연결 재사용). 반환 형식은 code.py 의 같은 이름 함수와 맞춤"""
+
+    def __init__(self, base_url, timeout=(1.0, 5.0)):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get(self, path, **params):
+        r = self.session.get(f'{self.base_url}{path}?{urlencode(params)}', timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def _post(self, path, payload):
+        r = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def nearest(self, lat, lon, top_n=5):
+        return pd.DataFrame(self._get('/nearest', lat=lat, lon=lon, n=top_n)['hospitals'])
+
+    def within(self, lat, lon, radius_km=10.0, limit=None):
+        params = {'lat': lat, 'lon': lon, 'radius_km': radius_km}
+        if limit:
+            params['limit'] = limit
+        return pd.DataFrame(self._get('/within', **params)['hospitals'])
+
+    def route(self, from_lat, from_lon, to_lat, to_lon):
+        """(route_json, error)"""
+        try:
+            data = self._get('/route', from_lat=from_lat, from_lon=from_lon, to_lat=to_lat, to_lon=to_lon)
+        except requests.RequestException as e:
+            return None, str(e)
+        return data['route'], data['error']
+
+    def feedback(self, hospital_id, rating, comment=''):
+        self._post('/feedback', {'hospital_id': hospital_id, 'rating': int(rating), 'comment': comment})
+
+    def dispatch(self, requests_df):
+        payload = {'requests': json.loads(requests_df[['request_id', 'lat', 'lon']].to_json(orient='records'))}
+        return pd.DataFrame(self._post('/dispatch', payload)['assignments'])
+
+    def release(self, reservation_id):
+        return self._post('/release', {'reservation_id': int(reservation_id)})['released']
+
+    def update_status(self, items):
+        return self._post('/status', list(items))['changed']
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_match_client(base_url):
+    """base_url 별로 프로세스에 하나 (Streamlit 재실행에도 연결 유지)"""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = MatchClient(base_url)
+        return client
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='병원 매칭 HTTP/JSON API')
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--csv', default='hospitals_sample.csv')
+    parser.add_argument('--db', default='hospital_feedback.db', help='피드백/상태 SQLite 파일')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='동시에 실행할 검색/배정 계산 수')
+    parser.add_argument('--ors-url', default=ORS_BASE_URL, help='라우팅 API 주소 (API 키는 ORS_API_KEY 환경변수)')
+    parser.add_argument('--status-port', type=int, default=None, help='병원 상태 수신 포트 (status_feed.py, 생략 시 받지 않음)')
+    args = parser.parse_args()
+    service = build_service(args.csv, args.db, os.environ.get('ORS_API_KEY'), args.ors_url, args.status_port,
+                            args.workers)
+    server = serve(service, args.port, args.host)
+    print(f'match api: http://{args.host}:{args.port}  (병원 {len(service.df):,}개, 동시 계산 {args.workers})')
+    while True:
+        time.sleep(3600)
@@ -0,0 +1,84 @@
+# ors_stub.py
+# 로컬 테스트용 가짜 OpenRouteService 서버 (표준 라이브러리만 사용)
+# 사용법: python ors_stub.py [--port 8080] [--delay 0.0] [--fail-rate 0.0]
+# - POST /v2/directions/driving-car/geojson : 출발→도착 직선 geojson + summary(distance, duration)
+# - --delay 로 느린 응답, --fail-rate 로 500 오류 비율을 흉내내어 캐시/서킷 브레이커 동작 확인
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPEED_KMH = 35.0
+
+
+def _km(lon1, lat1, lon2, lat2):
+    R = 6371.0
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(math.radians(lat1))*math.cos(math.radians(lat2))*math.sin(dlambda/2)**2
+    return 2*R*math.asin(math.sqrt(a))
+
+
+def make_handler(delay=0.0, fail_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        calls = 0
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            try:
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+        def do_POST(self):
+            Handler.calls += 1
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            if delay:
+                time.sleep(delay)
+            if fail_rate and random.random() < fail_rate:
+                return self._send(500, {"error": "stub failure"})
+            if self.path.startswith("/v2/directions/"):
+                (lon1, lat1), (lon2, lat2) = req["coordinates"][:2]
+                km = _km(lon1, lat1, lon2, lat2) * 1.3
+                return self._send(200, {
+                    "type": "FeatureCollection",
+                    "features": [{
+                        "type": "Feature",
+                        "geometry": {"type": "LineString", "coordinates": [[lon1, lat1], [lon2, lat2]]},
+                        "properties": {"summary": {"distance": km * 1000, "duration": km / SPEED_KMH * 3600}},
+                    }],
+                })
+            self._send(404, {"error": "unknown path"})
+
+    return Handler
+
+
+def serve(port=8080, delay=0.0, fail_rate=0.0, background=False):
+    """서버 시작. background=True 면 데몬 스레드에서 돌리고 server 객체 반환 (server.shutdown() 으로 종료)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, fail_rate))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"ORS stub: http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 OpenRouteService 서버")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--delay", type=float, default=0.0, help="응답 지연(초)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="500 오류 비율(0~1)")
+    args = parser.parse_args()
+    serve(args.port, args.delay, args.fail_rate)
@@ -0,0 +1,50 @@
+# presentation.py
+# 표/지도 표시용 파생 컬럼 (행 단위 apply 대신 벡터화)
+# - 전화/길찾기 링크는 병원에만 의존하므로 업로드 정규화 시 한 번만 계산 (add_link_columns)
+# - 대기인원 색상은 NumPy 로 한 번에 계산해 R/G/B 컬럼으로 저장 (pydeck 에서 "[color_r, color_g, color_b]")
+#   대기인원을 모르는 병원(실시간 상태 미수신)은 회색
+
+import numpy as np
+import pandas as pd
+
+MAX_WAIT = 30
+UNKNOWN_COLOR = (160, 160, 160)  # 상태 보고가 없는 병원
+
+
+def tel_links(tel):
+    """전화번호 Series → "[전화](tel:...)" (빈 값은 "")"""
+    t = tel.astype("string").str.strip()
+    links = "[전화](tel:" + t + ")"
+    return links.where(t.notna() & (t != ""), "").astype(object)
+
+
+def naver_maps_links(lat, lon, name):
+    """네이버 지도 길찾기 링크 Series"""
+    return ("[길찾기](https://map.naver.com/v5/directions/-/-/"
+            + lon.astype(str) + "," + lat.astype(str) + "," + name.astype(str) + ")")
+
+
+def add_link_columns(df):
+    """'전화', '길찾기' 컬럼 추가 (정적인 병원 정보만 사용)"""
+    df["전화"] = tel_links(df["tel"]) if "tel" in df.columns else ""
+    name = df["name"].fillna("병원") if "name" in df.columns else pd.Series("병원", index=df.index)
+    df["길찾기"] = naver_maps_links(df["lat"], df["lon"], name)
+    return df
+
+
+def wait_colors(wait, max_wait=MAX_WAIT):
+    """대기인원 많으면 빨강, 적으면 초록, 값이 없으면(NaN) 회색 → (N, 3) uint8 배열"""
+    wait = np.asarray(wait, dtype=float)
+    known = np.isfinite(wait)
+    ratio = np.clip(np.where(known, wait, 0) / max_wait, 0, 1)
+    rgb = np.zeros((len(ratio), 3), dtype=np.uint8)
+    rgb[:, 0] = (255 * ratio).astype(np.uint8)
+    rgb[:, 1] = (255 * (1 - ratio)).astype(np.uint8)
+    rgb[~known] = UNKNOWN_COLOR
+    return rgb
+
+
+def add_wait_color_columns(df, column, max_wait=MAX_WAIT):
+    rgb = wait_colors(df[column].to_numpy(), max_wait)
+    df["color_r"], df["color_g"], df["color_b"] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    return df
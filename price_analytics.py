@@ -0,0 +1,185 @@
+# price_analytics.py
+# 종가 행렬(날짜 × 종목) 분석: 누적수익률, 20/60일 변동성, 낙폭, 상관계수 행렬, 지수 대비 베타
+# - 모든 지표를 한 번에 배열 연산으로 계산 (종목별 루프/rolling DataFrame 없음)
+#   rolling 변동성 = 누적합 차이, 상관/베타 = 결측을 뺀 쌍별 합을 행렬곱(BLAS)으로
+# - 결과(Analytics)는 (종목 목록, 기간, 기준 지수) 키로 프로세스 공용 캐시
+#   → 화면 보기를 바꿔도 저장된 배열로 다시 그리기만 함 (재계산/재다운로드 없음)
+#   저장소 데이터가 바뀌면(price_store.read 가 다른 객체를 돌려주면) 다시 계산
+# 확인: python price_analytics.py [종목 수]
+
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from price_chart import ffill, normalize
+
+TRADING_DAYS = 252
+VOL_WINDOWS = (20, 60)
+MIN_PERIODS_RATIO = 0.8   # rolling 창의 이 비율 이상 값이 있어야 변동성 계산
+MIN_OVERLAP = 20          # 상관/베타 계산에 필요한 최소 공통 일수
+CACHE_SIZE = 16
+
+
+def daily_returns(prices):
+    """앞값 채운 종가 → 일간 수익률 (첫 행/상장 전은 NaN)"""
+    out = np.full_like(prices, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[1:] = prices[1:] / prices[:-1] - 1.0
+    return out
+
+
+def rolling_std(returns, window, min_periods=None):
+    """열별 rolling 표준편차 (누적합 차이, NaN 제외), 값이 min_periods 개 미만이면 NaN"""
+    min_periods = min_periods or max(2, int(window * MIN_PERIODS_RATIO))
+    valid = ~np.isnan(returns)
+    x = np.where(valid, returns, 0.0)
+    zero = np.zeros((1, returns.shape[1]))
+    c = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    s1 = np.concatenate([zero, np.cumsum(x, axis=0)])
+    s2 = np.concatenate([zero, np.cumsum(x * x, axis=0)])
+    lag = np.maximum(np.arange(1, len(returns) + 1) - window, 0)
+    n = c[1:] - c[lag]
+    m1 = s1[1:] - s1[lag]
+    m2 = s2[1:] - s2[lag]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (m2 - m1 * m1 / n) / (n - 1)
+    var = np.maximum(var, 0.0)
+    return np.where(n >= min_periods, np.sqrt(var), np.nan)
+
+
+def drawdown(prices):
+    """고점 대비 하락률 (0 ~ -1), 상장 전은 NaN"""
+    peak = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return prices / peak - 1.0
+
+
+def pairwise_moments(x, y=None):
+    """결측을 뺀 쌍별 (개수, 공분산, x 분산, y 분산) — 모두 (x 열 수, y 열 수) 행렬, 행렬곱으로 계산"""
+    y = x if y is None else y
+    mx, my = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(mx, x, 0.0), np.where(my, y, 0.0)
+    mxf, myf = mx.astype(float), my.astype(float)
+    n = mxf.T @ myf
+    sx, sy = x0.T @ myf, mxf.T @ y0
+    sxy = x0.T @ y0
+    sxx, syy = (x0 * x0).T @ myf, mxf.T @ (y0 * y0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (sxy - sx * sy / n) / (n - 1)
+        vx = (sxx - sx * sx / n) / (n - 1)
+        vy = (syy - sy * sy / n) / (n - 1)
+    return n, cov, vx, vy
+
+
+def correlation(returns, min_overlap=MIN_OVERLAP):
+    """쌍별 상관계수 행렬 (공통 일수가 min_overlap 미만이면 NaN)"""
+    n, cov, vx, vy = pairwise_moments(returns)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.sqrt(vx * vy)
+    corr = np.clip(corr, -1.0, 1.0)
+    corr[n < min_overlap] = np.nan
+    return corr
+
+
+def beta(returns, market, min_overlap=MIN_OVERLAP):
+    """지수 수익률 대비 (베타, 상관계수) — 종목별 배열"""
+    n, cov, vx, vm = pairwise_moments(returns, market[:, None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        b = (cov / vm)[:, 0]
+        r = (cov / np.sqrt(vx * vm))[:, 0]
+    short = n[:, 0] < min_overlap
+    b[short] = np.nan
+    r[short] = np.nan
+    return b, r
+
+
+class Analytics:
+    """종가 wide DataFrame 에서 한 번 계산해 둔 지표 배열 묶음"""
+
+    def __init__(self, adj_close, benchmark=None):
+        columns = [c for c in adj_close.columns if c != benchmark]
+        self.dates = adj_close.index.to_numpy()
+        self.tickers = pd.Index(columns)
+        raw = adj_close[columns].to_numpy(dtype=float)
+        self.prices = ffill(raw)
+        self.rebased = normalize(raw)
+        self.returns = daily_returns(self.prices)
+        self.volatility = {w: rolling_std(self.returns, w) * np.sqrt(TRADING_DAYS) for w in VOL_WINDOWS}
+        self.drawdown = drawdown(self.prices)
+        self.corr = correlation(self.returns)
+        self.benchmark = benchmark if benchmark in adj_close.columns else None
+        if self.benchmark is not None:
+            market = daily_returns(ffill(adj_close[[benchmark]].to_numpy(dtype=float)))[:, 0]
+            self.beta, self.market_corr = beta(self.returns, market)
+        else:
+            self.beta = self.market_corr = np.full(len(columns), np.nan)
+        self.summary = self._summary()
+
+    def _summary(self):
+        last = self.rebased[-1] if len(self.rebased) else np.full(len(self.tickers), np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 값이 하나도 없는 종목
+            vol = np.nanstd(self.returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+            mdd = np.nanmin(self.drawdown, axis=0)
+        return pd.DataFrame({
+            'ticker': self.tickers,
+            'total_return_pct': last - 100.0,
+            'volatility_pct': vol * 100,
+            'max_drawdown_pct': mdd * 100,
+            'beta': self.beta,
+            'corr_to_index': self.market_corr,
+        })
+
+
+_cache = OrderedDict()   # (종목 튜플, 시작, 끝, 기준 지수) → (원본 DataFrame, Analytics)
+_cache_lock = threading.Lock()
+
+
+def get_analytics(adj_close, start, end, benchmark=None):
+    """(종목, 기간, 기준 지수) 별 캐시. adj_close 가 같은 객체면(price_store.read 캐시) 다시 계산하지 않음"""
+    key = (tuple(adj_close.columns), start, end, benchmark)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] is adj_close:
+            _cache.move_to_end(key)
+            return hit[1]
+    analytics = Analytics(adj_close, benchmark)
+    with _cache_lock:
+        _cache[key] = (adj_close, analytics)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return analytics
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from bench_chart import make_prices
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    adj_close = make_prices(n, 1)
+    adj_close['^IDX'] = adj_close.mean(axis=1)
+    t0 = time.perf_counter()
+    a = get_analytics(adj_close, None, None, '^IDX')
+    t1 = time.perf_counter()
+    get_analytics(adj_close, None, None, '^IDX')
+    t2 = time.perf_counter()
+    # pandas 로 같은 값을 계산해 비교
+    prices = adj_close.drop(columns='^IDX').ffill()
+    rets = prices.pct_change(fill_method=None)
+    ref_vol = rets.rolling(20, min_periods=16).std().to_numpy() * np.sqrt(TRADING_DAYS)
+    ref_corr = rets.corr(min_periods=MIN_OVERLAP).to_numpy()
+    mkt = adj_close['^IDX'].pct_change()
+    ref_beta = (rets.apply(lambda s: s.cov(mkt)) / mkt.var()).to_numpy()
+    t3 = time.perf_counter()
+    print(f'종목 {n}개 x {len(adj_close)}일: 계산 {(t1 - t0) * 1000:.0f} ms, 캐시 {(t2 - t1) * 1000:.2f} ms, '
+          f'pandas {(t3 - t2) * 1000:.0f} ms')
+    print('최대 오차  vol20 %.2e  corr %.2e  beta %.2e' % (
+        np.nanmax(np.abs(a.volatility[20] - ref_vol)), np.nanmax(np.abs(a.corr - ref_corr)),
+        np.nanmax(np.abs(a.beta - ref_beta))))
+    print(a.summary.head())
@@ -0,0 +1,188 @@
+# price_chart.py
+# 종목 수가 많아도 가벼운 주가 차트
+# - 종가 wide 배열(날짜 × 종목)을 한 번에 처리: 앞값 채우기 + 시작값=100 정규화 (종목별 DataFrame 만들지 않음)
+# - 종목마다 화면 폭(픽셀) 이하로 점을 줄임: min-max(버킷별 최저/최고, 급등락 보존) 또는 LTTB(모양 보존)
+#   둘 다 모든 종목을 같은 배열 연산으로 처리
+# - 차트 전체 점 수 상한(POINT_BUDGET): 종목이 많을수록 종목당 점을 줄여 plotly 전송량이 종목 수와 무관하게 일정
+#   MAX_TRACES 보다 종목이 많으면 마지막 값 기준 상위/하위 종목만 선으로 그리고, 전체 분포는 10/50/90% 밴드로 표시
+# - 날짜는 epoch ms(숫자)로 보내고 종목이 많으면 Scattergl 사용
+# 전송량 비교: python bench_chart.py
+
+import warnings
+
+import numpy as np
+
+CHART_WIDTH_PX = 1200     # 종목당 최대 점 수 (대략 차트 폭)
+POINT_BUDGET = 40_000     # 차트 전체 최대 점 수
+MIN_POINTS = 64           # 종목당 최소 점 수
+MAX_TRACES = 300          # 선으로 그릴 최대 종목 수 (POINT_BUDGET / MAX_TRACES >= MIN_POINTS)
+BAND_PERCENTILES = (10, 50, 90)
+WEBGL_TRACES = 50         # 이보다 종목이 많으면 Scattergl
+MAX_HEATMAP = 150         # 상관 히트맵 최대 종목 수 (셀 수 제한)
+
+
+def ffill(values):
+    """NaN 을 위쪽(이전 날짜) 값으로 채움 (열별, 배열 연산)"""
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    out = values[idx, np.arange(values.shape[1])]
+    out[~np.maximum.accumulate(valid, axis=0)] = np.nan  # 첫 값 이전은 NaN 유지
+    return out
+
+
+def normalize(values):
+    """열마다 첫 유효값 = 100 으로 맞춘 배열 (상장 전 구간은 NaN)"""
+    filled = ffill(values)
+    valid = ~np.isnan(filled)
+    first = filled[valid.argmax(axis=0), np.arange(filled.shape[1])]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return filled / first * 100.0
+
+
+def points_per_trace(n_traces, width_px=CHART_WIDTH_PX, budget=POINT_BUDGET):
+    return int(max(MIN_POINTS, min(width_px, budget // max(n_traces, 1))))
+
+
+def minmax_indices(values, n_out):
+    """열마다 버킷(n_out/2개)별 최저/최고 위치 → (점 수, 열 수) 위치 배열 (시간순)"""
+    n = len(values)
+    if n <= n_out:
+        return np.repeat(np.arange(n)[:, None], values.shape[1], axis=1)
+    buckets = max(n_out // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    size = int(np.diff(edges).max())
+    # 버킷을 같은 길이로 맞춰 (버킷, 길이, 열) 배열로 만들고, 모자란 칸은 각 버킷 마지막 위치를 반복
+    pos = np.minimum(edges[:-1, None] + np.arange(size), edges[1:, None] - 1)
+    block = values[pos]
+    lo = np.take_along_axis(pos[:, :, None], np.nanargmin(np.where(np.isnan(block), np.inf, block), axis=1)[:, None, :], 1)[:, 0]
+    hi = np.take_along_axis(pos[:, :, None], np.nanargmax(np.where(np.isnan(block), -np.inf, block), axis=1)[:, None, :], 1)[:, 0]
+    idx = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=1).reshape(-1, values.shape[1])
+    idx[0], idx[-1] = 0, n - 1  # 처음/마지막 점은 항상 포함
+    return idx
+
+
+def lttb_indices(values, n_out):
+    """Largest-Triangle-Three-Buckets (x = 등간격 위치), 모든 열을 한 번에 → (n_out, 열 수) 위치 배열"""
+    n, m = values.shape
+    if n <= n_out or n_out < 3:
+        return np.repeat(np.arange(n)[:, None], m, axis=1)
+    y = ffill(values)
+    y = np.where(np.isnan(y), np.nanmean(values, axis=0), y)  # 상장 전 구간은 평균값으로 (선택에만 사용)
+    y = np.nan_to_num(y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty((n_out, m), dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    cols = np.arange(m)
+    a = np.zeros(m, dtype=np.int64)
+    for b in range(n_out - 2):
+        lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+        nlo, nhi = hi, max(edges[b + 2] if b + 2 < len(edges) else n, hi + 1)
+        cx, cy = (nlo + nhi - 1) / 2.0, y[nlo:nhi].mean(axis=0)   # 다음 버킷 평균점
+        ax, ay = a, y[a, cols]
+        xs = np.arange(lo, hi)[:, None]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - xs) * (cy - ay))
+        a = lo + area.argmax(axis=0)
+        out[b + 1] = a
+    return out
+
+
+def pick_columns(values, max_traces=MAX_TRACES):
+    """선으로 그릴 열 위치: 많으면 마지막 값 기준 상위/하위 max_traces/2 개씩 (원래 순서 유지)"""
+    m = values.shape[1]
+    if m <= max_traces:
+        return np.arange(m)
+    last = ffill(values)[-1]
+    order = np.argsort(np.where(np.isnan(last), -np.inf, last), kind='stable')
+    half = max_traces // 2
+    return np.sort(np.concatenate([order[:max_traces - half], order[-half:]]))
+
+
+def percentile_band(values, q=BAND_PERCENTILES):
+    """날짜별 전체 종목 분포 (len(q), 날짜 수) — 상장 전 종목(NaN)은 제외"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # 모든 종목이 NaN 인 날짜
+        return np.nanpercentile(values, q, axis=1)
+
+
+def downsample(values, n_out, method='minmax'):
+    """(위치 배열, 값 배열) — 둘 다 (점 수, 열 수)"""
+    idx = lttb_indices(values, n_out) if method == 'lttb' else minmax_indices(values, n_out)
+    return idx, np.take_along_axis(values, idx, axis=0)
+
+
+def trace_data(dates, values, method='minmax', width_px=CHART_WIDTH_PX, budget=POINT_BUDGET):
+    """종목별 (x: epoch ms 배열, y: 값 배열) 목록 — 전체 점 수는 budget 이하 (종목 수가 아주 많으면 MIN_POINTS 기준)"""
+    ms = dates.astype('datetime64[ms]').astype(np.int64)
+    idx, ys = downsample(values, points_per_trace(values.shape[1], width_px, budget), method)
+    out = []
+    for j in range(values.shape[1]):
+        y = ys[:, j]
+        keep = ~np.isnan(y)
+        if j and (idx[:, j] == idx[:, j - 1]).all():
+            x = x_prev  # 같은 위치면 배열 공유
+        else:
+            x = ms[idx[:, j]]
+        x_prev = x
+        out.append((x[keep], np.round(y[keep], 4)))
+    return out
+
+
+def line_figure(dates, values, columns, names, yaxis_title, method='minmax', width_px=CHART_WIDTH_PX,
+                budget=POINT_BUDGET, title=None):
+    """(날짜 × 종목) 값 배열 → plotly 선 차트 (종목당 점 수 제한, 많으면 상위/하위 + 분포 밴드)"""
+    import plotly.graph_objs as go
+
+    cols = pick_columns(values)
+    traces = trace_data(dates, values[:, cols], method, width_px, budget)
+    scatter = go.Scattergl if len(traces) > WEBGL_TRACES else go.Scatter
+    fig = go.Figure([scatter(x=x, y=y, mode='lines', name=names.get(t, t), line=dict(width=1))
+                     for t, (x, y) in zip(columns[cols], traces)])
+    if len(cols) < values.shape[1]:
+        # 그리지 않은 종목까지 포함한 전체 분포 밴드
+        band = trace_data(dates, percentile_band(values).T, method, width_px, len(BAND_PERCENTILES) * width_px)
+        for (x, y), q in zip(band, BAND_PERCENTILES):
+            fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name=f'전체 {q}%', line=dict(width=3, color='black'),
+                                     fill='tonexty' if q != BAND_PERCENTILES[0] else None,
+                                     fillcolor='rgba(0,0,0,0.08)'))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title='날짜', type='date'),
+        yaxis_title=yaxis_title,
+        legend_title='기업명',
+        height=600,
+        showlegend=len(traces) <= WEBGL_TRACES,
+        hovermode='closest',
+    )
+    return fig
+
+
+def price_figure(adj_close, names, normalized=True, method='minmax', width_px=CHART_WIDTH_PX,
+                 budget=POINT_BUDGET, title=None):
+    """종가 wide DataFrame → plotly Figure (종목당 점 수 제한)"""
+    values = adj_close.to_numpy(dtype=float)
+    values = normalize(values) if normalized else ffill(values)
+    return line_figure(adj_close.index.to_numpy(), values, adj_close.columns, names,
+                       '지수 (시작=100)' if normalized else '종가', method, width_px, budget, title)
+
+
+def heatmap_order(matrix, max_size=MAX_HEATMAP):
+    """상관 행렬 표시 순서: 평균 상관 순으로 정렬하고, 크면 고르게 max_size 개만 골라 셀 수 제한"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        order = np.argsort(-np.nan_to_num(np.nanmean(matrix, axis=1)), kind='stable')
+    if len(order) > max_size:
+        order = order[np.linspace(0, len(order) - 1, max_size).astype(np.int64)]
+    return order
+
+
+def corr_figure(corr, columns, names, title=None):
+    """상관계수 행렬 히트맵 (종목이 많으면 MAX_HEATMAP 개로 줄임)"""
+    import plotly.graph_objs as go
+
+    order = heatmap_order(corr)
+    labels = [names.get(t, t) for t in columns[order]]
+    z = np.round(corr[np.ix_(order, order)], 2)
+    fig = go.Figure(go.Heatmap(z=z, x=labels, y=labels, zmin=-1, zmax=1, colorscale='RdBu', reversescale=True))
+    fig.update_layout(title=title, height=max(500, min(900, 12 * len(order))), yaxis_autorange='reversed')
+    return fig
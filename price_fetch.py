@@ -0,0 +1,129 @@
+# price_fetch.py
+# 종목별 동시 다운로드 (스레드 풀, 종목마다 제한시간 + 지수 백오프 재시도)
+# - 종목 하나가 느리거나 실패해도 나머지는 도착하는 순서대로 바로 돌려줌 (fetch_many 는 제너레이터)
+# - 제한시간은 작업이 실제로 시작된 시각부터 잼 (풀에서 순서를 기다린 시간은 빼고)
+# - 동시에 띄우는 작업은 workers 개까지: 나머지는 앞 작업이 끝나면 이어서 제출 → 큐에 쌓여 제한시간을 다 쓰지 않음
+# - 제한시간을 넘긴 시도는 기다리지 않고 버린 뒤 재시도 (스레드는 끝날 때까지 돌지만 결과는 무시,
+#   버린 작업도 끝날 때까지 workers 자리를 차지, yf_download 에는 timeout 을 넘겨 오래 붙잡지 않게 함)
+# - 최종 결과마다 상태 dict: ticker, status('ok' | 'empty' | 'error' | 'timeout'), attempts, rows, error, elapsed_s
+# 재시도 동작 확인: python price_fetch.py
+
+import heapq
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+MAX_WORKERS = 6
+TIMEOUT_S = 10.0      # 시도 한 번의 제한시간
+RETRIES = 3           # 첫 시도 포함 최대 시도 횟수
+BACKOFF_S = 0.5       # 재시도 대기: BACKOFF_S * 2**(시도-1) (+ 최대 50% 지터)
+START_POLL_S = 0.05   # 풀에서 아직 시작하지 않은 작업이 있을 때 시작 여부를 확인하는 간격
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="price-fetch")
+
+
+def backoff_delay(attempt, base=BACKOFF_S, rng=random.random):
+    return base * 2 ** (attempt - 1) * (1 + 0.5 * rng())
+
+
+def _timed(box, clock, download, *args):
+    box[0] = clock()   # 실제 시작 시각 (제한시간 기준)
+    return download(*args)
+
+
+def fetch_many(tickers, download, timeout=TIMEOUT_S, retries=RETRIES, backoff=BACKOFF_S, pool=None,
+               workers=MAX_WORKERS, clock=time.monotonic):
+    """tickers: {티커: 인자 튜플} 또는 티커 목록, download(ticker, *인자) → Series/DataFrame
+
+    끝난 종목부터 (ticker, 결과 또는 None, 상태 dict) 를 yield 한다.
+    """
+    pool = pool or _pool
+    args = tickers if isinstance(tickers, dict) else {t: () for t in tickers}
+    started = {t: clock() for t in args}
+    attempts = dict.fromkeys(args, 0)
+    errors = {}
+    running = {}      # future -> (ticker, [시작 시각 또는 None])
+    abandoned = set()  # 제한시간을 넘겨 버렸지만 아직 도는 작업 (workers 자리 차지)
+    retry = [(clock(), t) for t in args]   # (시작 가능 시각, 티커) 힙
+    heapq.heapify(retry)
+
+    def status(t, name, result=None):
+        rows = 0 if result is None else len(result)
+        return {'ticker': t, 'status': name, 'attempts': attempts[t], 'rows': rows,
+                'error': errors.get(t), 'elapsed_s': round(clock() - started[t], 3)}
+
+    def failed(t, error, kind):
+        errors[t] = error
+        if attempts[t] < retries:
+            heapq.heappush(retry, (clock() + backoff_delay(attempts[t], backoff), t))
+            return None
+        return status(t, kind)
+
+    while running or retry:
+        abandoned = {f for f in abandoned if not f.done()}
+        now = clock()
+        while retry and retry[0][0] <= now and len(running) + len(abandoned) < workers:
+            _, t = heapq.heappop(retry)
+            attempts[t] += 1
+            box = [None]
+            running[pool.submit(_timed, box, clock, download, t, *args[t])] = (t, box)
+        waits = [box[0] + timeout for _, box in running.values() if box[0] is not None]
+        if any(box[0] is None for _, box in running.values()):
+            waits.append(now + START_POLL_S)
+        if retry and len(running) + len(abandoned) < workers:
+            waits.append(retry[0][0])
+        wait_s = max(min(waits) - clock(), 0) if waits else None
+        done, _ = wait(list(running) + list(abandoned), timeout=wait_s, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut not in running:
+                continue  # 버린 작업이 끝남 (자리만 비움)
+            t, _ = running.pop(fut)
+            exc = fut.exception()
+            if exc is not None:
+                st = failed(t, f'{type(exc).__name__}: {exc}', 'error')
+                if st:
+                    yield t, None, st
+                continue
+            result = fut.result()
+            errors.pop(t, None)
+            yield t, result, status(t, 'ok' if result is not None and len(result) else 'empty', result)
+        now = clock()
+        for fut, (t, box) in list(running.items()):
+            if box[0] is not None and box[0] + timeout <= now and not fut.done():
+                del running[fut]   # 버림 (결과는 무시)
+                abandoned.add(fut)
+                st = failed(t, f'{timeout:g}s 안에 응답 없음', 'timeout')
+                if st:
+                    yield t, None, st
+
+
+def status_frame(statuses):
+    """상태 dict 목록 → 표시용 DataFrame (실패한 종목 먼저)"""
+    df = pd.DataFrame(statuses, columns=['ticker', 'status', 'attempts', 'rows', 'error', 'elapsed_s'])
+    return df.sort_values(['status', 'ticker'], key=lambda s: s.ne('ok') if s.name == 'status' else s,
+                          ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # 느린 종목/가끔 실패하는 종목/항상 실패하는 종목이 섞인 가짜 다운로드
+    flaky = {'MSFT': 1}
+
+    def fake(t):
+        if t == 'SLOW':
+            time.sleep(1.5)
+        elif t == 'BAD':
+            raise ConnectionError('HTTP 500')
+        elif flaky.get(t, 0) > 0:
+            flaky[t] -= 1
+            raise ConnectionError('일시 오류')
+        time.sleep(0.05)
+        return pd.Series(range(5))
+
+    t0 = time.perf_counter()
+    statuses = []
+    for ticker, result, st in fetch_many(['AAPL', 'MSFT', 'SLOW', 'BAD', 'NVDA'], fake, timeout=1.0, backoff=0.1):
+        print(f'{time.perf_counter() - t0:5.2f}s  {ticker:<5} {st["status"]}')
+        statuses.append(st)
+    print(status_frame(statuses))
@@ -0,0 +1,423 @@
+# price_store.py
+# 주가 로컬 저장소 (SQLite) + 증분 다운로드
+# - 종목별 일봉 종가를 prices 테이블에 보관하고, 화면은 항상 디스크에서 읽음
+# - 불러올 때 오래된 종목만 마지막 저장 봉 이후 구간을 받음 (처음 실행 = 종목별 전체 기간, 같은 날 재실행 = 네트워크 호출 0회)
+#   종목별 동시 요청 + 제한시간/재시도(price_fetch.fetch_many): 도착한 종목부터 저장하고 상태를 돌려줌,
+#   실패한 종목은 기존 저장값 그대로 (다음 실행 때 다시 시도)
+# - auto_adjust 종가는 배당/분할 때 과거 값이 바뀌므로 마지막 몇 봉을 겹쳐 받아 비교하고,
+#   어긋나면 그 종목만 전체 기간을 다시 받음
+# - "완성된 봉"은 사용자 PC 날짜가 아니라 거래소 현지 시각 기준 (티커 접미사 → 시간대/마감 시각, 기본 미국 동부)
+#   장중(마감 + SETTLE_MIN 전)인 당일 봉은 저장/비교하지 않음 → 한국에서 미국 장중에 열어도 미완성 봉이 섞이지 않음
+# - 다운로더는 주입 가능: downloader(tickers, start, end) → yf.download 와 같은 모양의 DataFrame
+#   (테스트/오프라인: FakeDownloader)
+# 확인: python price_store.py [--db prices.db] [--fake] AAPL MSFT ...
+
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from price_fetch import MAX_WORKERS, TIMEOUT_S, fetch_many
+
+HISTORY_DAYS = 365
+OVERLAP_BARS = 3          # 증분 요청 때 다시 받아 비교할 최근 봉 수
+RECHECK_S = 60 * 60       # 최신 봉이 아직 없어도(휴장일 등) 이 시간 안에는 다시 묻지 않음
+ADJUST_RTOL = 1e-6        # 겹친 봉의 종가가 이보다 다르면 수정주가가 바뀐 것으로 보고 전체 재다운로드
+CHUNK_SIZE = 10           # 작업 하나에 넣을 최대 종목 수 (yfinance 는 종목마다 요청 하나 → 제한시간 안에 끝나도록)
+FRAME_CACHE_SIZE = 8      # read() 결과 캐시 개수 (종목 목록 × 시작일)
+SETTLE_MIN = 30           # 정규장 마감 후 종가가 확정됐다고 볼 때까지 여유(분)
+
+# 티커 접미사 → (거래소 시간대, 정규장 마감 시:분). 접미사가 없으면 미국 (DEFAULT_EXCHANGE)
+EXCHANGES = {
+    '.KS': ('Asia/Seoul', (15, 30)),
+    '.KQ': ('Asia/Seoul', (15, 30)),
+    '.T': ('Asia/Tokyo', (15, 30)),
+    '.HK': ('Asia/Hong_Kong', (16, 0)),
+    '.SS': ('Asia/Shanghai', (15, 0)),
+    '.SZ': ('Asia/Shanghai', (15, 0)),
+    '.L': ('Europe/London', (16, 30)),
+    '.DE': ('Europe/Berlin', (17, 30)),
+    '.PA': ('Europe/Paris', (17, 30)),
+    '.TO': ('America/Toronto', (16, 0)),
+}
+INDEX_EXCHANGES = {'^KS11': '.KS', '^KQ11': '.KQ', '^N225': '.T', '^HSI': '.HK', '^FTSE': '.L', '^GDAXI': '.DE'}
+DEFAULT_EXCHANGE = ('America/New_York', (16, 0))
+
+_local = threading.local()
+
+
+def get_conn(db_path):
+    # 스레드별 연결 재사용 (hospital_db.get_conn 과 같은 방식)
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = sqlite3.connect(db_path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def init_price_schema(db_path):
+    conn = get_conn(db_path)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prices (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                close REAL,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID
+        ''')
+        # 종목별 받아 둔 구간 시작일 + 마지막 확인 시각 (최신 봉이 없어도 RECHECK_S 안에는 다시 요청하지 않기 위함)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_fetch_log (
+                ticker TEXT PRIMARY KEY,
+                covered_from TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        ''')
+
+
+def extract_close(data, tickers, daily=True):
+    """yf.download 결과 → 종가 wide DataFrame (컬럼 = 티커, 'Adj Close' 우선, 없으면 'Close')
+    daily=False 면 시각을 날짜로 자르지 않음 (분봉)"""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(tickers), dtype=float)
+    if isinstance(data.columns, pd.MultiIndex):
+        # group_by='ticker' 면 level 0 이 티커, 아니면 level 0 이 속성
+        level = 0 if set(tickers) & set(data.columns.get_level_values(0)) else 1
+        fields = set(data.columns.get_level_values(1 - level))
+        field = 'Adj Close' if 'Adj Close' in fields else 'Close' if 'Close' in fields else None
+        if field is None:
+            raise ValueError("데이터에서 'Adj Close' 또는 'Close' 값을 찾을 수 없습니다.")
+        close = data.xs(field, axis=1, level=1 - level)
+    else:
+        field = 'Adj Close' if 'Adj Close' in data.columns else 'Close' if 'Close' in data.columns else None
+        if field is None:
+            raise ValueError("데이터에서 'Adj Close' 또는 'Close' 값을 찾을 수 없습니다.")
+        close = data[[field]].set_axis(list(tickers)[:1], axis=1)
+    close = close.loc[:, [t for t in tickers if t in close.columns]]
+    close.index = pd.DatetimeIndex(close.index).tz_localize(None)
+    if daily:
+        close.index = close.index.normalize()
+    return close.astype(float)
+
+
+def yf_download(tickers, start, end, timeout=TIMEOUT_S):
+    """yfinance 다운로드 (end 는 포함하지 않음) → yf.download(group_by='ticker') 와 같은 모양
+
+    yf.download 는 호출별 결과를 모듈 전역(shared._DFS 등)에 두므로 여러 스레드에서 동시에 부르면 섞임
+    → 동시에 불러도 안전한 Ticker.history 를 종목별로 부름 (시간대는 종목별로 떼어 거래소 현지 날짜 유지)
+    """
+    import yfinance as yf
+
+    frames = {}
+    for t in tickers:
+        hist = yf.Ticker(t).history(start=start, end=end, auto_adjust=True, timeout=timeout)
+        if not hist.empty:
+            hist.index = pd.DatetimeIndex(hist.index).tz_localize(None)
+            frames[t] = hist[['Close']]
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+def load_universe(path):
+    """종목 목록 파일 → {티커: 이름} (순서 유지)
+
+    CSV: ticker[,name] 헤더가 있는 표 (KOSPI200/S&P500 구성 종목 등), 그 외: 한 줄에 티커 하나 ('#' 주석 가능)
+    """
+    if str(path).lower().endswith('.csv'):
+        df = pd.read_csv(path, dtype=str, comment='#').dropna(subset=['ticker'])
+        names = df['name'] if 'name' in df.columns else df['ticker']
+        return dict(zip(df['ticker'].str.strip(), names.fillna(df['ticker']).str.strip()))
+    with open(path, encoding='utf-8') as f:
+        tickers = [line.split('#', 1)[0].strip() for line in f]
+    return {t: t for t in tickers if t}
+
+
+def chunk_size_for(n, workers=MAX_WORKERS):
+    """종목이 적으면 종목별 요청(하나가 느려도 나머지는 바로 표시), 많으면 작업자당 몇 묶음이 되도록 묶음"""
+    return max(1, min(CHUNK_SIZE, math.ceil(n / (workers * 4))))
+
+
+def make_chunks(starts, size, ends):
+    """{티커: 시작일}, {티커: 끝(미포함)} → {(티커, ...): (시작일, 끝)} — 시작일/끝이 같은 종목끼리 size 개씩"""
+    groups = {}
+    for t, s in starts.items():
+        groups.setdefault((s, ends[t]), []).append(t)
+    return {tuple(ts[i:i + size]): key for key, ts in groups.items() for i in range(0, len(ts), size)}
+
+
+def exchange_of(ticker):
+    """티커 → (거래소 시간대 이름, (마감 시, 분))"""
+    suffix = INDEX_EXCHANGES.get(ticker)
+    if suffix is None and '.' in ticker:
+        suffix = '.' + ticker.rsplit('.', 1)[1]
+    return EXCHANGES.get(suffix, DEFAULT_EXCHANGE)
+
+
+def session_end(ticker, now):
+    """now(epoch 초)에 완성된 일봉의 끝 날짜 (미포함) — 거래소 현지 날짜, 마감 + SETTLE_MIN 전이면 당일 제외"""
+    tz, (hour, minute) = exchange_of(ticker)
+    local = datetime.fromtimestamp(now, ZoneInfo(tz))
+    settled = local.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(minutes=SETTLE_MIN)
+    return local.date() + timedelta(days=1) if local >= settled else local.date()
+
+
+def last_business_day(today):
+    """today 이전(당일 제외)의 마지막 평일 — 이 날짜 봉까지 있으면 최신으로 봄"""
+    d = today - timedelta(days=1)
+    while d.weekday() >= 5:
+        d -= timedelta(days=1)
+    return d
+
+
+class PriceStore:
+    """SQLite 종가 저장소 + 증분 갱신"""
+
+    def __init__(self, db_path, downloader=yf_download, clock=time.time):
+        self.db_path = db_path
+        self.downloader = downloader
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._inflight = set()  # 다른 세션이 받고 있는 종목 (중복 요청 방지)
+        self.version = 0        # 저장할 때마다 증가 (read 캐시 무효화)
+        self._frames = OrderedDict()  # (티커 튜플, start) → (version, wide DataFrame)
+        init_price_schema(db_path)
+
+    def _state(self, tickers):
+        # {티커: (받아 둔 구간 시작일, 마지막 저장 날짜, 마지막 확인 시각)} — 없으면 None
+        conn = get_conn(self.db_path)
+        marks = ','.join('?' * len(tickers))
+        last = dict(conn.execute(
+            f'SELECT ticker, MAX(date) FROM prices WHERE ticker IN ({marks}) GROUP BY ticker', tickers).fetchall())
+        log = {t: (c, at) for t, c, at in conn.execute(
+            f'SELECT ticker, covered_from, checked_at FROM price_fetch_log WHERE ticker IN ({marks})', tickers)}
+        return {t: (log.get(t, (None, None))[0], last.get(t), log.get(t, (None, None))[1]) for t in tickers}
+
+    def session_ends(self, tickers, today=None):
+        """{티커: 완성된 봉의 끝 날짜(미포함)} — today 를 주면 모든 종목에 그 날짜 (테스트/재현용)"""
+        if today is not None:
+            return dict.fromkeys(tickers, today)
+        now = self.clock()
+        return {t: session_end(t, now) for t in tickers}
+
+    def stale(self, tickers, start, today=None, ends=None):
+        """갱신이 필요한 {티커: 받을 시작 날짜} (받을 것이 없으면 빈 dict)"""
+        ends = ends or self.session_ends(tickers, today)
+        now = self.clock()
+        out = {}
+        for t, (covered, last, checked) in self._state(list(tickers)).items():
+            latest = last_business_day(ends[t]).isoformat()
+            if covered is None or covered > start.isoformat():
+                out[t] = start  # 처음 받거나 더 긴 기간을 요청: 전체 구간
+            elif (last is None or last < latest) and now - checked >= RECHECK_S:
+                out[t] = start if last is None else None  # 증분: 아래에서 겹침 구간 포함 시작일 계산
+        if any(v is None for v in out.values()):
+            overlap = self._overlap_start([t for t, v in out.items() if v is None])
+            out.update({t: overlap[t] for t in overlap})
+        return out
+
+    def _overlap_start(self, tickers):
+        # 종목별 최근 OVERLAP_BARS 번째 봉 날짜 (한 번의 쿼리)
+        marks = ','.join('?' * len(tickers))
+        rows = get_conn(self.db_path).execute(f'''
+            SELECT ticker, MIN(date) FROM (
+                SELECT ticker, date, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS rn
+                FROM prices WHERE ticker IN ({marks})
+            ) WHERE rn <= ? GROUP BY ticker
+        ''', [*tickers, OVERLAP_BARS]).fetchall()
+        return {t: date.fromisoformat(d) for t, d in rows}
+
+    def _stored(self, tickers, start):
+        conn = get_conn(self.db_path)
+        marks = ','.join('?' * len(tickers))
+        return pd.read_sql_query(
+            f'SELECT ticker, date, close FROM prices WHERE ticker IN ({marks}) AND date >= ?', conn,
+            params=[*tickers, start.isoformat()])
+
+    def _write(self, close, covered, replace=()):
+        # replace: 기존 봉을 지우고 새로 쓸 티커 (수정주가 재다운로드)
+        conn = get_conn(self.db_path)
+        with conn:
+            if replace:
+                marks = ','.join('?' * len(replace))
+                conn.execute(f'DELETE FROM prices WHERE ticker IN ({marks})', list(replace))
+                conn.execute(f'DELETE FROM price_fetch_log WHERE ticker IN ({marks})', list(replace))
+            self.version += 1
+            if not close.empty:
+                long = close.stack().rename('close').reset_index()
+                long.columns = ['date', 'ticker', 'close']
+                rows = zip(long['ticker'], long['date'].dt.strftime('%Y-%m-%d'), long['close'].astype(float))
+                conn.executemany('INSERT OR REPLACE INTO prices (ticker, date, close) VALUES (?, ?, ?)', rows)
+            # 증분으로 받은 종목은 기존 시작일 유지 (MIN)
+            conn.executemany('''
+                INSERT INTO price_fetch_log (ticker, covered_from, checked_at) VALUES (?, ?, ?)
+                ON CONFLICT (ticker) DO UPDATE SET
+                    covered_from = MIN(covered_from, excluded.covered_from),
+                    checked_at = excluded.checked_at
+            ''', [(t, s.isoformat(), self.clock()) for t, s in covered.items()])
+
+    def _adjusted(self, close, starts):
+        """겹친 구간의 저장값과 새 값이 다른(수정주가가 바뀐) 티커"""
+        tickers = [t for t in starts if t in close.columns]
+        if not tickers:
+            return []
+        old = self._stored(tickers, min(starts[t] for t in tickers)).pivot(index='date', columns='ticker', values='close')
+        old.index = pd.to_datetime(old.index)
+        changed = []
+        for t in tickers:
+            if t not in old.columns:
+                continue
+            both = pd.concat([old[t], close[t]], axis=1, join='inner').dropna()
+            if len(both) and not np.allclose(both.iloc[:, 0], both.iloc[:, 1], rtol=ADJUST_RTOL, atol=0):
+                changed.append(t)
+        return changed
+
+    def _download_chunk(self, chunk, start, end):
+        close = extract_close(self.downloader(list(chunk), start, end), list(chunk))
+        return close[close.index < pd.Timestamp(end)]  # 소스가 end 이후(장중) 봉을 같이 줘도 버림
+
+    def refresh_iter(self, tickers, start, today=None, chunk_size=None, **fetch_opts):
+        """오래된 종목을 묶음별로 동시에 받아 도착하는 대로 저장하고, 종목마다 상태 dict 를 yield (price_fetch.fetch_many)
+
+        chunk_size: 요청 한 번에 넣을 종목 수 (기본: 종목 수에 맞춰 chunk_size_for)
+        fetch_opts: timeout, retries, backoff (묶음별 제한시간/재시도)
+        """
+        # 장중인 당일 봉은 값이 바뀌므로 완성된 봉만 저장 (종목별 거래소 시각 기준, today 를 주면 그 전날까지)
+        ends = self.session_ends(tickers, today)
+        with self._lock:
+            starts = {t: s for t, s in self.stale(tickers, start, ends=ends).items() if t not in self._inflight}
+            self._inflight.update(starts)
+        try:
+            todo = starts
+            while todo:
+                redo = {}
+                tasks = make_chunks(todo, chunk_size or chunk_size_for(len(todo)), ends)
+                for chunk, close, st in fetch_many(tasks, self._download_chunk, **fetch_opts):
+                    since = tasks[chunk][0]
+                    if close is None:
+                        # 실패: 기존 저장값 유지, 다음 실행 때 다시 시도
+                        yield from (dict(st, ticker=t) for t in chunk)
+                        continue
+                    if since != start:
+                        # 배당/분할로 과거 수정주가가 바뀐 종목만 전체 기간 다시 받기 (드문 경우)
+                        redo.update(dict.fromkeys(self._adjusted(close, dict.fromkeys(chunk, since)), start))
+                    done = [t for t in chunk if t not in redo]
+                    part = close[[t for t in done if t in close.columns]].dropna(how='all')
+                    # 빈 결과(휴장/신규 상장 등)도 확인 시각은 기록 → RECHECK_S 동안 다시 묻지 않음
+                    self._write(part, dict.fromkeys(done, since), replace=list(part.columns) if since == start else ())
+                    rows = part.count()
+                    for t in done:
+                        n = int(rows.get(t, 0))
+                        yield dict(st, ticker=t, status='ok' if n else 'empty', rows=n)
+                todo = redo
+                starts = {**starts, **redo}
+        finally:
+            with self._lock:
+                self._inflight.difference_update(starts)
+
+    def refresh(self, tickers, start, today=None, **fetch_opts):
+        """오래된 종목만 받아 저장. 종목별 상태 dict 목록 반환 (받을 것이 없으면 [])"""
+        return list(self.refresh_iter(tickers, start, today, **fetch_opts))
+
+    def read(self, tickers, start):
+        """저장된 start 이후 종가 wide DataFrame (index = 날짜, 컬럼 = 티커, 네트워크 없음)
+
+        저장 이후 바뀐 것이 없으면 캐시된 객체를 그대로 돌려줌 (공유 객체이므로 수정하려면 .copy())
+        """
+        key = (tuple(tickers), start)
+        with self._lock:
+            hit = self._frames.get(key)
+            if hit is not None and hit[0] == self.version:
+                self._frames.move_to_end(key)
+                return hit[1]
+            version = self.version
+        long = self._stored(list(key[0]), start)
+        wide = long.pivot(index='date', columns='ticker', values='close')
+        wide.index = pd.to_datetime(wide.index)
+        wide = wide.reindex(columns=[t for t in key[0] if t in wide.columns])
+        with self._lock:
+            self._frames[key] = (version, wide)
+            self._frames.move_to_end(key)
+            while len(self._frames) > FRAME_CACHE_SIZE:
+                self._frames.popitem(last=False)
+        return wide
+
+    def load(self, tickers, start, today=None):
+        """필요한 만큼 갱신한 뒤 read()"""
+        self.refresh(tickers, start, today)
+        return self.read(tickers, start)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path, downloader=yf_download):
+    """DB 별로 프로세스에 하나 (Streamlit 재실행에도 유지)"""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = PriceStore(db_path, downloader)
+        return store
+
+
+# --------------- 테스트용 가짜 다운로더 -----------------
+
+class FakeDownloader:
+    """yf.download 대용: 티커별 고정 난수 랜덤워크 평일 봉, 호출 기록은 calls 에 남음"""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.calls = []   # (티커 목록, start, end)
+        self.scale = {}   # 티커 → 배율 (수정주가 변경 흉내)
+        self.delay = {}   # 티커 → 응답 지연(초)
+        self.fail = {}    # 티커 → 남은 실패 횟수 (음수면 항상 실패)
+
+    def series(self, ticker, start, end):
+        days = np.arange(np.datetime64('2000-01-03'), np.datetime64(end), dtype='datetime64[D]')
+        days = pd.DatetimeIndex(days[np.is_busday(days)])
+        rng = np.random.default_rng([self.seed, sum(map(ord, ticker))])
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days)))) * self.scale.get(ticker, 1.0)
+        s = pd.Series(prices, index=days)
+        return s[s.index >= pd.Timestamp(start)]
+
+    def __call__(self, tickers, start, end):
+        self.calls.append((list(tickers), start, end))
+        for t in tickers:
+            time.sleep(self.delay.get(t, 0))
+            if self.fail.get(t, 0):
+                self.fail[t] -= 1
+                raise ConnectionError(f'{t}: 가짜 다운로드 실패')
+        frames = {t: pd.DataFrame({'Close': self.series(t, start, end)}) for t in tickers}
+        return pd.concat(frames, axis=1)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='주가 로컬 저장소 갱신/확인')
+    parser.add_argument('tickers', nargs='*', default=['AAPL', 'MSFT', 'NVDA'])
+    parser.add_argument('--db', default='prices.db')
+    parser.add_argument('--days', type=int, default=HISTORY_DAYS)
+    parser.add_argument('--fake', action='store_true', help='네트워크 대신 FakeDownloader 사용')
+    args = parser.parse_args()
+    fake = FakeDownloader() if args.fake else None
+    store = PriceStore(args.db, fake or yf_download)
+    start = date.today() - timedelta(days=args.days)
+    for attempt in ('첫 실행', '재실행'):
+        t0 = time.perf_counter()
+        fetched = store.refresh(args.tickers, start)
+        wide = store.load(args.tickers, start)
+        print(f'{attempt}: 요청 종목 {len(fetched)}개, 저장된 봉 {wide.shape[0]}일 x {wide.shape[1]}종목 '
+              f'({(time.perf_counter() - t0) * 1000:.0f} ms)')
+    if fake:
+        print(f'다운로더 호출 {len(fake.calls)}회: {[(len(c[0]), str(c[1])) for c in fake.calls]}')
@@ -0,0 +1,304 @@
+# price_stream.py
+# 장중 실시간 모드: 분봉(또는 시세)을 백그라운드 스레드에서 주기적으로 받아 종목별 링 버퍼에 쌓음
+# - 종목마다 미리 잡아 둔 고정 크기 NumPy 배열(시각 epoch ms, 값) 링 버퍼 → 틱마다 DataFrame 을 이어 붙이지 않음
+#   버퍼가 차면 가장 오래된 봉부터 덮어씀 (메모리 = 종목 수 × RING_SIZE 고정)
+# - 읽는 쪽은 커서(지금까지 받은 순번)를 들고 있다가 updates(cursors) 로 그 뒤에 들어온 점만 받음
+#   → 화면은 새 점만 차트에 추가 (Streamlit add_rows)
+# - 데이터 소스는 주입 가능: source.poll(tickers, last_ts) → {티커: (epoch ms 배열, 값 배열)}
+#   YFinanceSource: yfinance 1분봉 (마지막 저장 봉 이후만 요청, 진행 중인 마지막 봉은 버림)
+#   ReplaySource: 저장된 분봉(DataFrame/CSV)을 한 번에 몇 줄씩 재생 (테스트/오프라인, 장 마감 후 확인)
+# - 소스 오류는 기존 버퍼를 그대로 두고 지수 백오프로 다시 시도 (price_fetch.backoff_delay)
+# - 스레드가 멈추는 경우: stop_streamer(화면에서 실시간 끔), IDLE_S 동안 읽는 화면이 없음, 캐시에서 밀려남, 프로세스 종료
+#   멈춘 스트리머도 버퍼는 남고, 다시 start() 하면 이어서 받음
+# 확인: python price_stream.py [--replay ticks.csv] [--tickers 50] [--capacity 500]
+
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from price_fetch import TIMEOUT_S, backoff_delay
+from price_store import extract_close
+
+RING_SIZE = 2000          # 종목당 보관할 최근 봉 수 (1분봉 약 5거래일)
+POLL_S = 15.0             # 소스 조회 간격(초)
+MAX_BACKOFF_S = 120.0     # 연속 실패 때 최대 대기(초)
+STREAMERS = 4             # 프로세스에 유지할 스트리머 수 (종목 목록 × 소스)
+IDLE_S = 60.0             # 이 시간 동안 updates() 를 부른 화면이 없으면 스레드 종료 (창을 닫은 세션 등)
+
+_NO_TS = np.iinfo(np.int64).min
+
+
+class TickRing:
+    """종목 하나의 고정 크기 링 버퍼 (시각은 epoch ms, 시각이 늘어나는 점만 받음)"""
+
+    def __init__(self, capacity=RING_SIZE):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full(capacity, np.nan)
+        self.count = 0   # 지금까지 받은 점 수 (순번, 커서로 사용)
+
+    @property
+    def last_ts(self):
+        return int(self.ts[(self.count - 1) % self.capacity]) if self.count else _NO_TS
+
+    def append(self, ts, values):
+        """시각순 배열을 한 번에 추가, 이미 있는 시각 이하는 버림 → 추가한 점 수"""
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        keep = ts > self.last_ts
+        ts, values = ts[keep], values[keep]
+        n = len(ts)
+        if not n:
+            return 0
+        skip = max(n - self.capacity, 0)   # 버퍼보다 많으면 뒤쪽만 씀
+        pos = np.arange(self.count + skip, self.count + n) % self.capacity
+        self.ts[pos] = ts[skip:]
+        self.values[pos] = values[skip:]
+        self.count += n
+        return n
+
+    def since(self, seq=0):
+        """순번 seq 이후에 들어온 점 (시각순, 이미 덮어쓴 점은 빠짐)"""
+        idx = np.arange(max(seq, self.count - self.capacity), self.count) % self.capacity
+        return self.ts[idx], self.values[idx]
+
+
+def wide_frame(parts, tickers):
+    """{티커: (시각, 값)} → 시각 × 티커 DataFrame (그 시각에 값이 없는 종목은 NaN)"""
+    ts = np.unique(np.concatenate([parts[t][0] for t in tickers])) if tickers else np.zeros(0, dtype=np.int64)
+    out = np.full((len(ts), len(tickers)), np.nan)
+    for j, t in enumerate(tickers):
+        tt, vv = parts[t]
+        out[np.searchsorted(ts, tt), j] = vv
+    return pd.DataFrame(out, index=pd.DatetimeIndex(ts.astype('datetime64[ms]')), columns=list(tickers))
+
+
+class Streamer:
+    """소스를 주기적으로 조회해 종목별 TickRing 에 쌓는 백그라운드 스레드"""
+
+    def __init__(self, source, tickers, capacity=RING_SIZE, interval_s=POLL_S, clock=time.time):
+        self.source = source
+        self.tickers = list(dict.fromkeys(tickers))
+        self.rings = {t: TickRing(capacity) for t in self.tickers}
+        self.interval_s = interval_s
+        self.clock = clock
+        self.polls = 0
+        self.failures = 0        # 연속 실패 횟수
+        self.last_error = None
+        self.last_poll_at = None
+        self.last_read_at = clock()
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()   # 스레드 시작/종료 결정
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """소스를 한 번 조회해 버퍼에 추가 → 새로 들어온 점 수 (스레드 없이 직접 불러도 됨)"""
+        with self._lock:
+            last = {t: ring.last_ts for t, ring in self.rings.items()}
+        try:
+            batch = self.source.poll(self.tickers, last)
+        except Exception as exc:
+            self.failures += 1
+            self.last_error = f'{type(exc).__name__}: {exc}'
+            return 0
+        added = 0
+        with self._lock:
+            for t, (ts, values) in batch.items():
+                if t in self.rings:
+                    added += self.rings[t].append(ts, values)
+        self.polls += 1
+        self.failures = 0
+        self.last_error = None
+        self.last_poll_at = self.clock()
+        return added
+
+    def _run(self):
+        while True:
+            self.poll()
+            wait = self.interval_s
+            if self.failures:
+                wait = min(max(wait, backoff_delay(self.failures)), MAX_BACKOFF_S)
+            self._stop.wait(wait)
+            with self._run_lock:
+                # 종료 여부를 start() 와 같은 잠금 안에서 결정 (막 stop 된 직후 start 가 와도 스레드가 하나는 남음)
+                if self._stop.is_set() or self.clock() - self.last_read_at > IDLE_S:
+                    self._thread = None
+                    return
+
+    def start(self):
+        """조회 스레드 시작 (이미 돌고 있으면 그대로). 멈췄던 스트리머는 버퍼를 유지한 채 이어서 받음"""
+        with self._run_lock:
+            self._stop.clear()
+            self.last_read_at = self.clock()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='price-stream', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def cursors(self):
+        with self._lock:
+            return {t: ring.count for t, ring in self.rings.items()}
+
+    def updates(self, cursors=None):
+        """커서 이후 새 점만 (wide DataFrame, 새 커서). cursors 가 None 이면 버퍼 전체"""
+        cursors = cursors or {}
+        self.last_read_at = self.clock()
+        with self._lock:
+            parts = {t: ring.since(cursors.get(t, 0)) for t, ring in self.rings.items()}
+            new = {t: ring.count for t, ring in self.rings.items()}
+        return wide_frame(parts, self.tickers), new
+
+    def frame(self):
+        return self.updates()[0]
+
+
+class YFinanceSource:
+    """yfinance 분봉 소스. 마지막 저장 봉 이후만 요청하고, 아직 끝나지 않았을 수 있는 마지막 봉은 버림
+    (버린 봉은 다음 조회 때 끝난 봉으로 다시 받음)"""
+
+    def __init__(self, interval='1m', timeout=TIMEOUT_S):
+        self.interval = interval
+        self.timeout = timeout
+
+    def poll(self, tickers, last_ts):
+        # yf.download 는 결과를 모듈 전역에 두어 다른 스레드(price_store 갱신 등)와 섞이므로 종목별 Ticker.history
+        import yfinance as yf
+
+        out = {}
+        for t in tickers:
+            last = last_ts.get(t, _NO_TS)
+            # 처음이면 당일, 아니면 마지막 봉 날짜부터 (yfinance 1분봉은 최근 7일까지만 제공)
+            window = dict(period='1d') if last == _NO_TS else dict(start=pd.Timestamp(last, unit='ms').date())
+            hist = yf.Ticker(t).history(interval=self.interval, auto_adjust=True, timeout=self.timeout, **window)
+            if hist.empty:
+                continue
+            hist.index = pd.DatetimeIndex(hist.index).tz_localize(None)
+            close = extract_close(hist, [t], daily=False)[t].iloc[:-1]
+            ts = close.index.to_numpy().astype('datetime64[ms]').astype(np.int64)
+            v = close.to_numpy()
+            keep = ~np.isnan(v) & (ts > last)
+            out[t] = ts[keep], v[keep]
+        return out
+
+
+class ReplaySource:
+    """저장된 분봉(시각 × 티커 DataFrame)을 조회마다 rows 줄씩 돌려주는 소스"""
+
+    def __init__(self, frame, rows=1):
+        self.ts = pd.DatetimeIndex(frame.index).to_numpy().astype('datetime64[ms]').astype(np.int64)
+        self.values = {t: frame[t].to_numpy(dtype=float) for t in frame.columns}
+        self.rows = rows
+        self.pos = 0
+
+    @classmethod
+    def from_csv(cls, path, rows=1):
+        """첫 열 = 시각, 나머지 열 = 티커별 가격"""
+        return cls(pd.read_csv(path, index_col=0, parse_dates=True), rows)
+
+    @property
+    def done(self):
+        return self.pos >= len(self.ts)
+
+    def poll(self, tickers, last_ts):
+        lo, hi = self.pos, min(self.pos + self.rows, len(self.ts))
+        self.pos = hi
+        out = {}
+        for t in tickers:
+            if t in self.values:
+                v = self.values[t][lo:hi]
+                keep = ~np.isnan(v)
+                out[t] = self.ts[lo:hi][keep], v[keep]
+        return out
+
+
+def make_ticks(tickers, minutes, start='2024-01-02 09:30', seed=0):
+    """재생용 가짜 1분봉: 티커별 랜덤워크, 일부 분은 값 없음(거래 없음)"""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=minutes, freq='min')
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, (minutes, len(tickers))), axis=0))
+    prices[rng.random(prices.shape) < 0.05] = np.nan
+    return pd.DataFrame(prices, index=index, columns=list(tickers))
+
+
+_streamers = OrderedDict()   # (소스 이름, 종목 튜플) → Streamer
+_streamers_lock = threading.Lock()
+
+
+def get_streamer(tickers, source='yfinance', capacity=RING_SIZE, interval_s=POLL_S):
+    """종목 목록 × 소스 별로 프로세스에 하나 (Streamlit 재실행에도 버퍼/스레드 유지)
+    source: 'yfinance' 또는 재생할 CSV 경로"""
+    key = (source, tuple(tickers))
+    with _streamers_lock:
+        streamer = _streamers.get(key)
+        if streamer is None:
+            src = YFinanceSource() if source == 'yfinance' else ReplaySource.from_csv(source)
+            streamer = _streamers[key] = Streamer(src, tickers, capacity, interval_s)
+        _streamers.move_to_end(key)
+        while len(_streamers) > STREAMERS:
+            _streamers.popitem(last=False)[1].stop()
+    return streamer.start()
+
+
+def stop_streamer(tickers, source='yfinance'):
+    """화면에서 실시간을 끄면 조회 스레드를 멈춤 (버퍼는 유지, 같은 종목을 보는 다른 화면이 있으면 그쪽이 다시 start)"""
+    with _streamers_lock:
+        streamer = _streamers.get((source, tuple(tickers)))
+    if streamer is not None:
+        streamer.stop()
+
+
+@atexit.register
+def _stop_streamers():
+    with _streamers_lock:
+        streamers = list(_streamers.values())
+    for s in streamers:
+        s.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='링 버퍼 스트리밍 재생 확인')
+    parser.add_argument('--replay', default=None, help='재생할 분봉 CSV (생략 시 가짜 분봉)')
+    parser.add_argument('--tickers', type=int, default=50, help='가짜 분봉 종목 수')
+    parser.add_argument('--minutes', type=int, default=390 * 5)
+    parser.add_argument('--capacity', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=7, help='조회 한 번에 재생할 줄 수')
+    args = parser.parse_args()
+
+    ticks = (pd.read_csv(args.replay, index_col=0, parse_dates=True) if args.replay
+             else make_ticks([f'T{i:03d}' for i in range(args.tickers)], args.minutes))
+    streamer = Streamer(ReplaySource(ticks, args.rows), ticks.columns, args.capacity)
+
+    # 스레드 없이 직접 poll 하며 화면처럼 새 점만 받아 모음
+    t0 = time.perf_counter()
+    cursors = streamer.cursors()
+    received = []
+    while not streamer.source.done:
+        streamer.poll()
+        new, cursors = streamer.updates(cursors)
+        received.append(new)
+    elapsed = time.perf_counter() - t0
+
+    expected = ticks.iloc[-args.capacity:] if len(ticks) else ticks
+    tail = streamer.frame().reindex(expected.index)
+    got = pd.concat(received)
+    print(f'{len(ticks.columns)}종목 x {len(ticks)}분 재생: 조회 {streamer.polls}회, {elapsed * 1000:.0f} ms '
+          f'({elapsed / max(streamer.polls, 1) * 1e6:.0f} us/조회)')
+    print(f'증분으로 받은 점 {int(got.notna().sum().sum()):,} / 원본 {int(ticks.notna().sum().sum()):,}, '
+          f'중복 시각 {int(got.index.duplicated().sum())}')
+    print('버퍼(최근 %d봉) == 원본 마지막 구간: %s' % (
+        args.capacity, np.allclose(tail.to_numpy(), expected.to_numpy(), equal_nan=True)))
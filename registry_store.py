@@ -0,0 +1,81 @@
+# registry_store.py
+# 정규화된 병원 레지스트리 Parquet 저장소
+# - CSV(텍스트)를 한 번만 정규화해 lat/lon(float64), id/name/tel/addr(string), 상태 컬럼(bool/int32)으로 저장
+# - 앱은 Parquet 을 memory-map 으로 열고 필요한 컬럼만 읽음 → 텍스트 파싱/좌표 문자열 정리 없음
+# 변환: python registry_store.py hospitals_sample.csv [hospitals_sample.parquet]
+# (pyarrow 필요)
+
+import os
+
+import pandas as pd
+
+from csv_ingest import ingest_csv
+from hospital_search import as_bool_array
+
+REGISTRY_DTYPES = {
+    "id": "string",
+    "name": "string",
+    "tel": "string",
+    "addr": "string",
+    "lat": "float64",
+    "lon": "float64",
+    "accepting": "bool",
+    "waiting": "int32",
+    "delivery_beds": "int32",
+}
+
+
+def normalize_registry(df):
+    """레지스트리 컬럼만 남기고 dtype 고정"""
+    out = pd.DataFrame(index=df.index)
+    for col, dtype in REGISTRY_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if col == "accepting":
+            out[col] = as_bool_array(df[col])
+        elif dtype == "int32":
+            out[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(dtype)
+        else:
+            out[col] = df[col].astype(dtype)
+    return out.reset_index(drop=True)
+
+
+def convert_csv(csv_path, parquet_path=None):
+    """CSV → 정규화 Parquet (한 번만 실행). 저장한 DataFrame 반환"""
+    parquet_path = parquet_path or registry_path(csv_path)
+    with open(csv_path, "rb") as f:
+        df, _ = ingest_csv(f)
+    df = normalize_registry(df)
+    df.to_parquet(parquet_path, index=False)
+    return df
+
+
+def read_registry(path, columns=None):
+    """Parquet 레지스트리 읽기 (memory-map, columns 로 필요한 컬럼만)"""
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+
+def registry_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def fresh_registry(csv_path):
+    """CSV 옆의 Parquet 이 있고 CSV 보다 최신이면 그 경로, 아니면 None"""
+    path = registry_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(path) < os.path.getmtime(csv_path):
+        return None
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="병원 CSV → 정규화 Parquet 레지스트리 변환")
+    parser.add_argument("csv_path")
+    parser.add_argument("parquet_path", nargs="?")
+    args = parser.parse_args()
+    df = convert_csv(args.csv_path, args.parquet_path)
+    print(f"{len(df):,}개 병원 → {args.parquet_path or registry_path(args.csv_path)}")
+    print(df.dtypes.to_string())
@@ -0,0 +1,235 @@
+# routing.py
+# 경로(라우팅) API 클라이언트 (OpenRouteService 호환)
+# - requests.Session 재사용: 매 요청마다 TCP/TLS 연결을 새로 맺지 않음
+# - 출발/도착 좌표를 반올림한 키로 LRU + TTL 캐시, 만료된 값은 일단 돌려주고 백그라운드에서 갱신
+# - 서킷 브레이커: 실패하거나 느린 응답이 이어지면 잠시 호출을 멈추고 직선거리(하버사인) ETA 로 대체
+# - rank_by_eta: 상위 N개 후보의 경로를 스레드 풀로 동시에 요청해 실제 주행 ETA 로 재정렬 (전체 마감시간 적용)
+# 로컬 테스트: python ors_stub.py 로 가짜 ORS 서버를 띄우고 base_url 을 http://127.0.0.1:8080 으로 지정
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from hospital_search import haversine_np, score_arrays
+
+ORS_BASE_URL = "https://api.openrouteservice.org"
+DIRECTIONS_PATH = "/v2/directions/driving-car/geojson"
+FALLBACK_SPEED_KMH = 40.0   # 직선거리 ETA 추정용 평균 속도
+ROAD_FACTOR = 1.3           # 직선거리 → 도로거리 보정
+MAX_PARALLEL_ROUTES = 8
+
+
+def straight_line_route(start_lat, start_lon, end_lat, end_lon):
+    """라우팅 API 를 못 쓸 때의 대체 경로 (ORS geojson 과 같은 모양, properties.fallback=True)"""
+    km = float(haversine_np(start_lat, start_lon, end_lat, end_lon)) * ROAD_FACTOR
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[start_lon, start_lat], [end_lon, end_lat]]},
+            "properties": {
+                "summary": {"distance": km * 1000, "duration": km / FALLBACK_SPEED_KMH * 3600},
+                "fallback": True,
+            },
+        }],
+    }
+
+
+def route_summary(route_json):
+    """geojson 에서 (거리 m, 소요시간 s) 추출"""
+    summary = route_json["features"][0]["properties"].get("summary", {})
+    return summary.get("distance"), summary.get("duration")
+
+
+class CircuitBreaker:
+    """연속 실패 failure_threshold 회 → reset_after 초 동안 차단 → 한 번 시험 호출(half-open)"""
+
+    def __init__(self, failure_threshold=3, reset_after=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_after and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class RouteClient:
+    def __init__(self, api_key, base_url=ORS_BASE_URL, timeout=(1.0, 3.0), slow_after=2.5,
+                 ttl=600.0, stale_ttl=3600.0, max_entries=1024, precision=4, breaker=None, session=None):
+        self.api_key = api_key
+        self.url = base_url.rstrip("/") + DIRECTIONS_PATH
+        self.timeout = timeout          # (연결, 읽기) 초
+        self.slow_after = slow_after    # 이보다 느린 응답은 성공이어도 브레이커에 실패로 기록
+        self.ttl = ttl                  # 이 시간 안에는 캐시값 그대로 사용
+        self.stale_ttl = stale_ttl      # ttl~stale_ttl 사이는 캐시값을 주고 백그라운드 갱신
+        self.max_entries = max_entries
+        self.precision = precision      # 좌표 반올림 자릿수 (4자리 ≈ 11m)
+        self.breaker = breaker or CircuitBreaker()
+        if session is None:
+            session = requests.Session()
+            # 동시 경로 요청(rank_by_eta) 수만큼 연결을 풀에 유지
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=MAX_PARALLEL_ROUTES * 2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.session.headers.update({"Authorization": api_key, "Content-Type": "application/json"})
+        self._cache = OrderedDict()     # key -> (저장 시각, route_json)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def _key(self, start_lat, start_lon, end_lat, end_lon):
+        p = self.precision
+        return (round(start_lat, p), round(start_lon, p), round(end_lat, p), round(end_lon, p))
+
+    def _cache_get(self, key):
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+            return hit
+
+    def _cache_put(self, key, route_json):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), route_json)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, key):
+        """실제 API 호출. 성공하면 캐시에 넣고 (json, None), 실패하면 (None, 오류 문자열)"""
+        if not self.breaker.allow():
+            return None, "CIRCUIT_OPEN"
+        start_lat, start_lon, end_lat, end_lon = key
+        body = {"coordinates": [[start_lon, start_lat], [end_lon, end_lat]]}
+        t0 = time.monotonic()
+        try:
+            res = self.session.post(self.url, json=body, timeout=self.timeout)
+            res.raise_for_status()
+            route_json = res.json()
+        except Exception as e:
+            self.breaker.failure()
+            return None, str(e)
+        if time.monotonic() - t0 > self.slow_after:
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        self._cache_put(key, route_json)
+        return route_json, None
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch(key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="RouteRefresh", daemon=True).start()
+
+    def route(self, start_lat, start_lon, end_lat, end_lon, fallback=True):
+        """(route_json, error). API 실패 시 fallback=True 면 직선거리 경로를 error 와 함께 반환"""
+        key = self._key(start_lat, start_lon, end_lat, end_lon)
+        hit = self._cache_get(key)
+        if hit is not None:
+            age = time.monotonic() - hit[0]
+            if age < self.ttl:
+                return hit[1], None
+            if age < self.stale_ttl:
+                self._refresh_async(key)
+                return hit[1], None
+        route_json, error = self._fetch(key)
+        if route_json is None and fallback:
+            return straight_line_route(start_lat, start_lon, end_lat, end_lon), error
+        return route_json, error
+
+
+_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_ROUTES, thread_name_prefix="route")
+
+
+def rank_by_eta(client, user_lat, user_lon, candidates_df, deadline=3.0, forecast=None):
+    """후보 병원들의 경로를 동시에 요청해 주행 ETA 기준으로 재정렬
+
+    deadline 초 안에 끝난 경로만 사용하고, 늦거나 실패한 병원은 직선거리 추정 ETA 로 채운다 (eta_source='estimate').
+    eta_score = eta_min + (score - distance_km): 거리 대신 분 단위 ETA 에 기존 수용/침대/대기 페널티를 더함.
+    forecast(forecast.ForecastTable)가 있으면 페널티를 이 ETA 로 본 도착 시 예상 대기/침대로 다시 계산한다.
+    마감 후에도 남은 요청은 백그라운드에서 끝나 캐시에 들어가므로 다음 조회는 더 빨라진다.
+    """
+    df = candidates_df.copy()
+    futures = [_pool.submit(client.route, user_lat, user_lon, lat, lon, False)
+               for lat, lon in zip(df['lat'].to_numpy(), df['lon'].to_numpy())]
+    done, _ = wait(futures, timeout=deadline)
+    eta_min = np.full(len(df), np.nan)
+    for i, fut in enumerate(futures):
+        if fut in done and fut.exception() is None:
+            route_json, error = fut.result()
+            if route_json is not None:
+                duration = route_summary(route_json)[1]
+                if duration is not None:
+                    eta_min[i] = duration / 60
+    routed = ~np.isnan(eta_min)
+    estimate = df['distance_km'].to_numpy() * ROAD_FACTOR / FALLBACK_SPEED_KMH * 60
+    df['eta_min'] = np.where(routed, eta_min, estimate)
+    df['eta_source'] = np.where(routed, 'route', 'estimate')
+    if forecast is None:
+        df['eta_score'] = df['eta_min'] + (df['score'] - df['distance_km'])
+    else:
+        waiting, beds = forecast.expected(df['id'].to_numpy(), df['waiting'].to_numpy(),
+                                          df['delivery_beds'].to_numpy(), df['eta_min'].to_numpy())
+        df['expected_waiting_at_arrival'] = waiting
+        df['expected_beds_at_arrival'] = beds
+        df['eta_score'] = score_arrays(df['eta_min'].to_numpy(), df['accepting'].to_numpy(), beds, waiting)
+    return df.sort_values('eta_score', kind='stable').reset_index(drop=True)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, base_url=ORS_BASE_URL):
+    """(api_key, base_url) 별로 프로세스에 하나 (Streamlit 재실행에도 캐시/연결 유지)"""
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            client = _clients[(api_key, base_url)] = RouteClient(api_key, base_url)
+        return client
@@ -1,10 +1,19 @@
-import io
 import math
+import numpy as np
 import pandas as pd
 import streamlit as st
 import pydeck as pdk
 from streamlit_js_eval import get_geolocation
 
+from csv_ingest import ingest_cached
+from hospital_search import haversine_np
+from map_payload import build_layers
+from presentation import add_wait_color_columns
+from spatial_index import cached_index
+from status_feed import STATUS_COLUMNS, apply_delta, get_feed
+
+STATUS_FEED_PORT = 8766  # 병원 상태 수신 HTTP 포트 (POST /status, status_feed.py 참고)
+
 st.set_page_config(page_title="🚑 실시간 내 주변 응급실 찾기", layout="wide")
 st.title("🚑 실시간 내 주변 응급실 찾기 (CSV + GPS)")
 
@@ -20,71 +29,55 @@ def calc_distance(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-def coerce_float(series):
-    """문자열 좌표를 안전하게 float로 변환"""
-    return pd.to_numeric(series.astype(str).str.replace(",", "").str.strip(), errors="coerce")
-
-def guess_columns(df):
-    """CSV마다 다른 컬럼명을 자동 매핑 (병원위도/병원경도 추가됨)"""
-    def pick(cands):
-        for c in cands:
-            if c in df.columns:
-                return c
-        return None
-    return {
-        "lat":  pick(["lat", "위도", "병원위도", "Latitude", "latitude", "Y", "y"]),
-        "lon":  pick(["lon", "경도", "병원경도", "Longitude", "longitude", "X", "x"]),
-        "name": pick(["name", "병원명", "기관명", "기관명(국문)", "요양기관명"]),
-        "tel":  pick(["tel", "전화", "전화번호", "대표전화", "응급전화", "응급실전화"]),
-        "addr": pick(["addr", "주소", "도로명주소", "지번주소"]),
-    }
-
-def tel_link(t):
-    if pd.isna(t) or str(t).strip() == "":
-        return ""
-    return f"[전화](tel:{str(t).strip()})"
-
-def naver_maps_link(lat, lon, name):
-    return f"[길찾기](https://map.naver.com/v5/directions/-/-/{lon},{lat},{name})"
+
+def live_status(hospitals, feed):
+    """세션별 병원 상태 (병원 키 + accepting/waiting/delivery_beds). 재실행마다 바뀐 병원 행만 갱신
+
+    병원 키는 id 컬럼(없으면 name). 상태 보고가 없고 CSV 에도 없는 값은 NaN(미상)
+    """
+    ss = st.session_state
+    key = hospitals.attrs.get("dataset_key")
+    key_col = "id" if "id" in hospitals.columns else "name"
+    delta = None
+    if ss.get("status_key") == key and "status_df" in ss:
+        version, delta = feed.changes_since(ss.status_version)
+    if delta is None:
+        status = pd.DataFrame({key_col: hospitals[key_col].astype(str).to_numpy()})
+        for col in STATUS_COLUMNS:
+            if col in hospitals.columns:
+                status[col] = hospitals[col].to_numpy()
+            else:
+                status[col] = pd.Series(np.nan, index=status.index, dtype=object if col == "accepting" else float)
+        version, delta = feed.snapshot()
+        ss.status_df, ss.status_key = status, key
+    apply_delta(ss.status_df, delta, key=key_col)
+    ss.status_version = version
+    return ss.status_df
 
 # ----------------------------
 # 1) CSV 업로드 (인코딩 자동 감지)
 # ----------------------------
-uploaded_file = st.file_uploader("📂 병원 위치 CSV 업로드 (위도/경도 또는 병원위도/병원경도 포함)", type=["csv"])
+uploaded_file = st.file_uploader("📂 병원 위치 CSV 업로드 (위도/경도 또는 병원위도/병원경도 포함, 정규화 Parquet 도 가능)", type=["csv", "parquet"])
 
 if uploaded_file:
-    file_bytes = uploaded_file.read()
-    hospitals = None
-    for enc in ("utf-8", "utf-8-sig", "cp949", "euc-kr", "latin1"):
-        try:
-            hospitals = pd.read_csv(io.BytesIO(file_bytes), encoding=enc)
-            st.caption(f"✅ CSV 인코딩 자동 감지 성공: {enc}")
-            break
-        except UnicodeDecodeError:
-            continue
-    if hospitals is None:
-        st.error("❌ CSV 인코딩을 읽지 못했습니다. (UTF-8/CP949/EUC-KR/LATIN1 시도 실패)")
+    # 인코딩은 앞부분 샘플로 한 번만 판별, 필요한 컬럼만 조각 단위로 파싱 (csv_ingest.ingest_csv)
+    # 같은 파일(내용 해시 기준)이면 재실행/다른 사용자 업로드 모두 캐시된 결과 재사용
+    try:
+        hospitals, ingest_info = ingest_cached(uploaded_file)
+    except ValueError as e:
+        st.error(f"❌ {e}")
         st.stop()
+    st.caption(f"✅ CSV 인코딩 자동 감지 성공: {ingest_info['encoding']}")
 
     st.success("✅ 병원 데이터 불러오기 성공!")
     st.dataframe(hospitals.head(), use_container_width=True)
 
-    # 2) 컬럼 자동 인식 + 좌표 정리
-    colmap = guess_columns(hospitals)
-    if not colmap["lat"] or not colmap["lon"]:
-        st.error("위도/경도 컬럼을 찾지 못했습니다. CSV에 'lat/lon' 또는 '위도/경도' 혹은 '병원위도/병원경도' 컬럼이 필요해요.")
-        st.stop()
-
-    hospitals = hospitals.rename(columns={
-        colmap["lat"]: "lat",
-        colmap["lon"]: "lon",
-        **({colmap["name"]: "name"} if colmap["name"] else {}),
-        **({colmap["tel"]: "tel"} if colmap["tel"] else {}),
-        **({colmap["addr"]: "addr"} if colmap["addr"] else {}),
-    })
-    hospitals["lat"] = coerce_float(hospitals["lat"])
-    hospitals["lon"] = coerce_float(hospitals["lon"])
-    hospitals = hospitals.dropna(subset=["lat", "lon"]).reset_index(drop=True)
+    # 2) 컬럼 자동 인식 + 좌표 정리는 수집 단계에서 조각별로 처리됨
+    st.caption(f"읽은 행 {ingest_info['rows_read']:,}개 중 좌표가 있는 병원 {ingest_info['rows_kept']:,}개")
+    if ingest_info["coord_system"] != "wgs84":
+        st.caption(f"좌표 자동 변환: {ingest_info['coord_system']} → WGS84 위경도")
+    with st.expander("컬럼별 정규화 소요시간(초)"):
+        st.json({k: round(v, 4) for k, v in ingest_info["timings"].items()})
 
     # 3) GPS / 수동 입력
     st.markdown("### 📍 현재 위치 설정")
@@ -113,17 +106,13 @@ if uploaded_file:
     user_lat = float(st.session_state.user_lat)
     user_lon = float(st.session_state.user_lon)
 
-    # 4) 거리 계산 + 필터링
-    hospitals["distance_km"] = hospitals.apply(
-        lambda r: calc_distance(user_lat, user_lon, float(r["lat"]), float(r["lon"])),
-        axis=1
-    )
-    result = hospitals[hospitals["distance_km"] <= radius_km].copy()
-    if "tel" in result.columns:
-        result["전화"] = result["tel"].apply(tel_link)
-    else:
-        result["전화"] = ""
-    result["길찾기"] = result.apply(lambda r: naver_maps_link(r["lat"], r["lon"], str(r.get("name", "병원"))), axis=1)
+    # 4) 거리 계산 + 필터링 (공간 인덱스: 반경을 덮는 격자 칸의 병원만 거리 계산)
+    index = cached_index(hospitals["lat"].to_numpy(), hospitals["lon"].to_numpy(),
+                         key=hospitals.attrs.get("dataset_key"))
+    rows, dist = index.within_radius(user_lat, user_lon, radius_km)
+    result = hospitals.iloc[rows].copy()
+    result["distance_km"] = dist
+    # '전화'/'길찾기' 링크는 업로드 정규화 때 한 번만 계산됨 (presentation.add_link_columns)
     result = result.sort_values(["distance_km"]).reset_index(drop=True)
 
     # 5) 표 출력
@@ -133,20 +122,15 @@ if uploaded_file:
 
     # 6) 지도 시각화
     st.markdown("### 🗺️ 지도 보기")
-    layers = []
-    hospital_layer = pdk.Layer(
-        "ScatterplotLayer",
-        data=result,
-        get_position="[lon, lat]",
-        get_radius=80,
-        pickable=True,
-        radius_min_pixels=4,
-        radius_max_pixels=24,
-        auto_highlight=True,
+    # 화면 안의 가까운 병원만 개별 점(툴팁 컬럼만), 나머지는 서버에서 격자 묶음으로 전송 (map_payload)
+    zoom = 12
+    layers, points, map_stats = build_layers(
+        result, user_lat, user_lon, zoom, ["name", "addr", "tel", "distance_km"],
+        get_radius=80, radius_min_pixels=4, radius_max_pixels=24, auto_highlight=True,
     )
     text_layer = pdk.Layer(
         "TextLayer",
-        data=result.head(30),
+        data=points.head(30),
         get_position="[lon, lat]",
         get_text="name" if "name" in result.columns else "'병원'",
         get_size=12,
@@ -155,10 +139,11 @@ if uploaded_file:
     me_df = pd.DataFrame([{"lon": user_lon, "lat": user_lat, "name": "내 위치"}])
     me_dot = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=120, pickable=False)
     me_halo = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=300, pickable=False, opacity=0.15)
-    layers += [hospital_layer, text_layer, me_dot, me_halo]
+    layers += [text_layer, me_dot, me_halo]
+    st.caption(f"지도 표시: 병원 {map_stats['points']:,}개 + 묶음 {map_stats['clusters']:,}개 (전체 {map_stats['total']:,}개)")
 
     center_lat, center_lon = (user_lat, user_lon)
-    view_state = pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=12)
+    view_state = pdk.ViewState(latitude=center_lat, longitude=center_lon, zoom=zoom)
     tooltip = {"html": "<b>{name}</b><br/>{addr}<br/>거리: {distance_km}km<br/>{tel}", "style": {"backgroundColor": "white", "color": "black"}}
 
     deck = pdk.Deck(layers=layers, initial_view_state=view_state, tooltip=tooltip, map_style=None)
@@ -176,50 +161,39 @@ import numpy as np
 import pydeck as pdk
 
 # ----------------------------
-# 0) 가상 데이터 생성
+# 0) 실시간 병원 상태
 # ----------------------------
-np.random.seed(42)
-hospitals["대기인원"] = np.random.randint(0, 31, size=len(hospitals))          # 0~30명
-hospitals["입원가능병상"] = np.random.randint(0, 21, size=len(hospitals))      # 0~20개
-hospitals["분만가능"] = np.random.choice([True, False], size=len(hospitals), p=[0.3,0.7])
+# 상태 수신기(status_feed)가 받은 최신값: 대기인원=waiting, 입원가능병상=delivery_beds, 분만가능=accepting
+status = live_status(hospitals, get_feed(port=STATUS_FEED_PORT))
+hospitals = hospitals.copy(deep=False)  # 캐시된 공용 DataFrame 에 컬럼을 추가하지 않도록
+hospitals["대기인원"] = pd.to_numeric(status["waiting"], errors="coerce").to_numpy()
+hospitals["입원가능병상"] = pd.to_numeric(status["delivery_beds"], errors="coerce").to_numpy()
+hospitals["분만가능"] = status["accepting"].to_numpy()
 
 # ----------------------------
-# 1) 입원 가능 병상 > 0인 병원만 필터링
+# 1) 입원 가능 병상이 0으로 보고된 병원 제외 (상태 미상은 표시)
 # ----------------------------
-available_hospitals = hospitals[hospitals["입원가능병상"] > 0].copy()
+available_hospitals = hospitals[~(hospitals["입원가능병상"] == 0)].copy()
 
 # ----------------------------
 # 2) 거리 계산
 # ----------------------------
-available_hospitals["distance_km"] = available_hospitals.apply(
-    lambda r: calc_distance(user_lat, user_lon, float(r["lat"]), float(r["lon"])), axis=1
+available_hospitals["distance_km"] = haversine_np(
+    user_lat, user_lon, available_hospitals["lat"].to_numpy(), available_hospitals["lon"].to_numpy()
 )
 available_hospitals = available_hospitals.sort_values("distance_km").reset_index(drop=True)
 
 # ----------------------------
 # 3) 지도 시각화 (대기인원에 따라 색상 변경)
 # ----------------------------
-def wait_color(wait):
-    """대기인원 많으면 빨강, 적으면 초록"""
-    max_wait = 30
-    ratio = min(wait / max_wait, 1)
-    r = int(255 * ratio)
-    g = int(255 * (1 - ratio))
-    b = 0
-    return [r, g, b]
-
-available_hospitals["color"] = available_hospitals["대기인원"].apply(wait_color)
-
-hospital_layer = pdk.Layer(
-    "ScatterplotLayer",
-    data=available_hospitals,
-    get_position="[lon, lat]",
-    get_radius=80,
-    get_fill_color="color",
-    pickable=True,
-    radius_min_pixels=6,
-    radius_max_pixels=24,
-    auto_highlight=True,
+# 대기인원 많으면 빨강, 적으면 초록 (NumPy 색상 램프 → color_r/g/b 컬럼)
+add_wait_color_columns(available_hospitals, "대기인원")
+
+# 전체 병원을 그대로 보내지 않고 화면 안 상위 병원 + 격자 묶음만 전송 (map_payload)
+hospital_layers, _, _ = build_layers(
+    available_hospitals, user_lat, user_lon, 12, ["name", "addr", "distance_km", "대기인원", "입원가능병상"],
+    color="[color_r, color_g, color_b]",
+    get_radius=80, radius_min_pixels=6, radius_max_pixels=24, auto_highlight=True,
 )
 
 # 사용자 위치
@@ -227,7 +201,7 @@ me_df = pd.DataFrame([{"lon": user_lon, "lat": user_lat, "name": "내 위치"}])
 me_dot = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=120, pickable=False)
 me_halo = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=300, pickable=False, opacity=0.15)
 
-layers = [hospital_layer, me_dot, me_halo]
+layers = hospital_layers + [me_dot, me_halo]
 
 view_state = pdk.ViewState(latitude=user_lat, longitude=user_lon, zoom=12)
 tooltip = {
@@ -249,50 +223,39 @@ import numpy as np
 import pydeck as pdk
 
 # ----------------------------
-# 0) 가상 데이터 생성
+# 0) 실시간 병원 상태
 # ----------------------------
-np.random.seed(42)
-hospitals["대기인원"] = np.random.randint(0, 31, size=len(hospitals))          # 0~30명
-hospitals["입원가능병상"] = np.random.randint(0, 21, size=len(hospitals))      # 0~20개
-hospitals["분만가능"] = np.random.choice([True, False], size=len(hospitals), p=[0.3,0.7])
+# 상태 수신기(status_feed)가 받은 최신값: 대기인원=waiting, 입원가능병상=delivery_beds, 분만가능=accepting
+status = live_status(hospitals, get_feed(port=STATUS_FEED_PORT))
+hospitals = hospitals.copy(deep=False)  # 캐시된 공용 DataFrame 에 컬럼을 추가하지 않도록
+hospitals["대기인원"] = pd.to_numeric(status["waiting"], errors="coerce").to_numpy()
+hospitals["입원가능병상"] = pd.to_numeric(status["delivery_beds"], errors="coerce").to_numpy()
+hospitals["분만가능"] = status["accepting"].to_numpy()
 
 # ----------------------------
-# 1) 입원 가능 병상 > 0인 병원만 필터링
+# 1) 입원 가능 병상이 0으로 보고된 병원 제외 (상태 미상은 표시)
 # ----------------------------
-available_hospitals = hospitals[hospitals["입원가능병상"] > 0].copy()
+available_hospitals = hospitals[~(hospitals["입원가능병상"] == 0)].copy()
 
 # ----------------------------
 # 2) 거리 계산
 # ----------------------------
-available_hospitals["distance_km"] = available_hospitals.apply(
-    lambda r: calc_distance(user_lat, user_lon, float(r["lat"]), float(r["lon"])), axis=1
+available_hospitals["distance_km"] = haversine_np(
+    user_lat, user_lon, available_hospitals["lat"].to_numpy(), available_hospitals["lon"].to_numpy()
 )
 available_hospitals = available_hospitals.sort_values("distance_km").reset_index(drop=True)
 
 # ----------------------------
 # 3) 지도 시각화 (대기인원에 따라 색상 변경)
 # ----------------------------
-def wait_color(wait):
-    """대기인원 많으면 빨강, 적으면 초록"""
-    max_wait = 30
-    ratio = min(wait / max_wait, 1)
-    r = int(255 * ratio)
-    g = int(255 * (1 - ratio))
-    b = 0
-    return [r, g, b]
-
-available_hospitals["color"] = available_hospitals["대기인원"].apply(wait_color)
-
-hospital_layer = pdk.Layer(
-    "ScatterplotLayer",
-    data=available_hospitals,
-    get_position="[lon, lat]",
-    get_radius=80,
-    get_fill_color="color",
-    pickable=True,
-    radius_min_pixels=6,
-    radius_max_pixels=24,
-    auto_highlight=True,
+# 대기인원 많으면 빨강, 적으면 초록 (NumPy 색상 램프 → color_r/g/b 컬럼)
+add_wait_color_columns(available_hospitals, "대기인원")
+
+# 전체 병원을 그대로 보내지 않고 화면 안 상위 병원 + 격자 묶음만 전송 (map_payload)
+hospital_layers, _, _ = build_layers(
+    available_hospitals, user_lat, user_lon, 12, ["name", "addr", "distance_km", "대기인원", "입원가능병상"],
+    color="[color_r, color_g, color_b]",
+    get_radius=80, radius_min_pixels=6, radius_max_pixels=24, auto_highlight=True,
 )
 
 # 사용자 위치
@@ -300,7 +263,7 @@ me_df = pd.DataFrame([{"lon": user_lon, "lat": user_lat, "name": "내 위치"}])
 me_dot = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=120, pickable=False)
 me_halo = pdk.Layer("ScatterplotLayer", data=me_df, get_position="[lon, lat]", get_radius=300, pickable=False, opacity=0.15)
 
-layers = [hospital_layer, me_dot, me_halo]
+layers = hospital_layers + [me_dot, me_halo]
 
 view_state = pdk.ViewState(latitude=user_lat, longitude=user_lon, zoom=12)
 tooltip = {
@@ -0,0 +1,153 @@
+# spatial_index.py
+# 병원 좌표 공간 인덱스 (위경도 격자 버킷, NumPy 전용)
+# - 병원 데이터셋마다 한 번 생성해서 재사용 (cached_index)
+# - k-최근접 / 반경 내 검색 시 주변 격자 칸의 병원만 하버사인 계산 → 전체 스캔 없음
+# - scikit-learn BallTree 같은 추가 의존성 없이 동작
+# - grid_clusters: 지도 줌에 맞춘 격자로 점을 묶는 서버측 클러스터링 (pydeck/folium 지도 공용)
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from hospital_search import haversine_np
+
+KM_PER_DEG_LAT = 111.195
+DEFAULT_CELL_DEG = 0.05  # 약 5.5km (위도 방향)
+INDEX_CACHE_SIZE = 8
+NEAREST_SLACK = 1.5    # nearest 첫 반경 = 밀도로 추정한 반경 × 이 값 (모자라서 다시 조회하는 일을 줄임)
+TILE_PX = 256          # 웹 지도 타일 한 장의 픽셀 크기
+MAX_CLUSTERS = 500
+
+
+class HospitalIndex:
+    """위경도 격자 인덱스. 반환하는 위치(int)는 입력 배열 기준 위치(iloc)"""
+
+    def __init__(self, lats, lons, cell_deg=DEFAULT_CELL_DEG):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        self.n = len(lats)
+        self.lats = lats
+        self.lons = lons
+        self.cell_deg = cell_deg
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        self.n_valid = len(valid)
+        rows = np.floor((lats[valid] + 90.0) / cell_deg).astype(np.int64)
+        cols = np.floor((lons[valid] + 180.0) / cell_deg).astype(np.int64)
+        self._ncols = int(math.ceil(360.0 / cell_deg)) + 1
+        keys = rows * self._ncols + cols
+        order = np.argsort(keys, kind="stable")
+        self._points = valid[order]  # 격자 키 순서로 정렬된 병원 위치
+        sorted_keys = keys[order]
+        self._cell_keys, self._cell_start, self._cell_count = np.unique(
+            sorted_keys, return_index=True, return_counts=True)
+        self._cell_rows = self._cell_keys // self._ncols
+        self._cell_cols = self._cell_keys % self._ncols
+        # 점 하나가 차지하는 평균 면적(km²): nearest 의 첫 반경 추정용 (채워진 칸 면적 기준)
+        cell_km = cell_deg * KM_PER_DEG_LAT
+        coslat = math.cos(math.radians(float(np.mean(lats[valid])))) if self.n_valid else 1.0
+        self._km2_per_point = len(self._cell_keys) * cell_km * cell_km * max(coslat, 1e-6) / max(self.n_valid, 1)
+
+    def __len__(self):
+        return self.n
+
+    def _candidates(self, lat, lon, radius_km):
+        """(lat, lon) 중심 반경 radius_km 를 덮는 격자 칸의 병원 위치"""
+        dlat = radius_km / KM_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        dlon = min(radius_km / (KM_PER_DEG_LAT * coslat), 180.0)
+        r0 = int(math.floor((lat - dlat + 90.0) / self.cell_deg))
+        r1 = int(math.floor((lat + dlat + 90.0) / self.cell_deg))
+        c0 = int(math.floor((lon - dlon + 180.0) / self.cell_deg))
+        c1 = int(math.floor((lon + dlon + 180.0) / self.cell_deg))
+        n_rect = (r1 - r0 + 1) * (c1 - c0 + 1)
+        if n_rect <= len(self._cell_keys):
+            # 작은 범위: 사각형 안의 격자 키를 직접 찾기
+            rr, cc = np.meshgrid(np.arange(r0, r1 + 1), np.arange(c0, c1 + 1), indexing="ij")
+            want = (rr * self._ncols + cc).ravel()
+            pos = np.minimum(np.searchsorted(self._cell_keys, want), len(self._cell_keys) - 1)
+            cells = pos[self._cell_keys[pos] == want]
+        else:
+            # 큰 범위: 채워진 칸만 범위 검사
+            cells = np.flatnonzero((self._cell_rows >= r0) & (self._cell_rows <= r1)
+                                   & (self._cell_cols >= c0) & (self._cell_cols <= c1))
+        if len(cells) == 0:
+            return np.array([], dtype=np.int64)
+        starts = self._cell_start[cells]
+        counts = self._cell_count[cells]
+        # 칸별 [start, start+count) 구간을 한 번에 펼치기
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self._points[offsets]
+
+    def within_radius(self, lat, lon, radius_km):
+        """반경 radius_km 이내 병원 (위치 배열, 거리 배열) — 거리 오름차순"""
+        cand = self._candidates(lat, lon, radius_km)
+        dist = haversine_np(lat, lon, self.lats[cand], self.lons[cand])
+        keep = dist <= radius_km
+        cand, dist = cand[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return cand[order], dist[order]
+
+    def nearest(self, lat, lon, k):
+        """가장 가까운 k개 병원 (위치 배열, 거리 배열) — 거리 오름차순"""
+        k = min(k, self.n_valid)
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        # 밀도로 k개가 들어갈 반경을 추정해서 시작 (한 칸에서 두 배씩 넓히면 성긴 데이터에서 재조회가 많음)
+        radius = max(self.cell_deg * KM_PER_DEG_LAT, NEAREST_SLACK * math.sqrt(k * self._km2_per_point / math.pi))
+        while True:
+            idx, dist = self.within_radius(lat, lon, radius)
+            # 반경 안의 병원은 빠짐없이 찾았으므로 k개 이상이면 정확한 최근접
+            if len(idx) >= k or radius > 2 * math.pi * 6371.0:
+                return idx[:k], dist[:k]
+            radius *= 2
+
+
+def grid_clusters(lat, lon, zoom, cell_px=60, max_clusters=MAX_CLUSTERS):
+    """줌에 맞는 격자(약 cell_px 픽셀)로 점을 묶어 (중심 위도, 중심 경도, 개수) DataFrame"""
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) == 0:
+        return pd.DataFrame({"lat": [], "lon": [], "count": []})
+    cell = 360.0 / (TILE_PX * 2 ** zoom) * cell_px
+    while True:
+        rows = np.floor(lat / cell).astype(np.int64)
+        cols = np.floor(lon / cell).astype(np.int64)
+        keys, inverse, counts = np.unique(rows * 1_000_003 + cols, return_inverse=True, return_counts=True)
+        if len(keys) <= max_clusters:
+            break
+        cell *= 2  # 클러스터가 너무 많으면 격자를 키움
+    return pd.DataFrame({
+        "lat": np.bincount(inverse, weights=lat) / counts,
+        "lon": np.bincount(inverse, weights=lon) / counts,
+        "count": counts,
+    })
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_index(lats, lons, key=None, cell_deg=DEFAULT_CELL_DEG):
+    """데이터셋별로 한 번만 인덱스 생성 (key 가 없으면 좌표 바이트 해시 사용, LRU)"""
+    lats = np.ascontiguousarray(lats, dtype=float)
+    lons = np.ascontiguousarray(lons, dtype=float)
+    if key is None:
+        h = hashlib.sha1(lats.tobytes())
+        h.update(lons.tobytes())
+        key = h.hexdigest()
+    key = (key, cell_deg)
+    with _cache_lock:
+        idx = _cache.get(key)
+        if idx is not None:
+            _cache.move_to_end(key)
+            return idx
+    idx = HospitalIndex(lats, lons, cell_deg)
+    with _cache_lock:
+        _cache[key] = idx
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return idx
@@ -0,0 +1,386 @@
+# status_feed.py
+# 병원 실시간 상태 수신 서비스 (프로세스 공용, 표준 라이브러리 + pandas)
+# - 최신 상태를 메모리(StatusFeed)에 보관하고, 바뀐 병원만 버전 번호와 함께 변경 로그에 기록
+#   → 세션은 마지막으로 본 버전 이후의 변경(delta)만 받아 자기 DataFrame 의 해당 행만 고침 (CSV/DB 재조회 없음)
+# - 수신 경로 두 가지
+#   1) HTTP: POST /status  본문 = JSON 배열, {"updates": [...]} 또는 줄 단위 JSON(NDJSON)
+#            GET  /status?since=<버전>&wait=<초>  변경분 조회 (wait 동안 새 변경을 기다림)
+#   2) 파일 드롭: drop_dir 에 *.json / *.jsonl 파일을 넣으면 읽어서 반영하고 *.done 으로 이름 변경
+# - db_path 가 있으면 hospital_status 테이블이 기준: 반영할 변경은 잠금 안에서 한 트랜잭션으로 기록하고
+#   (DB 가 붙인 version 순서 = 메모리 순서), 조회 때마다 MAX(version) 을 확인해 다른 프로세스
+#   (status_feed.py serve, match_api.py, 다른 Streamlit 워커)가 기록한 변경도 가져옴
+# 항목 형식: {"hospital_id": "H001", "accepting": true, "waiting": 3, "delivery_beds": 1}  (id 도 허용, 없는 항목은 유지)
+# 단독 실행:   python status_feed.py serve [--port 8765] [--db hospital_feedback.db] [--drop-dir status_drop]
+# 가짜 송신기: python status_feed.py feed [--url http://127.0.0.1:8765/status] [--csv hospitals_sample.csv]
+
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from hospital_db import STATUS_COLUMNS, init_status_schema, read_status, status_version, upsert_status_many
+
+LOG_SIZE = 50000
+MAX_WAIT_S = 30.0
+DROP_INTERVAL_S = 1.0
+DB_POLL_S = 0.5     # 변경 대기(wait) 중 DB 의 다른 프로세스 변경을 확인하는 간격
+
+
+def _normalize(item):
+    """수신 항목 하나 → (hospital_id, {컬럼: 값}) (알 수 없는 키/형식 오류는 ValueError)"""
+    hid = item.get('hospital_id', item.get('id'))
+    if hid is None:
+        raise ValueError(f'hospital_id 없음: {item!r}')
+    values = {}
+    for col in STATUS_COLUMNS:
+        v = item.get(col)
+        if v is None:
+            continue
+        if col == 'accepting':
+            values[col] = v if isinstance(v, bool) else str(v).strip().lower() in ('1', 'true', 'y', 'yes', 'o')
+        else:
+            values[col] = int(v)
+    return str(hid), values
+
+
+def parse_updates(body):
+    """HTTP 본문/파일 내용(bytes 또는 str) → 항목 dict 목록"""
+    text = body.decode('utf-8-sig') if isinstance(body, bytes) else body
+    text = text.strip()
+    if not text:
+        return []
+    if text[0] in '[{':
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None
+        if data is not None:
+            if isinstance(data, dict):
+                data = data.get('updates', [data])
+            return data
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class StatusFeed:
+    """병원별 최신 상태 + 버전 변경 로그 (스레드 안전). db_path 가 있으면 버전은 DB 의 version"""
+
+    def __init__(self, db_path=None, log_size=LOG_SIZE):
+        self.db_path = db_path
+        self._cond = threading.Condition()
+        self._state = {}           # hospital_id -> {컬럼: 값}
+        self._log = deque(maxlen=log_size)  # (버전, hospital_id)
+        self._version = 0
+        self._base = 0             # 이 버전 이후의 변경은 로그에 모두 있음
+        self.server = None
+        if db_path:
+            init_status_schema(db_path)
+            status = read_status(db_path)
+            self._merge(status)
+            self._version = self._base = int(status['version'].max()) if len(status) else 0
+
+    def _merge(self, status_df, log=False):
+        for row in status_df.to_dict('records'):
+            hid, values = _normalize({k: (None if pd.isna(v) else v) for k, v in row.items()})
+            self._state.setdefault(hid, {}).update(values)
+            if log:
+                self._log.append((int(row['version']), hid))
+
+    def _refresh(self):
+        # (잠금 안에서) DB 에 더 새 버전이 있으면 그 행만 읽어 반영
+        if not self.db_path or status_version(self.db_path) <= self._version:
+            return False
+        rows = read_status(self.db_path, since=self._version)
+        if rows.empty:
+            return False
+        self._merge(rows, log=True)
+        self._version = int(rows['version'].iloc[-1])
+        self._cond.notify_all()
+        return True
+
+    def refresh(self):
+        """다른 프로세스가 DB 에 기록한 변경을 가져옴. 새 변경이 있으면 True"""
+        with self._cond:
+            return self._refresh()
+
+    @property
+    def version(self):
+        with self._cond:
+            self._refresh()
+            return self._version
+
+    def apply(self, items, persist=True):
+        """상태 항목 반영. 실제로 값이 바뀐 병원 수 반환 (같은 값 재전송은 변경으로 치지 않음)"""
+        normalized = [_normalize(item) for item in items]
+        changed = {}
+        with self._cond:
+            self._refresh()
+            for hid, values in normalized:
+                current = {**self._state.get(hid, {}), **changed.get(hid, {})}
+                diff = {k: v for k, v in values.items() if current.get(k) != v}
+                if diff:
+                    changed.setdefault(hid, {}).update(diff)
+            if not changed:
+                return 0
+            if persist and self.db_path:
+                # 잠금을 쥔 채 기록 → DB 에 쓰이는 순서와 메모리/로그 순서가 같음. 자기 변경도 DB 에서 읽어 반영
+                upsert_status_many(self.db_path, [dict(values, hospital_id=hid) for hid, values in changed.items()])
+                self._refresh()
+                return len(changed)
+            for hid, diff in changed.items():
+                self._state.setdefault(hid, {}).update(diff)
+                self._version += 1
+                self._log.append((self._version, hid))
+            self._cond.notify_all()
+        return len(changed)
+
+    def _frame(self, ids):
+        rows = [dict(self._state[hid], hospital_id=hid) for hid in ids]
+        return pd.DataFrame(rows, columns=['hospital_id'] + STATUS_COLUMNS)
+
+    def snapshot(self):
+        """(버전, 전체 상태 DataFrame) — hospital_db.read_status 와 같은 상태 컬럼"""
+        with self._cond:
+            self._refresh()
+            return self._version, self._frame(list(self._state))
+
+    def changes_since(self, version):
+        """(새 버전, version 이후 바뀐 병원 상태 DataFrame). 로그가 잘려 알 수 없으면 DataFrame 대신 None"""
+        with self._cond:
+            self._refresh()
+            if version >= self._version:
+                return self._version, self._frame([])
+            floor = self._log[0][0] - 1 if len(self._log) == self._log.maxlen else self._base
+            if version < floor:
+                return self._version, None  # 너무 오래된 세션: snapshot() 으로 다시 동기화
+            ids = []
+            seen = set()
+            for v, hid in reversed(self._log):
+                if v <= version:
+                    break
+                if hid not in seen:
+                    seen.add(hid)
+                    ids.append(hid)
+            return self._version, self._frame(ids)
+
+    def wait(self, version, timeout):
+        """version 이후 변경이 생기거나 timeout 이 지날 때까지 대기. 변경이 있으면 True
+        (DB 를 쓰면 DB_POLL_S 마다 다른 프로세스의 변경도 확인)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refresh()
+                if self._version > version:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, DB_POLL_S) if self.db_path else remaining)
+
+
+def apply_delta(hospitals_df, delta, key='id'):
+    """세션 DataFrame 에서 delta 에 있는 병원 행의 상태 컬럼만 덮어씀 (제자리 수정). 바뀐 행 위치 배열 반환
+
+    덮어쓸 때마다 attrs['status_rev'] 를 올림 → 같은 객체를 받은 쪽(dispatch.get_dispatcher)도 바뀐 줄 앎
+    """
+    if delta is None or delta.empty or key not in hospitals_df.columns:
+        return np.array([], dtype=int)
+    keys = hospitals_df[key].astype(str)
+    delta = delta.drop_duplicates('hospital_id', keep='last').set_index('hospital_id')
+    pos = np.flatnonzero(keys.isin(delta.index).to_numpy())
+    if len(pos) == 0:
+        return pos
+    matched = delta.loc[keys.iloc[pos]]
+    for col in STATUS_COLUMNS:
+        if col not in matched.columns:
+            continue
+        live = matched[col].to_numpy()
+        known = pd.notna(live)
+        if not known.any():
+            continue
+        if col not in hospitals_df.columns:
+            hospitals_df[col] = pd.NA
+        ci = hospitals_df.columns.get_loc(col)
+        values = live[known].astype(bool) if col == 'accepting' else live[known].astype(int)
+        hospitals_df.iloc[pos[known], ci] = values
+    hospitals_df.attrs['status_rev'] = hospitals_df.attrs.get('status_rev', 0) + 1
+    return pos
+
+
+# --------------- 수신: HTTP -----------------
+
+def make_handler(feed):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            try:
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/status':
+                return self._send(404, {'error': 'unknown path'})
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                changed = feed.apply(parse_updates(self.rfile.read(length)))
+                version = feed.version
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._send(400, {'error': str(e)})
+            except sqlite3.Error as e:
+                # DB 잠김/바쁨 등: 연결을 끊지 않고 다시 보내라고 알림
+                return self._send(503, {'error': str(e)})
+            self._send(200, {'changed': changed, 'version': version})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/status':
+                return self._send(404, {'error': 'unknown path'})
+            query = parse_qs(url.query)
+            try:
+                since = int(query.get('since', ['0'])[0])
+                wait = min(float(query.get('wait', ['0'])[0]), MAX_WAIT_S)
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            try:
+                if wait > 0:
+                    feed.wait(since, wait)
+                version, delta = feed.changes_since(since)
+                if delta is None:
+                    version, delta = feed.snapshot()
+                    full = True
+                else:
+                    full = since == 0
+            except sqlite3.Error as e:
+                return self._send(503, {'error': str(e)})
+            rows = json.loads(delta.to_json(orient='records'))
+            self._send(200, {'version': version, 'full': full, 'updates': rows})
+
+    return Handler
+
+
+def serve_http(feed, port, host='127.0.0.1'):
+    """데몬 스레드에서 HTTP 수신 시작, server 객체 반환 (server.shutdown() 으로 종료)"""
+    server = ThreadingHTTPServer((host, port), make_handler(feed))
+    threading.Thread(target=server.serve_forever, name='StatusFeedHTTP', daemon=True).start()
+    return server
+
+
+# --------------- 수신: 파일 드롭 -----------------
+
+def ingest_drop_dir(feed, drop_dir):
+    """drop_dir 의 *.json / *.jsonl 파일을 이름 순으로 반영하고 *.done(실패 시 *.bad) 으로 이름 변경"""
+    total = 0
+    paths = sorted(glob.glob(os.path.join(drop_dir, '*.json')) + glob.glob(os.path.join(drop_dir, '*.jsonl')))
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                total += feed.apply(parse_updates(f.read()))
+            os.replace(path, path + '.done')
+        except (ValueError, TypeError, AttributeError):
+            os.replace(path, path + '.bad')
+        except sqlite3.Error:
+            continue  # DB 잠김 등: 파일을 그대로 두고 다음 주기에 다시 시도
+        except OSError:
+            continue  # 아직 쓰는 중이거나 다른 프로세스가 먼저 가져감
+    return total
+
+
+def watch_drop_dir(feed, drop_dir, interval=DROP_INTERVAL_S):
+    os.makedirs(drop_dir, exist_ok=True)
+
+    def run():
+        while True:
+            ingest_drop_dir(feed, drop_dir)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name='StatusFeedDrop', daemon=True).start()
+
+
+# --------------- 프로세스 공용 인스턴스 -----------------
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed(db_path=None, port=None, drop_dir=None):
+    """db_path 별 StatusFeed 하나 (처음 호출 때 HTTP/파일 드롭 수신 시작)"""
+    with _feeds_lock:
+        feed = _feeds.get(db_path)
+        if feed is None:
+            feed = _feeds[db_path] = StatusFeed(db_path)
+            if port:
+                try:
+                    feed.server = serve_http(feed, port)
+                except OSError:
+                    pass  # 포트 사용 중 (다른 앱 프로세스가 이미 수신 중) → 파일 드롭/직접 apply 만 사용
+            if drop_dir:
+                watch_drop_dir(feed, drop_dir)
+        return feed
+
+
+# --------------- 가짜 송신기 -----------------
+
+def run_feeder(url, ids, rate=2.0, batch=20, seed=None):
+    """ids 중 batch 개씩 골라 대기인원/병상/수용 여부를 조금씩 바꿔 rate 회/초로 POST"""
+    import requests
+
+    rng = np.random.default_rng(seed)
+    ids = np.asarray(ids, dtype=object)
+    waiting = dict.fromkeys(ids.tolist(), 0)
+    beds = {hid: int(rng.integers(0, 4)) for hid in ids.tolist()}
+    session = requests.Session()
+    while True:
+        picked = rng.choice(ids, size=min(batch, len(ids)), replace=False).tolist()
+        updates = []
+        for hid in picked:
+            waiting[hid] = max(0, waiting[hid] + int(rng.integers(-2, 3)))
+            beds[hid] = max(0, beds[hid] + int(rng.integers(-1, 2)))
+            updates.append({'hospital_id': hid, 'waiting': waiting[hid], 'delivery_beds': beds[hid],
+                            'accepting': bool(rng.random() < 0.9)})
+        try:
+            resp = session.post(url, json=updates, timeout=2)
+            print(resp.json())
+        except requests.RequestException as e:
+            print(f'전송 실패: {e}')
+        time.sleep(1.0 / rate)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='병원 실시간 상태 수신 서비스 / 가짜 송신기')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve')
+    p_serve.add_argument('--port', type=int, default=8765)
+    p_serve.add_argument('--db', default=None, help='상태를 기록할 SQLite 파일 (생략 시 메모리만)')
+    p_serve.add_argument('--drop-dir', default=None)
+    p_feed = sub.add_parser('feed')
+    p_feed.add_argument('--url', default='http://127.0.0.1:8765/status')
+    p_feed.add_argument('--csv', default='hospitals_sample.csv', help='병원 id 를 읽을 CSV (id 컬럼)')
+    p_feed.add_argument('--rate', type=float, default=2.0, help='초당 전송 횟수')
+    p_feed.add_argument('--batch', type=int, default=20, help='한 번에 보낼 병원 수')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        feed = get_feed(args.db, port=args.port, drop_dir=args.drop_dir)
+        if feed.server is None:
+            raise SystemExit(f'포트 {args.port} 사용 중')
+        print(f'status feed: http://127.0.0.1:{args.port}/status')
+        while True:
+            time.sleep(3600)
+    else:
+        run_feeder(args.url, pd.read_csv(args.csv)['id'].astype(str).tolist(), args.rate, args.batch)
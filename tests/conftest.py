@@ -0,0 +1,11 @@
+# conftest.py
+# 테스트에서 저장소 루트의 모듈(routing, price_store ...)을 import 할 수 있게 경로 추가
+# - 루트의 code.py 가 표준 라이브러리 code 를 가리지 않도록 맨 뒤에 붙임
+# - 실행: 저장소 루트에서 pytest -q tests (python -m pytest 는 루트를 맨 앞에 넣어 pdb 의 import code 가 깨짐)
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -0,0 +1,117 @@
+# test_dispatch.py
+# 이송 배정: 예약장부 만료/해제, regret 순서 배정, 후보 범위 넓히기, 실시간 상태(apply_delta) 반영
+
+import pandas as pd
+import pytest
+
+import dispatch
+from dispatch import Dispatcher, ReservationBook, apply_holds, get_dispatcher
+from spatial_index import HospitalIndex
+from status_feed import apply_delta
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def hospitals(rows):
+    """rows: (id, lat, lon, delivery_beds[, waiting, accepting])"""
+    rows = [r + (0, True)[len(r) - 4:] for r in rows]
+    return pd.DataFrame(rows, columns=['id', 'lat', 'lon', 'delivery_beds', 'waiting', 'accepting'])
+
+
+def requests(*points):
+    return pd.DataFrame({'request_id': range(1, len(points) + 1),
+                         'lat': [p[0] for p in points], 'lon': [p[1] for p in points]})
+
+
+def make(df, candidates=dispatch.CANDIDATES, book=None):
+    index = HospitalIndex(df['lat'].to_numpy(), df['lon'].to_numpy())
+    return Dispatcher(df, index, book, candidates)
+
+
+def test_book_expires_and_releases():
+    clock = Clock()
+    book = ReservationBook(ttl=60, clock=clock)
+    r1, expires = book.reserve('A')
+    r2, _ = book.reserve('A')
+    assert expires == 60
+    assert book.held() == {'A': 2} and len(book) == 2
+    assert book.release(r1) is True
+    assert book.release(r1) is False    # 두 번째 해제는 무시
+    assert book.held() == {'A': 1}
+    clock.now = 60
+    assert book.held() == {} and len(book) == 0
+    assert book.release(r2) is False    # 이미 만료
+
+
+def test_apply_holds_moves_beds_to_waiting():
+    df = hospitals([('A', 37.0, 127.0, 2, 1), ('B', 37.0, 127.1, 0, 0)])
+    df.attrs['dataset_key'] = 'k'
+    held = apply_holds(df, {'A': 3, 'B': 1})
+    assert held['delivery_beds'].tolist() == [0, 0]
+    assert held['waiting'].tolist() == [4, 1]
+    assert held.attrs['dataset_key'] == 'k'
+    assert apply_holds(df, {}) is df
+
+
+def test_regret_assigns_request_without_alternative_first():
+    # 요청 2 는 A 가 조금 더 가깝지만 B 도 가깝고, 요청 1 은 A 말고는 멀다 → 요청 1 이 A, 요청 2 가 B
+    df = hospitals([('A', 37.0, 127.0, 1), ('B', 37.0, 127.1, 1)])
+    out = make(df).assign(requests((37.0, 127.045), (37.0, 126.95)))
+    assert out['hospital_id'].tolist() == ['B', 'A']
+    assert not out['over_capacity'].any()
+    assert out['reservation_id'].nunique() == 2
+
+
+def test_widens_past_full_candidates():
+    df = hospitals([('A', 37.0, 127.0, 0), ('B', 37.0, 127.01, 0), ('C', 37.0, 127.3, 1), ('D', 36.0, 128.0, 0)])
+    d = make(df, candidates=2)
+    first = d.assign(requests((37.0, 127.0)))
+    assert first['hospital_id'].tolist() == ['C'] and not first['over_capacity'].iloc[0]
+    # 남은 침대가 어디에도 없으면 가장 나은 곳에 over_capacity=True 로 배정
+    second = d.assign(requests((37.0, 127.0)))
+    assert second['over_capacity'].iloc[0]
+
+
+def test_expired_and_released_holds_free_the_bed():
+    clock = Clock()
+    df = hospitals([('A', 37.0, 127.0, 1), ('B', 37.0, 127.1, 1)])
+    d = make(df, book=ReservationBook(ttl=60, clock=clock))
+    near_a = requests((37.0, 127.01))
+    first = d.assign(near_a).iloc[0]
+    assert first['hospital_id'] == 'A'
+    assert d.assign(near_a).iloc[0]['hospital_id'] == 'B'
+    d.book.release(int(first['reservation_id']))
+    assert d.assign(near_a).iloc[0]['hospital_id'] == 'A'
+    clock.now = 61
+    assert d.book.held() == {}
+    assert d.assign(near_a).iloc[0]['hospital_id'] == 'A'
+
+
+def test_missing_coordinates_are_skipped():
+    df = hospitals([('A', 37.0, 127.0, 1)])
+    out = make(df).assign(requests((float('nan'), float('nan')), (37.0, 127.0)))
+    assert out['hospital_id'].isna().tolist() == [True, False]
+    assert out['hospital_id'].iloc[1] == 'A'
+
+
+@pytest.fixture
+def fresh_dispatchers(monkeypatch):
+    monkeypatch.setattr(dispatch, '_dispatchers', {})
+
+
+def test_get_dispatcher_sees_in_place_live_update(fresh_dispatchers):
+    # 세션 DataFrame 을 apply_delta 로 제자리 수정해도 공용 배정기가 새 상태로 배정
+    df = hospitals([('A', 37.0, 127.0, 2), ('B', 37.0, 127.1, 2)])
+    index = HospitalIndex(df['lat'].to_numpy(), df['lon'].to_numpy())
+    near_a = requests((37.0, 127.01))
+    assert get_dispatcher(df, index, key='live').assign(near_a).iloc[0]['hospital_id'] == 'A'
+    apply_delta(df, pd.DataFrame([{'hospital_id': 'A', 'delivery_beds': 0, 'waiting': 40}]))
+    out = get_dispatcher(df, index, key='live').assign(near_a).iloc[0]
+    assert out['hospital_id'] == 'B' and not out['over_capacity']
+    assert get_dispatcher(df.copy(), index, key='live').beds.tolist() == [0, 2]
@@ -0,0 +1,169 @@
+# test_hospital_db.py
+# 피드백 집계(feedback_agg) 트리거/재계산 CLI, BatchWriter 값 검사·잠금 재시도·실패 묶음 처리
+
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import hospital_db
+from hospital_db import (BatchWriter, check_feedback_agg, enqueue_feedback, feedback_writer, get_conn,
+                         init_feedback_schema, read_feedback_summary, rebuild_feedback_agg)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'feedback.db')
+    init_feedback_schema(path)
+    return path
+
+
+def insert(db, *rows):
+    conn = get_conn(db)
+    with conn:
+        conn.executemany('INSERT INTO feedback (hospital_id, rating, comment, timestamp) VALUES (?, ?, ?, ?)',
+                         [(h, r, '', f'2024-01-0{i + 1}') for i, (h, r) in enumerate(rows)])
+
+
+def summary(db):
+    return {h: (avg, cnt) for h, avg, cnt in read_feedback_summary(db).itertuples(index=False)}
+
+
+def test_triggers_keep_aggregate_in_sync(db):
+    insert(db, ('A', 5), ('A', 2), ('B', 4))
+    assert summary(db) == {'A': (3.5, 2), 'B': (4.0, 1)}
+    conn = get_conn(db)
+    with conn:
+        conn.execute("DELETE FROM feedback WHERE hospital_id = 'A' AND rating = 5")
+        conn.execute("DELETE FROM feedback WHERE hospital_id = 'B'")
+    assert summary(db) == {'A': (2.0, 1)}   # 건수가 0 이 된 병원은 집계에서 빠짐
+    assert check_feedback_agg(db).empty
+
+
+def test_schema_on_existing_db_builds_aggregate(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute('CREATE TABLE feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, hospital_id TEXT, rating INTEGER, '
+                     'comment TEXT, timestamp TEXT)')
+        conn.executemany('INSERT INTO feedback (hospital_id, rating) VALUES (?, ?)', [('A', 1), ('A', 3)])
+    conn.close()
+    init_feedback_schema(path)
+    assert summary(path) == {'A': (2.0, 2)}
+
+
+def test_rebuild_fixes_drift(db):
+    insert(db, ('A', 5), ('B', 3))
+    conn = get_conn(db)
+    with conn:
+        conn.execute("UPDATE feedback_agg SET cnt = 7 WHERE hospital_id = 'A'")
+        conn.execute("DELETE FROM feedback_agg WHERE hospital_id = 'B'")
+    assert sorted(check_feedback_agg(db)['hospital_id']) == ['A', 'B']
+    rebuild_feedback_agg(db)
+    assert check_feedback_agg(db).empty
+    assert summary(db) == {'A': (5.0, 1), 'B': (3.0, 1)}
+
+
+def test_cli_check_and_rebuild(db):
+    insert(db, ('A', 4))
+    conn = get_conn(db)
+    with conn:
+        conn.execute("UPDATE feedback_agg SET sum_rating = 1")
+
+    def run(command):
+        return subprocess.run([sys.executable, 'hospital_db.py', command, db], cwd=ROOT, capture_output=True, text=True)
+
+    assert run('check').returncode == 1
+    rebuilt = run('rebuild')
+    assert rebuilt.returncode == 0 and 'feedback_agg 일치' in rebuilt.stdout
+    assert run('check').returncode == 0
+
+
+def test_invalid_ratings_are_rejected_before_queueing(db):
+    for rating in (None, 'x', 0, 6):
+        with pytest.raises(ValueError):
+            enqueue_feedback(db, 'A', rating, '')
+    with pytest.raises(ValueError):
+        enqueue_feedback(db, None, 3, '')
+    enqueue_feedback(db, 'A', '4', None)
+    feedback_writer(db).flush()
+    assert summary(db) == {'A': (4.0, 1)}
+    row = get_conn(db).execute('SELECT rating, comment FROM feedback').fetchone()
+    assert row == (4, '')
+
+
+class FlakyConn:
+    """executemany 가 처음 fails 번은 error 메시지의 OperationalError 를 내는 가짜 연결"""
+
+    def __init__(self, error, fails):
+        self.error = error
+        self.fails = fails
+        self.calls = 0
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, sql, rows):
+        self.calls += 1
+        if self.calls <= self.fails:
+            raise sqlite3.OperationalError(self.error)
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(hospital_db.time, 'sleep', lambda s: None)
+
+
+def writer(db, sql='INSERT INTO feedback (hospital_id, rating) VALUES (?, ?)'):
+    return BatchWriter(db, sql, interval=0.01)
+
+
+def test_write_retries_while_busy(db, no_sleep):
+    conn = FlakyConn('database is locked', fails=hospital_db.WRITE_RETRIES - 1)
+    writer(db)._write(conn, [('A', 1)])
+    assert conn.calls == hospital_db.WRITE_RETRIES and conn.rows == [('A', 1)]
+
+
+def test_write_gives_up_after_retries_and_on_other_errors(db, no_sleep):
+    busy = FlakyConn('database is busy', fails=hospital_db.WRITE_RETRIES)
+    with pytest.raises(sqlite3.OperationalError):
+        writer(db)._write(busy, [('A', 1)])
+    assert busy.calls == hospital_db.WRITE_RETRIES
+    other = FlakyConn('no such table: nope', fails=1)
+    with pytest.raises(sqlite3.OperationalError):
+        writer(db)._write(other, [('A', 1)])
+    assert other.calls == 1
+
+
+def test_failed_batch_is_dropped_and_writer_keeps_going(db, caplog):
+    bad = writer(db, 'INSERT INTO nope (a, b) VALUES (?, ?)')
+    bad.submit(('A', 1))
+    bad.flush()   # 실패한 묶음도 task_done → flush 가 멈추지 않음
+    assert '기록 실패' in caplog.text
+    good = writer(db)
+    good.submit(('A', 3))
+    good.flush()
+    assert summary(db) == {'A': (3.0, 1)}
+
+
+def test_writer_waits_out_real_lock(db, monkeypatch):
+    # 다른 연결이 쓰기 잠금을 쥐고 있는 동안 기록이 잠금 오류로 끝나지 않고, 풀리면 기록됨
+    monkeypatch.setattr(hospital_db, 'connect', lambda path: sqlite3.connect(path, timeout=0.05))
+    holder = sqlite3.connect(db, isolation_level=None, check_same_thread=False)
+    holder.execute('BEGIN IMMEDIATE')
+    w = writer(db)
+    w.submit(('A', 2))
+    threading.Timer(0.3, holder.execute, ('COMMIT',)).start()
+    w.flush()
+    holder.close()
+    assert summary(db) == {'A': (2.0, 1)}
@@ -0,0 +1,52 @@
+# test_hospital_search.py
+# find_nearest: 공간 인덱스 경로(후보 K개 → top_n 번째 점수 반경 재조회)가 전체 배열 결과와 같은지
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hospital_search
+from bench_nearest import make_hospitals
+from hospital_search import find_nearest
+from spatial_index import HospitalIndex
+
+
+@pytest.fixture
+def always_index(monkeypatch):
+    monkeypatch.setattr(hospital_search, 'INDEX_MIN_ROWS', 0)
+
+
+def test_index_path_matches_full_scan(always_index):
+    df = make_hospitals(3000, seed=3)
+    index = HospitalIndex(df['lat'].to_numpy(), df['lon'].to_numpy())
+    rng = np.random.default_rng(4)
+    for lat, lon in zip(rng.uniform(33.0, 38.6, 50), rng.uniform(124.6, 131.0, 50)):
+        for top_n in (1, 5, 20):
+            want = find_nearest(lat, lon, df, top_n)
+            got = find_nearest(lat, lon, df, top_n, index=index)
+            assert np.allclose(got['score'], want['score'])
+            assert got['distance_km'].tolist() == pytest.approx(want['distance_km'].tolist())
+
+
+def test_penalized_neighbours_widen_to_exact_result(always_index):
+    # 가까운 병원 40곳이 모두 수용 불가 → top_n 번째 점수가 커서 반경을 넓혀야 먼 병원이 1순위
+    near = pd.DataFrame({'id': [f'N{i}' for i in range(40)], 'lat': 37.5 + np.arange(40) * 1e-4, 'lon': 127.0,
+                         'accepting': False, 'waiting': 0, 'delivery_beds': 1})
+    far = pd.DataFrame({'id': ['F'], 'lat': [38.0], 'lon': [127.0], 'accepting': [True], 'waiting': [0],
+                        'delivery_beds': [1]})
+    df = pd.concat([near, far], ignore_index=True)
+    index = HospitalIndex(df['lat'].to_numpy(), df['lon'].to_numpy())
+    got = find_nearest(37.5, 127.0, df, 1, index=index)
+    assert got['id'].tolist() == ['F']
+
+
+def test_small_dataset_ignores_index():
+    df = make_hospitals(100)
+
+    class Boom:
+        n_valid = 100
+
+        def nearest(self, *args):
+            raise AssertionError('인덱스를 쓰면 안 됨')
+
+    assert len(find_nearest(37.5, 127.0, df, 5, index=Boom())) == 5
@@ -0,0 +1,115 @@
+# test_price_store.py
+# PriceStore 증분 갱신: FakeDownloader 로 첫 실행/재실행(다운로드 0회)/다음 거래일 증분/수정주가 재다운로드, 거래소 시각 기준 완성 봉
+
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+from price_store import RECHECK_S, FakeDownloader, PriceStore, session_end
+
+START = date(2024, 1, 2)
+TODAY = date(2024, 3, 1)          # 금요일 → 2/29 봉까지 완성
+NEXT_DAY = date(2024, 3, 4)       # 월요일 → 3/1 봉까지 완성
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / 'prices.db'), FakeDownloader(), Clock())
+
+
+def expected(fake, ticker, start, end):
+    return fake.series(ticker, start, end).rename(ticker)
+
+
+def test_first_run_downloads_and_rerun_downloads_nothing(store):
+    tickers = [f'T{i:03d}' for i in range(40)]
+    fake = store.downloader
+    first = store.refresh(tickers, START, today=TODAY)
+    assert sorted(r['ticker'] for r in first) == tickers
+    assert all(r['status'] == 'ok' for r in first)
+    assert sorted(t for call in fake.calls for t in call[0]) == tickers
+    wide = store.read(tickers, START)
+    assert wide.index[-1] == pd.Timestamp('2024-02-29')
+    pd.testing.assert_series_equal(wide['T007'], expected(fake, 'T007', START, TODAY), check_names=False,
+                                   check_freq=False, check_index_type=False)
+
+    calls = len(fake.calls)
+    store.clock.now += RECHECK_S * 10
+    assert store.refresh(tickers, START, today=TODAY) == []
+    assert len(fake.calls) == calls
+    assert store.read(tickers, START) is wide   # 저장이 없었으므로 캐시된 프레임 그대로
+
+
+def test_next_day_fetches_only_overlap(store):
+    fake = store.downloader
+    store.refresh(['AAA', 'BBB'], START, today=TODAY)
+    fake.calls.clear()
+    # 확인 직후에는 RECHECK_S 동안 다시 묻지 않음
+    assert store.refresh(['AAA', 'BBB'], START, today=NEXT_DAY) == []
+    store.clock.now += RECHECK_S
+    store.refresh(['AAA', 'BBB'], START, today=NEXT_DAY)
+    assert sorted(fake.calls) == [   # 최근 OVERLAP_BARS 봉부터만
+        (['AAA'], date(2024, 2, 27), NEXT_DAY), (['BBB'], date(2024, 2, 27), NEXT_DAY)]
+    wide = store.read(['AAA', 'BBB'], START)
+    assert wide.index[-1] == pd.Timestamp('2024-03-01')
+    assert wide['AAA'].tolist() == pytest.approx(expected(fake, 'AAA', START, NEXT_DAY).tolist())
+
+
+def test_adjusted_history_triggers_full_refetch(store):
+    fake = store.downloader
+    store.refresh(['AAA', 'BBB'], START, today=TODAY)
+    fake.calls.clear()
+    fake.scale['AAA'] = 0.5   # 분할: 과거 수정주가 전체가 바뀜
+    store.clock.now += RECHECK_S
+    store.refresh(['AAA', 'BBB'], START, today=NEXT_DAY)
+    assert [(tickers, s) for tickers, s, _ in fake.calls][-1] == (['AAA'], START)
+    wide = store.read(['AAA', 'BBB'], START)
+    assert wide['AAA'].tolist() == pytest.approx(expected(fake, 'AAA', START, NEXT_DAY).tolist())
+    assert wide['AAA'].notna().all()
+
+
+def test_failed_chunk_keeps_stored_and_retries_next_run(store):
+    fake = store.downloader
+    fake.fail['BAD'] = 1
+    result = {r['ticker']: r['status'] for r in store.refresh(['GOOD', 'BAD'], START, today=TODAY, retries=0)}
+    assert result['GOOD'] == 'ok' and result['BAD'] != 'ok'
+    assert list(store.read(['GOOD', 'BAD'], START).columns) == ['GOOD']
+    fake.calls.clear()
+    assert [r['ticker'] for r in store.refresh(['GOOD', 'BAD'], START, today=TODAY)] == ['BAD']
+    assert [tickers for tickers, _, _ in fake.calls] == [['BAD']]
+
+
+def epoch(tz, *args):
+    return datetime(*args, tzinfo=ZoneInfo(tz)).timestamp()
+
+
+def test_session_end_uses_exchange_time():
+    # 뉴욕 15:00 (서울 다음날 05:00): 미국 당일 봉은 미완성, 한국은 전날 봉까지 완성
+    now = epoch('America/New_York', 2024, 1, 10, 15, 0)
+    assert session_end('AAPL', now) == date(2024, 1, 10)
+    assert session_end('005930.KS', now) == date(2024, 1, 11)
+    # 마감(16:00) + SETTLE_MIN 이후에는 당일 봉 포함
+    assert session_end('AAPL', epoch('America/New_York', 2024, 1, 10, 16, 31)) == date(2024, 1, 11)
+    assert session_end('^KS11', epoch('Asia/Seoul', 2024, 1, 10, 15, 0)) == date(2024, 1, 10)
+
+
+def test_refresh_without_today_skips_unfinished_bar(tmp_path):
+    clock = Clock(epoch('America/New_York', 2024, 1, 10, 15, 0))
+    fake = FakeDownloader()
+    store = PriceStore(str(tmp_path / 'prices.db'), fake, clock)
+    store.refresh(['AAPL', '005930.KS'], START)
+    assert sorted((tickers, e) for tickers, _, e in fake.calls) == [
+        (['005930.KS'], date(2024, 1, 11)), (['AAPL'], date(2024, 1, 10))]
+    wide = store.read(['AAPL', '005930.KS'], START)
+    assert wide['AAPL'].last_valid_index() == pd.Timestamp('2024-01-09')
+    assert wide['005930.KS'].last_valid_index() == pd.Timestamp('2024-01-10')
@@ -0,0 +1,99 @@
+# test_price_stream.py
+# 링 버퍼 스트리밍: TickRing 덮어쓰기/커서, ReplaySource 재생을 증분으로 받아 합치면 원본과 같은지, 스레드 시작/정지
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import price_stream
+from price_stream import ReplaySource, Streamer, TickRing, get_streamer, make_ticks, stop_streamer
+
+TICKERS = ['AAA', 'BBB', 'CCC']
+
+
+def test_ring_wraps_and_keeps_latest():
+    ring = TickRing(5)
+    assert ring.append(np.arange(1, 9), np.arange(1, 9) * 10.0) == 8
+    ts, values = ring.since(0)
+    assert ts.tolist() == [4, 5, 6, 7, 8]
+    assert values.tolist() == [40.0, 50.0, 60.0, 70.0, 80.0]
+    assert ring.last_ts == 8 and ring.count == 8
+
+
+def test_ring_drops_old_points_and_reads_from_cursor():
+    ring = TickRing(5)
+    ring.append([1, 2, 3], [1.0, 2.0, 3.0])
+    cursor = ring.count
+    assert ring.append([2, 3], [9.0, 9.0]) == 0      # 이미 있는 시각 이하는 버림
+    assert ring.append([3, 4, 5], [9.0, 4.0, 5.0]) == 2
+    assert ring.since(cursor)[0].tolist() == [4, 5]
+    ring.append(np.arange(6, 20), np.arange(6, 20, dtype=float))
+    assert ring.since(cursor)[0].tolist() == list(range(15, 20))   # 덮어쓴 점은 빠짐
+    assert ring.append(np.arange(100, 120), np.arange(20, dtype=float)) == 20   # 버퍼보다 많으면 뒤쪽만
+    assert ring.since(0)[0].tolist() == list(range(115, 120))
+
+
+def replay(frame, capacity, rows):
+    streamer = Streamer(ReplaySource(frame, rows), TICKERS, capacity=capacity)
+    parts, cursors = [], {}
+    while not streamer.source.done:
+        streamer.poll()
+        part, cursors = streamer.updates(cursors)
+        parts.append(part)
+    return streamer, pd.concat(parts)
+
+
+def test_incremental_updates_rebuild_replayed_frame():
+    frame = make_ticks(TICKERS, 200, seed=1)
+    streamer, got = replay(frame, capacity=1000, rows=7)
+    want = frame.dropna(how='all')
+    pd.testing.assert_frame_equal(got, want, check_freq=False, check_names=False, check_index_type=False)
+    assert streamer.polls == int(np.ceil(200 / 7))
+    assert streamer.poll() == 0   # 재생이 끝나면 새 점 없음
+    assert streamer.updates(streamer.cursors())[0].empty
+
+
+def test_buffer_holds_last_capacity_points():
+    frame = make_ticks(TICKERS, 300, seed=2)
+    streamer, _ = replay(frame, capacity=40, rows=9)
+    tail = streamer.frame()
+    for t in TICKERS:
+        want = frame[t].dropna().tail(40)
+        np.testing.assert_array_equal(tail[t].dropna().to_numpy(), want.to_numpy())
+        assert tail[t].dropna().index.equals(want.index)
+        assert streamer.rings[t].count == frame[t].notna().sum()
+
+
+def test_source_error_is_recorded_not_raised():
+    class Broken:
+        def poll(self, tickers, last_ts):
+            raise ConnectionError('down')
+
+    streamer = Streamer(Broken(), TICKERS)
+    assert streamer.poll() == 0 and streamer.poll() == 0
+    assert streamer.failures == 2
+    assert streamer.last_error == 'ConnectionError: down'
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_streamer_thread_replays_and_stops(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_stream, '_streamers', price_stream.OrderedDict())
+    path = tmp_path / 'ticks.csv'
+    frame = make_ticks(TICKERS, 30, seed=3)
+    frame.to_csv(path)
+    streamer = get_streamer(TICKERS, str(path), capacity=100, interval_s=0.01)
+    assert streamer.running
+    assert wait_for(lambda: streamer.source.done)
+    stop_streamer(TICKERS, str(path))
+    assert wait_for(lambda: not streamer.running)
+    assert streamer.frame()['AAA'].dropna().tolist() == pytest.approx(frame['AAA'].dropna().tolist())
+    assert get_streamer(TICKERS, str(path)) is streamer and streamer.running   # 같은 버퍼로 다시 시작
+    streamer.stop()
@@ -0,0 +1,100 @@
+# test_routing.py
+# 라우팅 클라이언트: ors_stub 가짜 서버로 정상 경로/캐시, 실패 시 직선거리 대체, 서킷 브레이커, rank_by_eta 마감 확인
+
+import socket
+
+import pandas as pd
+import pytest
+
+import ors_stub
+from routing import CircuitBreaker, RouteClient, rank_by_eta, route_summary
+
+SEOUL = (37.5665, 126.9780)
+GANGNAM = (37.4979, 127.0276)
+
+
+@pytest.fixture
+def stub():
+    """stub(delay, fail_rate) → (base_url, 호출 수를 가진 핸들러 클래스)"""
+    servers = []
+
+    def start(delay=0.0, fail_rate=0.0):
+        server = ors_stub.serve(0, delay, fail_rate, background=True)
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}', server.RequestHandlerClass
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_route_from_api_is_cached(stub):
+    url, handler = stub()
+    client = RouteClient('key', url)
+    route_json, error = client.route(*SEOUL, *GANGNAM)
+    assert error is None
+    assert 'fallback' not in route_json['features'][0]['properties']
+    distance, duration = route_summary(route_json)
+    assert distance > 0 and duration > 0
+    assert client.route(*SEOUL, *GANGNAM) == (route_json, None)
+    assert handler.calls == 1
+
+
+def test_server_error_falls_back_to_straight_line(stub):
+    url, _ = stub(fail_rate=1.0)
+    client = RouteClient('key', url)
+    route_json, error = client.route(*SEOUL, *GANGNAM)
+    assert error
+    assert route_json['features'][0]['properties']['fallback'] is True
+    assert route_summary(route_json)[1] > 0
+    route_json, error = client.route(*SEOUL, *GANGNAM, fallback=False)
+    assert route_json is None and error
+
+
+def test_unreachable_server_falls_back():
+    client = RouteClient('key', f'http://127.0.0.1:{free_port()}', timeout=(0.5, 0.5))
+    route_json, error = client.route(*SEOUL, *GANGNAM)
+    assert error
+    assert route_json['features'][0]['properties']['fallback'] is True
+
+
+def test_breaker_stops_calling_failing_api(stub):
+    url, handler = stub(fail_rate=1.0)
+    client = RouteClient('key', url, breaker=CircuitBreaker(failure_threshold=3, reset_after=60))
+    for i in range(3):
+        client.route(*SEOUL, GANGNAM[0] + i * 0.01, GANGNAM[1])
+    assert client.breaker.state == 'open'
+    route_json, error = client.route(*SEOUL, *GANGNAM)
+    assert error == 'CIRCUIT_OPEN'
+    assert route_json['features'][0]['properties']['fallback'] is True
+    assert handler.calls == 3
+
+
+def test_breaker_half_open_recovers(stub):
+    url, handler = stub()
+    client = RouteClient('key', url, breaker=CircuitBreaker(failure_threshold=1, reset_after=0))
+    client.breaker.failure()
+    assert client.breaker.state == 'half-open'
+    route_json, error = client.route(*SEOUL, *GANGNAM)
+    assert error is None and handler.calls == 1
+    assert client.breaker.state == 'closed'
+
+
+def test_rank_by_eta_uses_estimate_after_deadline(stub):
+    url, _ = stub(delay=1.0)
+    client = RouteClient('key', url)
+    candidates = pd.DataFrame({
+        'lat': [GANGNAM[0], 37.55], 'lon': [GANGNAM[1], 126.99],
+        'distance_km': [8.0, 2.0], 'score': [8.0, 2.0],
+    })
+    ranked = rank_by_eta(client, *SEOUL, candidates, deadline=0.2)
+    assert list(ranked['eta_source']) == ['estimate', 'estimate']
+    assert list(ranked['distance_km']) == [2.0, 8.0]
+    assert ranked['eta_min'].is_monotonic_increasing
@@ -0,0 +1,124 @@
+# test_status_feed.py
+# 실시간 상태 수신기: apply/changes_since/snapshot 버전 규칙, DB 공유(다른 프로세스 흉내), apply_delta,
+# DB 잠김 때 HTTP 503
+
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import status_feed
+import match_api
+from status_feed import StatusFeed, apply_delta, parse_updates, serve_http
+
+
+def ids(df):
+    return sorted(df['hospital_id'])
+
+
+def test_apply_versions_only_real_changes():
+    feed = StatusFeed()
+    assert feed.apply([{'hospital_id': 'A', 'waiting': 1}, {'id': 'B', 'accepting': 'yes'}]) == 2
+    assert feed.version == 2
+    assert feed.apply([{'hospital_id': 'A', 'waiting': 1}]) == 0   # 같은 값 재전송
+    assert feed.version == 2
+    assert feed.apply([{'hospital_id': 'A', 'waiting': 2}, {'hospital_id': 'A', 'waiting': 3}]) == 1
+    version, snap = feed.snapshot()
+    assert version == 3
+    assert snap.set_index('hospital_id').loc['A', 'waiting'] == 3
+    assert snap.set_index('hospital_id').loc['B', 'accepting'] == True  # noqa: E712
+
+
+def test_changes_since_returns_latest_row_per_hospital():
+    feed = StatusFeed()
+    feed.apply([{'hospital_id': 'A', 'waiting': 1}, {'hospital_id': 'B', 'waiting': 1}])
+    feed.apply([{'hospital_id': 'A', 'waiting': 5}])
+    version, delta = feed.changes_since(1)
+    assert version == 3 and ids(delta) == ['A', 'B']
+    assert delta.set_index('hospital_id').loc['A', 'waiting'] == 5
+    version, delta = feed.changes_since(2)
+    assert ids(delta) == ['A']
+    assert feed.changes_since(3)[1].empty
+
+
+def test_changes_since_asks_for_snapshot_when_log_truncated():
+    feed = StatusFeed(log_size=2)
+    for i in range(4):
+        feed.apply([{'hospital_id': f'H{i}', 'waiting': i}])
+    assert feed.changes_since(1) == (4, None)
+    assert ids(feed.changes_since(2)[1]) == ['H2', 'H3']
+
+
+def test_invalid_item_is_rejected():
+    with pytest.raises(ValueError):
+        StatusFeed().apply([{'waiting': 1}])
+    assert parse_updates(b'{"hospital_id": "A"}\n{"hospital_id": "B"}') == [{'hospital_id': 'A'}, {'hospital_id': 'B'}]
+    assert parse_updates('{"updates": [{"id": "A"}]}') == [{'id': 'A'}]
+
+
+def test_db_feeds_share_changes(tmp_path):
+    # 같은 DB 를 보는 두 StatusFeed = 두 프로세스
+    db = str(tmp_path / 'status.db')
+    a, b = StatusFeed(db), StatusFeed(db)
+    assert a.apply([{'hospital_id': 'A', 'waiting': 1}, {'hospital_id': 'B', 'delivery_beds': 2}]) == 2
+    version, delta = b.changes_since(0)
+    assert version == a.version == 2 and ids(delta) == ['A', 'B']
+    assert b.apply([{'hospital_id': 'A', 'waiting': 1}]) == 0
+    assert b.apply([{'hospital_id': 'A', 'waiting': 7}]) == 1
+    assert a.wait(2, timeout=1.0)
+    version, delta = a.changes_since(2)
+    assert version == 3 and delta.set_index('hospital_id').loc['A', 'waiting'] == 7
+    # 새로 뜬 프로세스는 DB 에서 마지막 상태와 버전을 이어받음
+    version, snap = StatusFeed(db).snapshot()
+    assert version == 3 and snap.set_index('hospital_id').loc['B', 'delivery_beds'] == 2
+
+
+def test_apply_delta_overwrites_status_in_place():
+    df = pd.DataFrame({'id': ['A', 'B', 'C'], 'accepting': [True, True, True], 'waiting': [0, 0, 0],
+                       'delivery_beds': [1, 1, 1]})
+    delta = pd.DataFrame([{'hospital_id': 'C', 'accepting': False, 'waiting': 4, 'delivery_beds': None},
+                          {'hospital_id': 'Z', 'waiting': 9}])
+    pos = apply_delta(df, delta)
+    assert pos.tolist() == [2]
+    assert df.loc[2, ['accepting', 'waiting', 'delivery_beds']].tolist() == [False, 4, 1]   # 없는 값은 유지
+    assert df.attrs['status_rev'] == 1
+    assert apply_delta(df, None).tolist() == [] and df.attrs['status_rev'] == 1
+    assert np.array_equal(apply_delta(df, delta), [2]) and df.attrs['status_rev'] == 2
+
+
+def locked(*args, **kwargs):
+    raise sqlite3.OperationalError('database is locked')
+
+
+@pytest.fixture
+def locked_feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(status_feed, 'upsert_status_many', locked)
+    return StatusFeed(str(tmp_path / 'status.db'))
+
+
+def test_feed_http_returns_503_when_db_locked(locked_feed):
+    server = serve_http(locked_feed, 0)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/status'
+        r = requests.post(url, json=[{'hospital_id': 'A', 'waiting': 1}], timeout=5)
+        assert r.status_code == 503 and 'locked' in r.json()['error']
+        assert requests.post(url, json=[{'waiting': 1}], timeout=5).status_code == 400
+        assert requests.get(url, params={'since': 0}, timeout=5).json()['version'] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_match_api_status_returns_503_when_db_locked(locked_feed):
+    hospitals = pd.DataFrame({'id': ['A'], 'name': ['a'], 'lat': [37.0], 'lon': [127.0], 'accepting': [True],
+                              'waiting': [0], 'delivery_beds': [1]})
+    server = match_api.serve(match_api.MatchService(hospitals, feed=locked_feed), 0)
+    try:
+        r = requests.post(f'http://127.0.0.1:{server.server_address[1]}/status',
+                          json={'updates': [{'hospital_id': 'A', 'waiting': 1}]}, timeout=5)
+        assert r.status_code == 503 and 'locked' in r.json()['error']
+    finally:
+        server.shutdown()
+        server.server_close()